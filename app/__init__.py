@@ -8,11 +8,14 @@ Maintenance guard middleware is applied at this level so mobile
 routes return 503 automatically when maintenance_mode is on.
 """
 import os
+import hmac
 import logging
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.middleware.auth import _HTTPException
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.timing import TimingMiddleware
 
 
 def create_app() -> FastAPI:
@@ -31,6 +34,12 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # ── Compression (gzip / brotli) for JSON and text bodies ──────────────────
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", 1024)),
+    )
+
     # ── Global exception handler for auth errors ──────────────────────────────
     @app.exception_handler(_HTTPException)
     async def http_exc_handler(request: Request, exc: _HTTPException):
@@ -53,6 +62,10 @@ def create_app() -> FastAPI:
                 pass
         return await call_next(request)
 
+    # ── Request timing (Server-Timing header + log line) ──────────────────────
+    # Added last so it is outermost and also counts the maintenance lookup.
+    app.add_middleware(TimingMiddleware)
+
     # ── Global error handlers ─────────────────────────────────────────────────
     @app.exception_handler(404)
     async def not_found(_request, _exc):
@@ -76,6 +89,27 @@ def create_app() -> FastAPI:
     def health():
         return {"status": "ok", "service": "psych-api"}
 
+    # ── Prometheus metrics (per process) ──────────────────────────────────────
+    # Exposes route templates and DB call sites, so it only exists when
+    # METRICS_TOKEN is set and the scraper sends it as a bearer token.
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics(request: Request):
+        from app.utils import metrics
+        token = os.getenv("METRICS_TOKEN")
+        if not token:
+            return JSONResponse({"success": False, "message": "Not found"}, status_code=404)
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return JSONResponse({"success": False, "message": "Unauthorized"}, status_code=401)
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    # ── Local storage backend: serve objects under the Supabase public path ───
+    from app.utils.storage import local_backend
+    local = local_backend()
+    if local:
+        from fastapi.staticfiles import StaticFiles
+        os.makedirs(local.root, exist_ok=True)
+        app.mount("/storage/v1/object/public", StaticFiles(directory=local.root), name="local-storage")
+
     # ── Register all routers ──────────────────────────────────────────────────
     _register_routers(app)
 
@@ -1,11 +1,14 @@
 """PostgreSQL connection pool and query helpers using Supabase pooler."""
 
 import os
+import time
 import psycopg2
 import psycopg2.pool
 import psycopg2.extras
 from contextlib import contextmanager
 from dotenv import load_dotenv
+from app.utils.timing import record_db, record_pool
+from app.utils import metrics
 
 load_dotenv()
 
@@ -30,10 +33,43 @@ def get_pool():
     return _pool
 
 
+def _observe_query(t0: float):
+    elapsed = time.perf_counter() - t0
+    record_db(elapsed * 1000)
+    metrics.DB_QUERY.observe(elapsed, metrics.call_site(3))
+
+
+class _TimedCursor(psycopg2.extras.RealDictCursor):
+    """RealDictCursor that reports each statement to request timings and metrics."""
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _observe_query(t0)
+
+    def executemany(self, query, vars_list):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _observe_query(t0)
+
+
 @contextmanager
 def get_conn():
     pool = get_pool()
-    conn = pool.getconn()
+    t0 = time.perf_counter()
+    try:
+        conn = pool.getconn()
+    except psycopg2.pool.PoolError:
+        metrics.DB_POOL_EXHAUSTED.inc()
+        raise
+    waited = time.perf_counter() - t0
+    record_pool(waited * 1000)
+    metrics.DB_POOL_WAIT.observe(waited)
+    metrics.DB_POOL_IN_USE.inc()
 
     try:
         yield conn
@@ -43,12 +79,13 @@ def get_conn():
         raise
     finally:
         pool.putconn(conn)
+        metrics.DB_POOL_IN_USE.dec()
 
 
 @contextmanager
 def get_cursor():
     with get_conn() as conn:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        with conn.cursor(cursor_factory=_TimedCursor) as cur:
             yield cur
 
 
@@ -35,19 +35,23 @@ BLOOM_KEYS = [
 # Helpers
 # ─────────────────────────────────────────────────────────────────────────────
 
+_PCT_ANNOT_RE = re.compile(r'\s*\(\s*\d+\s*%\s*\)')
+_NUM_JUNK_RE  = re.compile(r'[%\s,]')
+_DIGITS_RE    = re.compile(r'\d+')
+
 def _int(val) -> int:
     if val is None:
         return 0
     s = str(val).strip()
     # Strip trailing parenthesised percentage annotations FIRST, e.g. "19(15%)" → "19"
     # These appear in grand-total rows like: "19(15%) 20(15%) 52 (40%)"
-    s = re.sub(r'\s*\(\s*\d+\s*%\s*\)', '', s)
+    s = _PCT_ANNOT_RE.sub('', s)
     # Also strip bare trailing "%" and whitespace
-    s = re.sub(r'[%\s,]', '', s)
+    s = _NUM_JUNK_RE.sub('', s)
     # Strip surrounding parens used for section sub-totals e.g. "(8)"
     s = s.strip('()')
     # If what remains is non-numeric (e.g. "X" placeholder), return 0
-    m = re.search(r'\d+', s)
+    m = _DIGITS_RE.search(s)
     return int(m.group()) if m else 0
 
 def _zero_bloom() -> dict:
@@ -56,16 +60,22 @@ def _zero_bloom() -> dict:
 def _bloom_dict(vals: list) -> dict:
     return {k: (vals[i] if i < len(vals) else 0) for i, k in enumerate(BLOOM_KEYS)}
 
+_DESC_NUM_CRUMB_RE    = re.compile(r'\\+\s*\d+\.\s*[^\\]*\\*')
+_DESC_LETTER_CRUMB_RE = re.compile(r'\\+\s*[A-F]\.\s*[^\\]*\\*')
+_DESC_STARS_RE        = re.compile(r'\*+')
+_DESC_TRAIL_NUM_RE    = re.compile(r'\s+\d{1,3}\s*$')
+_DESC_TRAIL_PCT_RE    = re.compile(r'\s*\d+%\s*$')
+
 def _clean_desc(text: str) -> str:
     """Strip LlamaParse artefacts from competency description strings."""
     if not text:
         return text
-    text = re.sub(r'\\+\s*\d+\.\s*[^\\]*\\*', ' ', text)
-    text = re.sub(r'\\+\s*[A-F]\.\s*[^\\]*\\*', ' ', text)
+    text = _DESC_NUM_CRUMB_RE.sub(' ', text)
+    text = _DESC_LETTER_CRUMB_RE.sub(' ', text)
     text = text.replace('\\', ' ')
-    text = re.sub(r'\*+', '', text)
-    text = re.sub(r'\s+\d{1,3}\s*$', '', text)
-    text = re.sub(r'\s*\d+%\s*$', '', text)
+    text = _DESC_STARS_RE.sub('', text)
+    text = _DESC_TRAIL_NUM_RE.sub('', text)
+    text = _DESC_TRAIL_PCT_RE.sub('', text)
     return ' '.join(text.split())
 
 
@@ -313,9 +323,11 @@ def _parse_md_table_row(line: str) -> list:
     cells = cells[1:-1] if cells and cells[-1].strip() == '' else cells[1:]
     return [c.strip() for c in cells]
 
+_SEPARATOR_CELL_RE = re.compile(r'^[-:]+$')
+
 def _is_separator_row(cells: list) -> bool:
     return bool(cells) and all(
-        re.match(r'^[-:]+$', c.replace(' ', '')) for c in cells if c.strip()
+        _SEPARATOR_CELL_RE.match(c.replace(' ', '')) for c in cells if c.strip()
     )
 
 def _find_bloom_cols(cells: list) -> dict:
@@ -344,6 +356,76 @@ def _find_col(cells: list, *patterns) -> int:
     return -1
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Row classifier (shared by both parsers)
+# ─────────────────────────────────────────────────────────────────────────────
+# Every table row's first cell is sorted into one of the kinds below with a
+# single match against one precompiled alternation. Alternatives are tried in
+# order, so the list order IS the precedence: SKIP beats GRAND_TOTAL beats
+# TOTALS beats SECTION beats COMPETENCY. Rows matching nothing return None
+# (description continuation or noise).
+
+ROW_SKIP        = 'SKIP'
+ROW_GRAND_TOTAL = 'GRAND_TOTAL'
+ROW_TOTALS      = 'TOTALS'
+ROW_SECTION     = 'SECTION'
+ROW_COMPETENCY  = 'COMPETENCY'
+
+_SKIP_COMMON = [
+    r'PQF Level', r'Difficulty', r"Bloom'?s", r'Topics',
+    r'The Examinees?', r'Easy', r'Moderate', r'Difficult',
+    r'No\.?\s+of', r'Weight$', r'Board',
+]
+_SKIP_MD  = _SKIP_COMMON + [r'Examinees']
+_SKIP_GEO = _SKIP_COMMON + [
+    r'as of', r'Subject:', r'Weight:', r'Professional Regulatory', r'Table of Spec',
+]
+
+_GRAND_TOTAL_PAT = r'100%$|TOTALS?\s*100%|Total\s*\(for\s*\d+|Grand\s*Total'
+_TOTALS_PAT      = r'TOTALS?$'
+# "A. Title" / "1. Title" — never "1.1" (that is a competency code)
+_SECTION_PAT     = r'[A-F]\.\s+\S|\d{1,2}\.\s+[A-Za-z\u201c]'
+_COMPETENCY_PAT  = r'\d{1,2}[.,]\d{1,2}'
+
+
+def _build_row_classifier(skip: list) -> 're.Pattern':
+    return re.compile(
+        f"(?P<{ROW_SKIP}>(?i:{'|'.join(skip)}))"
+        f"|(?P<{ROW_GRAND_TOTAL}>(?i:{_GRAND_TOTAL_PAT}))"
+        f"|(?P<{ROW_TOTALS}>(?i:{_TOTALS_PAT}))"
+        f"|(?P<{ROW_SECTION}>{_SECTION_PAT})"
+        f"|(?P<{ROW_COMPETENCY}>{_COMPETENCY_PAT})"
+    )
+
+
+_MD_ROW_RE      = _build_row_classifier(_SKIP_MD)
+_GEO_ROW_RE     = _build_row_classifier(_SKIP_GEO)
+_GRAND_TOTAL_RE = re.compile(_GRAND_TOTAL_PAT, re.I)
+
+
+def _classify_row(c0: str, row_re: 're.Pattern' = _MD_ROW_RE):
+    """Return the ROW_* kind for a first-column cell, or None."""
+    m = row_re.match(c0)
+    return m.lastgroup if m else None
+
+
+# Per-row patterns used once a row has been classified
+_STARS_RE         = re.compile(r'\*+')
+_SUBJ_SEP_RE      = re.compile(r'[-/]')
+_NUMBERED_COMP_RE = re.compile(r'(\d{1,2})\.\s+(.*)', re.S)
+_DECIMAL_COMP_RE  = re.compile(r'(\d{1,2}[.,]\d{1,2}\.?(?:\d{1,2})?)\s+(.*)', re.S)
+_TRAILING_NUM_RE  = re.compile(r'\s+\d+\s*$')
+
+# Metadata patterns (markdown parser)
+_ANNEX_LINE_RE    = re.compile(r"ANNEX\s*[\"\"«\u201c\u2018\u2019\u201d'`\('']*([AB])", re.I)
+_ANNEX_CELL_RE    = re.compile(r'ANNEX\s*[""«\u201c\u2018\u2019\u201d\'"\(]*([AB])', re.I)
+_SUBJECT_BOLD_RE  = re.compile(r'\*{0,2}Subject:\*{0,2}\s*\*{0,2}(.+?)\*{0,2}$', re.I)
+_SUBJECT_RE       = re.compile(r'Subject:\s*(.+)', re.I)
+_WEIGHT_BOLD_RE   = re.compile(r'\*{0,2}Weight:\*{0,2}\s*(\d+%)', re.I)
+_WEIGHT_RE        = re.compile(r'Weight:\s*(\d+%)', re.I)
+_WEIGHT_100_RE    = re.compile(r'^100\s*%?$')
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # LlamaParse markdown parser
 # ─────────────────────────────────────────────────────────────────────────────
@@ -396,10 +478,9 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
         'Industrial-Organizational', 'Industrial/Organizational', and
         'Industrial Organizational' all map to the same comparison key.
         """
-        n = re.sub(r'\*+', '', name)
-        n = re.sub(r'[-/]', ' ', n)
-        n = re.sub(r'\s+', ' ', n).strip()
-        return n.lower()
+        n = _STARS_RE.sub('', name)
+        n = _SUBJ_SEP_RE.sub(' ', n)
+        return ' '.join(n.split()).lower()
 
     def _flush_subject():
         """Commit the current subject and reset all state.
@@ -487,10 +568,7 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
             # the same ANNEX B, so ANNEX lines are not subject boundaries.
             # Subject boundaries are detected by the Subject: line below.
             # The ''B" variant is an OCR artefact where " is read as two apostrophes.
-            m = re.search(
-                r"ANNEX\s*[\"\"«\u201c\u2018\u2019\u201d'`\('']*([AB])",
-                stripped, re.I
-            )
+            m = _ANNEX_LINE_RE.search(stripped)
             if m:
                 a = m.group(1).upper()
                 annex = a
@@ -500,10 +578,9 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
             # Flush the current subject and start fresh whenever a new Subject:
             # line appears, even if same ANNEX. Use FUZZY comparison (_norm_subj)
             # so 'Industrial-Organizational' == 'Industrial/Organizational' etc.
-            m = (re.match(r'\*{0,2}Subject:\*{0,2}\s*\*{0,2}(.+?)\*{0,2}$', stripped, re.I)
-                 or re.match(r'Subject:\s*(.+)', stripped, re.I))
+            m = _SUBJECT_BOLD_RE.match(stripped) or _SUBJECT_RE.match(stripped)
             if m:
-                new_name = re.sub(r'\*+', '', m.group(1)).strip()
+                new_name = _STARS_RE.sub('', m.group(1)).strip()
                 if _norm_subj(new_name) != _norm_subj(subj_name or ''):
                     saved_annex, saved_board = annex, board
                     _save_comp()
@@ -515,8 +592,7 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
                     subj_board = board
 
             # Weight:
-            m = (re.match(r'\*{0,2}Weight:\*{0,2}\s*(\d+%)', stripped, re.I)
-                 or re.match(r'Weight:\s*(\d+%)', stripped, re.I))
+            m = _WEIGHT_BOLD_RE.match(stripped) or _WEIGHT_RE.match(stripped)
             if m:
                 subj_weight = m.group(1)
 
@@ -528,7 +604,7 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
             continue
 
         c0       = cells[0].strip()
-        c0_clean = re.sub(r'\*+', '', c0).strip()
+        c0_clean = _STARS_RE.sub('', c0).strip()
 
         # ── Guard: bare subject-name repetition inside a table cell ───────────
         # LlamaParse sometimes re-emits the current subject name as a standalone
@@ -542,7 +618,7 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
             continue
 
         # LlamaParse sometimes injects Subject:/Weight: inside a table cell
-        m_subj = re.match(r'Subject:\s*(.+)', c0_clean, re.I)
+        m_subj = _SUBJECT_RE.match(c0_clean)
         if m_subj and not any(cells[i].strip() for i in range(1, min(4, len(cells)))):
             new_name = m_subj.group(1).strip()
             if _norm_subj(new_name) != _norm_subj(subj_name or ''):
@@ -552,14 +628,14 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
                 subj_name = new_name
             continue
 
-        m_wt = re.match(r'Weight:\s*(\d+%)', c0_clean, re.I)
+        m_wt = _WEIGHT_RE.match(c0_clean)
         if m_wt and not any(cells[i].strip() for i in range(1, min(4, len(cells)))):
             subj_weight = m_wt.group(1)
             continue
 
         # Also detect inline ANNEX inside table cell (rare but happens)
         # Only update annex/board — do NOT flush. Subject: line handles boundaries.
-        m_annex = re.search(r'ANNEX\s*[""«\u201c\u2018\u2019\u201d\'"\(]*([AB])', c0_clean, re.I)
+        m_annex = _ANNEX_CELL_RE.search(c0_clean)
         if m_annex and not any(cells[i].strip() for i in range(1, min(4, len(cells)))):
             annex = m_annex.group(1).upper()
             board = 'Psychologist' if annex == 'A' else 'Psychometrician'
@@ -578,24 +654,14 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
             logger.debug(f"Header cols: weight={col_weight} ni={col_ni} bloom={col_bloom}")
             continue
 
+        kind = _classify_row(c0_clean, _MD_ROW_RE)
+
         # ── skip noise rows ────────────────────────────────────────────────────
-        SKIP = [
-            r'^PQF Level', r'^Difficulty', r"^Bloom'?s", r'^Topics',
-            r'^The Examinees?', r'^Easy', r'^Moderate', r'^Difficult',
-            r'^No\.?\s+of', r'^Weight$', r'^Board', r'^Examinees',
-        ]
-        if any(re.match(p, c0_clean, re.I) for p in SKIP):
+        if kind == ROW_SKIP:
             continue
 
         # ── GRAND TOTAL — end of subject block ────────────────────────────────
-        is_grand = (
-            re.match(r'^100%$', c0_clean)
-            or re.match(r'^TOTAL\s*100%', c0_clean, re.I)
-            or re.match(r'^Total\s*\(for\s*\d+', c0_clean, re.I)
-            or re.match(r'^Grand\s*Total', c0_clean, re.I)
-            or re.match(r'^TOTALS?\s*100%', c0_clean, re.I)
-        )
-        if is_grand:
+        if kind == ROW_GRAND_TOTAL:
             _save_comp()
             ni = _int(cells[col_ni]) if col_ni < len(cells) else 0
             bv = _bloom_vals(cells)
@@ -613,7 +679,7 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
             continue
 
         # ── section TOTAL row ──────────────────────────────────────────────────
-        if re.match(r'^TOTALS?$', c0_clean, re.I):
+        if kind == ROW_TOTALS:
             _save_comp()
             wt_cell = cells[col_weight].strip() if col_weight < len(cells) else ''
             ni = _int(cells[col_ni]) if col_ni < len(cells) else 0
@@ -626,7 +692,7 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
             # If the weight cell is "100%" this TOTAL row is the grand total
             # for the subject (LlamaParse sometimes emits it as "TOTAL 100% N ..."
             # without the "100%" in col-0). Treat it as a grand total flush.
-            wt_is_100 = re.match(r'^100\s*%?$', re.sub(r'[%\s]', '', wt_cell) + '%')
+            wt_is_100 = _WEIGHT_100_RE.match(re.sub(r'[%\s]', '', wt_cell) + '%')
             if wt_is_100 and ni > 0:
                 logger.info(f"Section TOTAL row has 100% weight — treating as grand total (ni={ni})")
                 bv_guard = [v for v in bv]
@@ -646,10 +712,7 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
         # ── section header ─────────────────────────────────────────────────────
         # Matches: "A. Title", "B. Title", "1. Title", "2. Title" etc.
         # Does NOT match competency codes like "1.1", "2.3"
-        is_sec = (
-            bool(re.match(r'^[A-F]\.\s+\S', c0_clean))
-            or bool(re.match(r'^\d{1,2}\.\s+[A-Za-z\u201c]', c0_clean))
-        ) and not bool(re.match(r'^\d{1,2}[.,]\d', c0_clean))
+        is_sec = kind == ROW_SECTION
 
         # CRITICAL: Psych Assessment uses numbered competencies ("1. Ascertain...",
         # "2. Describe...") that carry Bloom data directly on the same row.
@@ -657,12 +720,12 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
         #   - prefix is a NUMBER (not A./B./C. which are always section headers)
         #   - AND the row has Bloom data in cols 3-8 (not just a subtotal in col 2)
         if is_sec:
-            is_numbered = bool(re.match(r'^\d{1,2}\.\s+', c0_clean))
+            is_numbered = c0_clean[0].isdigit()
             bloom_data = any(_int(cells[i]) > 0 for i in range(3, min(9, len(cells))))
             if is_numbered and bloom_data:
                 # Reclassify: numbered competency without a decimal code
                 _save_comp()
-                m_num = re.match(r'^(\d{1,2})\.\s+(.*)', c0_clean, re.S)
+                m_num = _NUMBERED_COMP_RE.match(c0_clean)
                 if m_num:
                     code = m_num.group(1)
                     desc = _clean_desc(m_num.group(2).strip())
@@ -693,12 +756,12 @@ def parse_llamaparse_markdown(full_md: str) -> dict:
 
         # ── competency row ─────────────────────────────────────────────────────
         # Matches: "1.1", "2.3", "3,4" (comma variant), "1.1.1" etc.
-        if re.match(r'^\d{1,2}[.,]\d{1,2}', c0_clean):
+        if kind == ROW_COMPETENCY:
             _save_comp()
-            m = re.match(r'^(\d{1,2}[.,]\d{1,2}\.?(?:\d{1,2})?)\s+(.*)', c0_clean, re.S)
+            m = _DECIMAL_COMP_RE.match(c0_clean)
             if m:
                 code = m.group(1).rstrip('.,')
-                desc = _clean_desc(re.sub(r'\s+\d+\s*$', '', m.group(2).strip()))
+                desc = _clean_desc(_TRAILING_NUM_RE.sub('', m.group(2).strip()))
             else:
                 code, desc = c0_clean, ''
 
@@ -891,8 +954,8 @@ def parse_pdf_geometry(pdf_path: str) -> dict:
         return bv
 
     def _norm_subj_geo(name: str) -> str:
-        n = re.sub(r'[-/]', ' ', name)
-        return re.sub(r'\s+', ' ', n).strip().lower()
+        n = _SUBJ_SEP_RE.sub(' ', name)
+        return ' '.join(n.split()).lower()
 
     def _flush():
         nonlocal annex, board, subj_name, subj_weight, sections, cur_sec, grand_total
@@ -954,24 +1017,12 @@ def parse_pdf_geometry(pdf_path: str) -> dict:
         def _proc(cells):
             nonlocal cur_sec, cur_comp, grand_total
             c0 = cells[0].strip()
-            SKIP = [
-                r'^PQF Level', r'^Difficulty', r"^Bloom'?s", r'^Topics',
-                r'^The Examinees?', r'^Easy', r'^Moderate', r'^Difficult',
-                r'^No\.?\s+of', r'^Weight$', r'^Board', r'^as of',
-                r'^Subject:', r'^Weight:', 'Professional Regulatory', 'Table of Spec',
-            ]
-            if any(re.match(p, c0, re.I) for p in SKIP):
+            kind = _classify_row(c0, _GEO_ROW_RE)
+            if kind == ROW_SKIP:
                 return
 
             # Grand total — flush subject
-            is_grand_geo = (
-                re.match(r'^100%$', c0)
-                or re.match(r'^TOTAL\s*100%', c0, re.I)
-                or re.match(r'^TOTALS?\s*100%', c0, re.I)
-                or re.match(r'^Total\s*\(for\s*\d+', c0, re.I)
-                or re.match(r'^Grand\s*Total', c0, re.I)
-            )
-            if is_grand_geo:
+            if kind == ROW_GRAND_TOTAL:
                 _sc()
                 ni = _int(cells[2])
                 bv = [_int(cells[j]) for j in range(3, 9)]
@@ -985,7 +1036,7 @@ def parse_pdf_geometry(pdf_path: str) -> dict:
                 _flush()
                 return
 
-            if re.match(r'^TOTALS?$', c0, re.I):
+            if kind == ROW_TOTALS:
                 _sc()
                 ni = _int(cells[2]); bv = [_int(cells[j]) for j in range(3, 9)]
                 bv = _bloom_sanity_geo(bv, ni if ni > 0 else sum(bv))
@@ -994,20 +1045,16 @@ def parse_pdf_geometry(pdf_path: str) -> dict:
                     cur_sec['total'] = {'weight': cells[1], 'total_items': ni, **_bloom_dict(bv)}
                 return
 
-            is_sec = (
-                bool(re.match(r'^[A-F]\.\s+\S', c0))
-                or bool(re.match(r'^\d{1,2}\.\s+[A-Za-z\u201c]', c0))
-            ) and not bool(re.match(r'^\d{1,2}[.,]\d', c0))
-            if is_sec:
+            if kind == ROW_SECTION:
                 # If the row is number-prefixed AND has Bloom data (cols 3-8),
                 # it is a numbered competency (Psych Assessment style).
                 # Lettered headers (A., B.) with only a subtotal in col 2 remain sections.
-                is_numbered = bool(re.match(r'^\d{1,2}\.\s+', c0))
+                is_numbered = c0[0].isdigit()
                 bloom_data  = any(_int(cells[i]) > 0 for i in range(3, 9))
                 has_numeric_data = is_numbered and bloom_data
                 if has_numeric_data:
                     _sc()
-                    m_num = re.match(r'^(\d{1,2})\.\s+(.*)', c0, re.S)
+                    m_num = _NUMBERED_COMP_RE.match(c0)
                     if m_num:
                         code = m_num.group(1)
                         desc = _clean_desc(m_num.group(2).strip())
@@ -1028,11 +1075,11 @@ def parse_pdf_geometry(pdf_path: str) -> dict:
                     cur_sec = {'title': c0, 'competencies': [], 'total': None}
                 return
 
-            if re.match(r'^\d{1,2}[.,]\d{1,2}', c0):
+            if kind == ROW_COMPETENCY:
                 _sc()
-                m = re.match(r'^(\d{1,2}[.,]\d{1,2}\.?(?:\d{1,2})?)\s+(.*)', c0, re.S)
+                m = _DECIMAL_COMP_RE.match(c0)
                 code, desc = (
-                    (m.group(1).rstrip('.,'), _clean_desc(re.sub(r'\s+\d+\s*$', '', m.group(2).strip())))
+                    (m.group(1).rstrip('.,'), _clean_desc(_TRAILING_NUM_RE.sub('', m.group(2).strip())))
                     if m else ('', _clean_desc(c0))
                 )
                 ni = _int(cells[2]); bv = [_int(cells[j]) for j in range(3, 9)]
@@ -1072,12 +1119,7 @@ def parse_pdf_geometry(pdf_path: str) -> dict:
 
             # If this is the grand total row and we have orphan Bloom values waiting,
             # fill in any zero Bloom slots with values from the orphan row.
-            is_grand_row = bool(
-                re.match(r'^100%$', c0)
-                or re.match(r'^TOTALS?\s*100%', c0, re.I)
-                or re.match(r'^Total\s*\(for\s*\d+', c0, re.I)
-                or re.match(r'^Grand\s*Total', c0, re.I)
-            )
+            is_grand_row = bool(_GRAND_TOTAL_RE.match(c0))
             if is_grand_row and prev_bloom_orphan is not None:
                 for j in range(3, 9):
                     if not cells[j].strip() or _int(cells[j]) == 0:
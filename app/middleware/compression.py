@@ -0,0 +1,122 @@
+"""
+Response compression middleware (gzip / brotli).
+
+Compresses a response when the client accepts a supported coding and:
+  - the content type is textual (JSON, text/*, JS, XML, SVG)
+  - the body is at least minimum_size bytes (single-body responses)
+  - it is not already encoded — Precompressed payloads and PDFs/images
+    pass straight through — and is not a 204/304/partial response
+
+Single-message bodies (every JSONResponse/Response in this app) are
+compressed in one shot with an exact Content-Length. Streaming bodies are
+compressed chunk by chunk. Strong ETags are weakened on compressed output
+since the bytes no longer match the identity representation.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.utils.compression import brotli, choose_encoding, compress, is_compressible
+
+_SKIP_STATUS = {204, 206, 304}
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app            = app
+        self.minimum_size   = minimum_size
+        self.gzip_level     = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+        responder = _Responder(send, encoding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    """Holds back http.response.start until the first body chunk decides the mode."""
+
+    def __init__(self, send, encoding: str, cfg: CompressionMiddleware):
+        self._send      = send
+        self.encoding   = encoding
+        self.cfg        = cfg
+        self.start      = None
+        self.mode       = None   # "identity" | "compress" | "stream"
+        self.compressor = None
+
+    def _level(self) -> int:
+        return self.cfg.brotli_quality if self.encoding == "br" else self.cfg.gzip_level
+
+    def _eligible(self, headers: MutableHeaders) -> bool:
+        return (
+            self.start["status"] not in _SKIP_STATUS
+            and "content-encoding" not in headers
+            and "content-range" not in headers
+            and "no-transform" not in headers.get("cache-control", "").lower()
+            and is_compressible(headers.get("content-type", ""))
+        )
+
+    def _mark_encoded(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        vary = headers.get("vary", "")
+        if "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    def _new_compressor(self):
+        if self.encoding == "br":
+            c = brotli.Compressor(quality=self._level())
+            return c.process, c.finish
+        c = zlib.compressobj(self._level(), zlib.DEFLATED, 31)  # wbits 31 → gzip container
+        return (lambda data: c.compress(data) + c.flush(zlib.Z_SYNC_FLUSH)), c.flush
+
+    async def send(self, message):
+        mtype = message["type"]
+        if mtype == "http.response.start":
+            self.start = message
+            return
+        if mtype != "http.response.body":
+            if self.start is not None:
+                await self._send(self.start)
+                self.start = None
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+
+        if self.mode is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not self._eligible(headers) or (not more and len(body) < self.cfg.minimum_size):
+                self.mode = "identity"
+            elif not more:
+                self.mode = "compress"
+                body = compress(body, self.encoding, self._level())
+                self._mark_encoded(headers)
+                headers["Content-Length"] = str(len(body))
+            else:
+                self.mode = "stream"
+                self.compressor = self._new_compressor()
+                self._mark_encoded(headers)
+                del headers["Content-Length"]
+            await self._send(self.start)
+            self.start = None
+            if self.mode == "stream":
+                body = self.compressor[0](body)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more})
+            return
+
+        if self.mode == "stream":
+            body = self.compressor[0](body)
+            if not more:
+                body += self.compressor[1]()
+        await self._send({"type": "http.response.body", "body": body, "more_body": more})
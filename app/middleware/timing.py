@@ -0,0 +1,97 @@
+"""
+Per-request timing middleware.
+
+Can add a Server-Timing header to every HTTP response, which browser devtools
+show under Network → Timing:
+
+    Server-Timing: total;dur=41.2, db;dur=30.1;desc="12 queries", pool;dur=0.4,
+                   http;dur=0.0;desc="0 calls"
+
+total is measured up to the response headers. After the body has been sent,
+one JSON line per request can be logged (logger "app.requests", INFO) with
+the same numbers plus method, route template, status and full duration.
+Request metrics are always recorded.
+
+Both are off by default — DB query counts and durations shouldn't leave the
+box unless asked for:
+  SERVER_TIMING=1       — add the header
+  REQUEST_TIMING_LOG=1  — log the per-request lines
+"""
+import os
+import json
+import logging
+
+from starlette.datastructures import MutableHeaders
+
+from app.utils import timing, metrics
+
+
+logger = logging.getLogger("app.requests")
+
+
+def _flag(name: str) -> bool:
+    return os.getenv(name, "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _route_template(scope) -> str | None:
+    return getattr(scope.get("route"), "path", None)
+
+
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app        = app
+        self.header     = _flag("SERVER_TIMING")
+        self.log        = _flag("REQUEST_TIMING_LOG")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = timing.begin()
+        status = 500
+        ttfb   = None
+
+        async def send_wrapper(message):
+            nonlocal status, ttfb
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                ttfb = timings.elapsed_ms()
+                if self.header:
+                    MutableHeaders(raw=message["headers"]).append("Server-Timing", _server_timing(timings, ttfb))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            timing.end(token)
+            route  = _route_template(scope)
+            method = scope.get("method", "")
+            # Unmatched paths share one series so scanners can't blow up cardinality
+            metrics.HTTP_REQUESTS.inc(method, route or "<unmatched>", str(status))
+            metrics.HTTP_LATENCY.observe(
+                (ttfb if ttfb is not None else timings.elapsed_ms()) / 1000, method, route or "<unmatched>"
+            )
+            if self.log:
+                logger.info(json.dumps({
+                    "event":      "request",
+                    "method":     method,
+                    "route":      route or scope.get("path", ""),
+                    "status":     status,
+                    "total_ms":   round(ttfb if ttfb is not None else timings.elapsed_ms(), 2),
+                    "sent_ms":    round(timings.elapsed_ms(), 2),
+                    "db_count":   timings.db_count,
+                    "db_ms":      round(timings.db_ms, 2),
+                    "pool_ms":    round(timings.pool_ms, 2),
+                    "http_count": timings.http_count,
+                    "http_ms":    round(timings.http_ms, 2),
+                }, separators=(",", ":")))
+
+
+def _server_timing(t: timing.RequestTimings, total_ms: float) -> str:
+    return (
+        f"total;dur={total_ms:.1f}, "
+        f'db;dur={t.db_ms:.1f};desc="{t.db_count} queries", '
+        f"pool;dur={t.pool_ms:.1f}, "
+        f'http;dur={t.http_ms:.1f};desc="{t.http_count} calls"'
+    )
@@ -1,15 +1,35 @@
 import datetime
 from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
 from app.db import fetchone, fetchall, paginate
 from app.middleware.auth import login_required, permission_required, mobile_permission_required
-from app.utils.responses import ok, not_found, forbidden
+from app.utils.responses import ok, error, not_found, forbidden, json_bytes
 from app.utils.pagination import get_page_params, get_search
+from app.utils.tos_index import active_tos_subject_names, active_tos_subject_ids
+from app.utils.avatars import avatar_thumbnail_url
+from app.utils.compression import PrecompressedCache
+from app.utils.mastery import student_mastery, cohort_mastery_payload, rebuild_mastery, invalidate_mastery_cache
+from app.utils.log import log_action
+from app.utils import submissions
 import uuid
 
 admin_dash_router   = APIRouter(prefix="/api/web/admin",         tags=["admin-dashboard"])
 faculty_dash_router = APIRouter(prefix="/api/web/faculty",       tags=["faculty-dashboard"])
 mobile_prog_router  = APIRouter(prefix="/api/mobile/student",    tags=["mobile-progress"])
 
+# Cohort analytics is the same for every admin/faculty viewer and costs several
+# aggregate queries; serve it from a serialized, precompressed copy. Each
+# committed submission batch drops it, so new results show on the next view;
+# the TTL only bounds staleness for writes made by other worker processes.
+_COHORT_TTL   = 60
+_cohort_cache = PrecompressedCache(ttl=_COHORT_TTL, max_entries=1)
+
+def _on_flush(rows: list):
+    # Competency mastery drops its own cached copy once the batch's counters are folded in
+    _cohort_cache.invalidate()
+
+submissions.add_flush_listener(_on_flush)
+
 # ─────────────────────────────────────────────────────────────────────────────
 # DASHBOARD ROUTES
 # ─────────────────────────────────────────────────────────────────────────────
@@ -97,13 +117,6 @@ async def faculty_dashboard(request: Request):
 # ANALYTICS HELPERS
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _get_active_tos_subjects() -> list[str]:
-    """Fetch the list of subject names from the currently ACTIVE TOS version."""
-    row = fetchone("SELECT data FROM tos_versions WHERE status = 'ACTIVE' LIMIT 1")
-    if not row or not row.get("data") or "subjects" not in row["data"]:
-        return []
-    return [s["subject"] for s in row["data"]["subjects"] if "subject" in s]
-
 def _get_pass_probability(avg_score: float) -> dict:
     """Compute pass probability key and label from average score.
     Thresholds: >=75 HIGH_CHANCE, >=60 LIKELY, >=25 NEEDS_IMPROVEMENT, >=1 AT_RISK, 0 NO_PROGRESS."""
@@ -128,9 +141,7 @@ def _get_board_readiness(avg_score: float) -> str:
 
 def _cohort_analytics_data() -> dict:
     """Helper to fetch and calculate system-wide cohort analytics."""
-    active_subjects = _get_active_tos_subjects()
-    
-    if not active_subjects:
+    if not active_tos_subject_names():
         # If no TOS is active, return empty stats
         return {
             "subjectCompetency": [],
@@ -139,16 +150,15 @@ def _cohort_analytics_data() -> dict:
             "stats": None
         }
 
-    placeholders = ",".join(["%s"] * len(active_subjects))
-    subj_data = fetchall(f"""
+    subj_data = fetchall("""
         SELECT s.name AS subject, AVG((ar.score::numeric / NULLIF(ar.total_items, 0)) * 100) as cohort_score
         FROM subjects s
         LEFT JOIN assessments a ON a.subject_id = s.id
         LEFT JOIN assessment_results ar ON ar.assessment_id = a.id
-        WHERE s.status = 'APPROVED' AND s.name IN ({placeholders})
+        WHERE s.status = 'APPROVED' AND s.id = ANY(%s::uuid[])
         GROUP BY s.name
         ORDER BY s.name
-    """, active_subjects)
+    """, [active_tos_subject_ids()])
     competency = [{"subject": r["subject"], "fullSubject": r["subject"], "cohortScore": round(float(r["cohort_score"] or 0)), "passingStandard": 75} for r in subj_data]
 
     students = fetchall("SELECT readiness_percentage FROM view_student_individual_readiness")
@@ -217,15 +227,16 @@ def _calc_readiness(user_id: str) -> dict:
     average blends into the final score — pulling readiness down when mock
     performance trails quiz performance (prevents quiz inflation).
     """
-    active_subjects = _get_active_tos_subjects()
-    if not active_subjects:
+    if not active_tos_subject_names():
         return {
             "percentage": 0.0, "raw_readiness": 0.0, "mock_avg": None,
             "progress": 0.0, "level": "LOW", "subject_scores": [], "total_subjects": 0
         }
 
-    placeholders   = ",".join(["%s"] * len(active_subjects))
-    all_subjects   = fetchall(f"SELECT name FROM subjects WHERE status = 'APPROVED' AND name IN ({placeholders}) ORDER BY name", active_subjects)
+    all_subjects   = fetchall(
+        "SELECT name FROM subjects WHERE status = 'APPROVED' AND id = ANY(%s::uuid[]) ORDER BY name",
+        [active_tos_subject_ids()],
+    )
     total_subjects = len(all_subjects)
 
     # Step 1: AVG score per (assessment_id deduped latest) grouped by type+subject
@@ -512,6 +523,8 @@ def _student_full_record(identifier: str) -> dict | None:
         WHERE ar.user_id = %s GROUP BY a.title LIMIT 5
     """, [user_id])
     student["topicMastery"] = [{"topic": r["topic"], "mastery": round(float(r["mastery"] or 0), 1)} for r in topic_mastery]
+    # Competency / Bloom-level mastery against the ACTIVE TOS (precomputed counters)
+    student["competencyMastery"] = student_mastery(user_id)
 
     # Mood data — last 30 entries + frequency breakdown
     # mood_key values mirror MoodKey in mobile/constants/moods.ts (Inside Out 2)
@@ -541,17 +554,19 @@ def _analytics_list(request: Request):
     result = paginate(" ".join(sql), params, page, per_page)
 
     # Fetch total approved subjects once — same denominator used in _calc_readiness()
-    active_subjects = _get_active_tos_subjects()
-    if active_subjects:
-        placeholders = ",".join(["%s"] * len(active_subjects))
-        total_subjects_row = fetchone(f"SELECT COUNT(*) AS c FROM subjects WHERE status = 'APPROVED' AND name IN ({placeholders})", active_subjects)
+    if active_tos_subject_names():
+        total_subjects_row = fetchone(
+            "SELECT COUNT(*) AS c FROM subjects WHERE status = 'APPROVED' AND id = ANY(%s::uuid[])",
+            [active_tos_subject_ids()],
+        )
     else:
         total_subjects_row = None
-        
+
     total_subjects = int(total_subjects_row["c"] or 0) if total_subjects_row else 0
 
     for r in result["items"]:
         r["id"] = str(r["id"])
+        r["photo_avatar"] = avatar_thumbnail_url(r.get("photo_avatar"))
         avg = float(r["average"] or 0)
         r["average"] = round(avg, 1)
         r["totalSubjects"] = total_subjects
@@ -567,7 +582,14 @@ def _analytics_list(request: Request):
 
 async def _shared_cohort_analytics(request: Request):
     auth = permission_required("view_analytics")(request)
-    return ok(_cohort_analytics_data())
+    payload = _cohort_cache.get_or_build(
+        "cohort", lambda: json_bytes({"success": True, "message": "Success", "data": _cohort_analytics_data()})
+    )
+    return payload.response(request)
+
+async def _shared_competency_analytics(request: Request):
+    auth = permission_required("view_analytics")(request)
+    return cohort_mastery_payload().response(request)
 
 async def _shared_analytics_list(request: Request):
     auth = permission_required("view_analytics")(request)
@@ -583,6 +605,23 @@ async def _shared_analytics_detail(request: Request, student_id: str):
 async def admin_cohort_analytics(request: Request):
     return await _shared_cohort_analytics(request)
 
+@admin_dash_router.get("/analytics/competencies")
+async def admin_competency_analytics(request: Request):
+    return await _shared_competency_analytics(request)
+
+@admin_dash_router.post("/analytics/competencies/rebuild")
+async def admin_rebuild_competency_mastery(request: Request):
+    """Recompute competency mastery from stored results (after re-tagging or moving assessments)."""
+    auth = permission_required("edit_settings")(request)
+    subject_id = (request.query_params.get("subject_id") or "").strip() or None
+    if subject_id:
+        try: uuid.UUID(subject_id)
+        except ValueError: return error("subject_id must be a UUID", 400)
+    rows = await run_in_threadpool(rebuild_mastery, subject_id)
+    invalidate_mastery_cache()
+    log_action("Rebuilt competency mastery", subject_id or "All subjects", subject_id, user_id=auth.user_id, ip=auth.ip)
+    return ok({"rows": rows, "subject_id": subject_id})
+
 @admin_dash_router.get("/analytics")
 async def admin_get_analytics_list(request: Request):
     return await _shared_analytics_list(request)
@@ -597,6 +636,10 @@ async def admin_get_analytics_detail(request: Request, student_id: str):
 async def faculty_cohort_analytics(request: Request):
     return await _shared_cohort_analytics(request)
 
+@faculty_dash_router.get("/analytics/competencies")
+async def faculty_competency_analytics(request: Request):
+    return await _shared_competency_analytics(request)
+
 @faculty_dash_router.get("/analytics")
 async def faculty_get_analytics_list(request: Request):
     return await _shared_analytics_list(request)
@@ -883,6 +926,13 @@ async def mobile_progress_recommendations(request: Request):
     return ok({"recommendations": recommendations})
 
 
+@mobile_prog_router.get("/progress/competencies")
+async def mobile_progress_competencies(request: Request):
+    """The student's competency and Bloom-level mastery against the active TOS."""
+    auth = mobile_permission_required("mobile_view_progress")(request)
+    return ok(student_mastery(auth.user_id))
+
+
 @mobile_prog_router.get("/progress")
 async def mobile_progress(request: Request):
     """Return the authenticated student's own readiness & assessment results."""
@@ -5,14 +5,20 @@ Assessment routes
   Mobile:  /api/mobile/student/assessments — list, fetch, submit
 """
 import json
-from psycopg2.extras import Json as PgJson
+from psycopg2 import IntegrityError
+from psycopg2.extras import Json as PgJson, execute_values
 from fastapi import APIRouter, Request
-from app.db import fetchone, fetchall, execute, execute_returning, paginate
+from fastapi.concurrency import run_in_threadpool
+from app.db import fetchone, fetchall, execute, execute_returning, paginate, get_cursor
 from app.middleware.auth import login_required, permission_required, mobile_permission_required
 from app.utils.responses import ok, created, no_content, error, not_found, forbidden
 from app.utils.pagination import get_page_params, get_search, get_filter
 from app.utils.validators import require_fields, clean_str
 from app.utils.log import log_action
+from app.utils.answer_keys import get_answer_key, passing_grade, invalidate_answer_key
+from app.utils import submissions
+from app.utils.item_analysis import item_analysis
+from app.utils.mastery import retag_questions, invalidate_mastery_cache
 
 admin_assess_router   = APIRouter(prefix="/api/web/admin/assessments",       tags=["admin-assessments"])
 faculty_assess_router = APIRouter(prefix="/api/web/faculty/assessments",     tags=["faculty-assessments"])
@@ -48,6 +54,7 @@ _SELECT_WITH_Q = """
                        'text', q.text,
                        'options', q.options,
                        'correct_answer', q.correct_answer,
+                       'competency_codes', q.competency_codes,
                        'sort_order', q.sort_order,
                        'author_id', q.author_id
                    ) ORDER BY q.sort_order, q.date_created
@@ -83,6 +90,7 @@ def _fmt(a: dict, include_questions=False) -> dict:
                 "text":          q.get("text", ""),
                 "options":       q.get("options", []),
                 "correctAnswer": q.get("correct_answer", q.get("correctAnswer", 0)),
+                "competencyCodes": q.get("competency_codes") or [],
                 "mode":          q.get("mode", "MCQ"),
                 "points":        q.get("points", 1),
                 "sortOrder":     q.get("sort_order", 0),
@@ -101,8 +109,7 @@ def _list(request: Request, extra_where="", extra_params=None, include_questions
     status = get_filter(request, "status", VALID_STATUSES)
     subject_id = (request.query_params.get("subject_id") or "").strip() or None
 
-    base_select = _SELECT_WITH_Q if include_questions else _SELECT
-    sql    = [base_select, "WHERE 1=1"]
+    sql    = [_SELECT, "WHERE 1=1"]
     params = []
 
     if extra_where:
@@ -122,46 +129,121 @@ def _list(request: Request, extra_where="", extra_params=None, include_questions
         sql.append("AND a.subject_id = %s")
         params.append(subject_id)
 
-    if include_questions:
-        sql.append("GROUP BY a.id, s.name, m.title, u.first_name, u.last_name")
     sql.append("ORDER BY a.created_at DESC")
     result = paginate(" ".join(sql), params, page, per_page)
+    if include_questions:
+        _attach_questions(result["items"])
     result["items"] = [_fmt(a, include_questions=include_questions) for a in result["items"]]
     return result
 
 
+def _attach_questions(items: list) -> None:
+    """
+    Sets questions_list on a page of assessments with one query, in the same
+    shape and order _SELECT_WITH_Q's jsonb_agg produces — so paging and
+    COUNT run on plain assessment rows instead of the aggregated join.
+    """
+    if not items:
+        return
+    rows = fetchall(
+        """SELECT id AS question_id, assessment_id, text, options, correct_answer, competency_codes,
+                  sort_order, author_id
+           FROM questions
+           WHERE assessment_id = ANY(%s::uuid[])
+           ORDER BY assessment_id, sort_order, date_created""",
+        [[str(a["id"]) for a in items]],
+    )
+    by_assessment = {}
+    for q in rows:
+        by_assessment.setdefault(str(q.pop("assessment_id")), []).append(q)
+    for a in items:
+        a["questions_list"] = by_assessment.get(str(a["id"]), [])
+
+
+def _competency_codes(q: dict):
+    """Normalized TOS codes of a question payload, or None when it carries none."""
+    raw = q.get("competencyCodes", q.get("competency_codes"))
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    codes = []
+    for c in raw if isinstance(raw, list) else []:
+        c = str(c).strip().rstrip(".,")[:50]
+        if c and c not in codes:
+            codes.append(c)
+    return codes[:20]
+
+
 def _upsert_questions(assess_id: str, questions: list, author_id: str):
-    incoming_ids = {
-        str(q.get("id")) for q in questions
-        if q.get("id") and not str(q.get("id", "")).startswith("q-")
-    }
-    existing_rows = fetchall("SELECT id FROM questions WHERE assessment_id = %s", [assess_id])
-    existing_ids  = {str(r["id"]) for r in existing_rows}
-
-    for qid in existing_ids - incoming_ids:
-        execute("DELETE FROM questions WHERE id = %s", [qid])
-
-    for idx, q in enumerate(questions):
-        qid     = str(q.get("id", ""))
-        text    = (q.get("text") or "").strip()
-        options = q.get("options", [])
-        correct = q.get("correctAnswer", q.get("correct_answer", 0))
-        sort_order = q.get("sortOrder", q.get("sort_order", idx))
-        try:
-            correct = int(correct)
-        except (TypeError, ValueError):
-            correct = 0
-
-        if qid and not qid.startswith("q-") and qid in existing_ids:
-            execute(
-                "UPDATE questions SET text = %s, options = %s, correct_answer = %s, sort_order = %s, last_updated = NOW() WHERE id = %s",
-                [text, PgJson(options), correct, sort_order, qid],
+    """
+    Replace an assessment's question set in one transaction and at most four
+    statements whatever its size: read the current ids, one DELETE for the
+    removed ones, one multi-row UPDATE ... FROM (VALUES ...) for kept ids and
+    one multi-row INSERT for new ones. Client-side ids ("q-...") are new.
+    Competency codes are kept as stored when a question doesn't send them;
+    re-tagged questions move their answers' mastery counts to the new codes,
+    and removed questions take theirs out, as a rebuild_mastery() would.
+    """
+    with get_cursor() as cur:
+        cur.execute("SELECT id, competency_codes FROM questions WHERE assessment_id = %s", [assess_id])
+        existing = {str(r["id"]): r.get("competency_codes") for r in cur.fetchall()}
+
+        updates, inserts, retagged = {}, [], {}
+        for idx, q in enumerate(questions):
+            qid     = str(q.get("id", ""))
+            text    = (q.get("text") or "").strip()
+            options = q.get("options", [])
+            codes   = _competency_codes(q)
+            correct = q.get("correctAnswer", q.get("correct_answer", 0))
+            sort_order = q.get("sortOrder", q.get("sort_order", idx))
+            try:
+                correct = int(correct)
+            except (TypeError, ValueError):
+                correct = 0
+
+            if qid and not qid.startswith("q-") and qid in existing:
+                # last copy of a repeated id wins
+                updates[qid] = (qid, text, PgJson(options), correct, sort_order,
+                                PgJson(codes) if codes is not None else None)
+                if codes is not None and codes != (existing[qid] or []):
+                    retagged[qid] = (existing[qid], codes)
+            else:
+                inserts.append((assess_id, author_id, text, PgJson(options), correct, sort_order, PgJson(codes or [])))
+
+        removed = list(existing.keys() - updates.keys())
+        for qid in removed:
+            if existing[qid]:
+                retagged[qid] = (existing[qid], [])
+        if retagged:
+            retag_questions(cur, assess_id, retagged)
+        if removed:
+            cur.execute("DELETE FROM questions WHERE id = ANY(%s::uuid[])", [removed])
+        if updates:
+            execute_values(
+                cur,
+                """UPDATE questions AS q
+                   SET text = v.text, options = v.options, correct_answer = v.correct_answer,
+                       sort_order = v.sort_order, last_updated = NOW(),
+                       competency_codes = COALESCE(v.competency_codes, q.competency_codes)
+                   FROM (VALUES %s) AS v (id, text, options, correct_answer, sort_order, competency_codes)
+                   WHERE q.id = v.id""",
+                list(updates.values()),
+                template="(%s::uuid, %s, %s::jsonb, %s::int, %s::int, %s::jsonb)",
+                page_size=len(updates),
             )
-        else:
-            execute_returning(
-                "INSERT INTO questions (assessment_id, author_id, text, options, correct_answer, sort_order) VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
-                [assess_id, author_id, text, PgJson(options), correct, sort_order],
+        if inserts:
+            execute_values(
+                cur,
+                """INSERT INTO questions (assessment_id, author_id, text, options, correct_answer, sort_order,
+                                          competency_codes) VALUES %s""",
+                inserts,
+                template="(%s, %s, %s, %s::jsonb, %s, %s, %s::jsonb)",
+                page_size=len(inserts),
             )
+    invalidate_answer_key(assess_id)
+    if retagged:
+        invalidate_mastery_cache()
 
 
 def _fetch_with_questions(assess_id: str):
@@ -188,6 +270,13 @@ async def admin_get(request: Request, assess_id: str):
     return ok(_fmt(a, include_questions=True)) if a else not_found()
 
 
+@admin_assess_router.get("/{assess_id}/item-analysis")
+async def admin_item_analysis(request: Request, assess_id: str):
+    auth = permission_required("view_assessments")(request)
+    if not fetchone("SELECT id FROM assessments WHERE id = %s", [assess_id]): return not_found()
+    return ok(await run_in_threadpool(item_analysis, assess_id))
+
+
 @admin_assess_router.post("")
 async def admin_create(request: Request):
     auth = permission_required("create_assessments")(request)
@@ -254,6 +343,7 @@ async def admin_update_status(request: Request, assess_id: str):
         )
 
     execute("UPDATE assessments SET status = %s, updated_at = NOW() WHERE id = %s", [action, assess_id])
+    invalidate_answer_key(assess_id)
     log_action(f"Assessment {action.lower()}", a["title"], assess_id, user_id=auth.user_id, ip=auth.ip)
     return ok({"id": assess_id, "status": action})
 
@@ -284,6 +374,17 @@ async def faculty_get(request: Request, assess_id: str):
     return ok(_fmt(a, include_questions=True)) if a else not_found()
 
 
+@faculty_assess_router.get("/{assess_id}/item-analysis")
+async def faculty_item_analysis(request: Request, assess_id: str):
+    auth = permission_required("view_assessments")(request)
+    a = fetchone(
+        "SELECT id FROM assessments WHERE id = %s AND (author_id = %s OR status = 'APPROVED')",
+        [assess_id, auth.user_id],
+    )
+    if not a: return not_found()
+    return ok(await run_in_threadpool(item_analysis, assess_id))
+
+
 @faculty_assess_router.post("")
 async def faculty_create(request: Request):
     auth = permission_required("create_assessments")(request)
@@ -344,6 +445,7 @@ async def faculty_update(request: Request, assess_id: str):
         change_id = str(change["id"])
 
     execute("UPDATE assessments SET status = 'PENDING', updated_at = NOW() WHERE id = %s", [assess_id])
+    invalidate_answer_key(assess_id)
     log_action("Submitted assessment edit for review", payload["title"], assess_id, user_id=auth.user_id, ip=auth.ip)
 
     a = _fetch_with_questions(assess_id)
@@ -363,6 +465,7 @@ async def faculty_submit(request: Request, assess_id: str):
         return error("Only DRAFT or REVISION_REQUESTED assessments can be submitted")
 
     execute("UPDATE assessments SET status = 'PENDING', updated_at = NOW() WHERE id = %s", [assess_id])
+    invalidate_answer_key(assess_id)
 
     existing_req = fetchone(
         "SELECT id FROM request_changes WHERE target_id = %s AND type = 'ASSESSMENT' AND status = 'PENDING' LIMIT 1",
@@ -418,52 +521,50 @@ async def mobile_get(request: Request, assess_id: str):
 @mobile_assess_router.post("/{assess_id}/submit")
 async def mobile_submit(request: Request, assess_id: str):
     auth = mobile_permission_required("mobile_submit_assessment")(request)
-    a = fetchone("SELECT * FROM assessments WHERE id = %s AND status = 'APPROVED'", [assess_id])
-    if not a: return not_found("Assessment not found or not available")
+    key = get_answer_key(assess_id)
+    if not key: return not_found("Assessment not found or not available")
 
     try: body = await request.json()
     except Exception: body = {}
 
-    questions = fetchall(
-        "SELECT id, text, options, correct_answer FROM questions WHERE assessment_id = %s ORDER BY date_created",
-        [assess_id]
-    )
-    student_answers = {str(ans["question_id"]): ans["answer"] for ans in body.get("answers", [])}
+    idem_key = (request.headers.get("idempotency-key") or body.get("idempotency_key") or "").strip() or None
+    if idem_key and len(idem_key) > submissions.KEY_MAX_LEN:
+        return error(f"Idempotency key must be at most {submissions.KEY_MAX_LEN} characters")
 
-    total   = len(questions)
-    correct = 0
-    scored_ans = []
-
-    for q in questions:
-        qid   = str(q["id"])
-        given = student_answers.get(qid, "")
-        opts  = q.get("options") or []
-        if isinstance(opts, str):
-            opts = json.loads(opts)
-        correct_idx  = q.get("correct_answer", 0)
-        correct_text = str(opts[correct_idx]) if 0 <= correct_idx < len(opts) else ""
-        is_ok = str(given).strip().lower() == correct_text.strip().lower()
-        correct += 1 if is_ok else 0
-        scored_ans.append({"question_id": qid, "answer": given, "correct": is_ok})
-
-    passing_row = fetchone("SELECT institutional_passing_grade FROM system_settings LIMIT 1")
-    pass_grade  = (passing_row or {}).get("institutional_passing_grade", 75)
+    student_answers = {str(ans["question_id"]): ans["answer"] for ans in body.get("answers", [])}
+    correct, correct_mask, choices = key.score(student_answers)
+
+    try:
+        stored = await submissions.ingest(submissions.Submission(
+            assess_id, auth.user_id, correct, key.total,
+            idempotency_key=idem_key, title=key.title, ip=auth.ip,
+            question_ids=key.question_ids, layout_hash=key.layout_hash,
+            correct_mask=correct_mask, choices=choices,
+        ))
+    except IntegrityError:
+        # Only this submission was rejected, e.g. the assessment was deleted since scoring
+        invalidate_answer_key(assess_id)
+        return not_found("Assessment not found or not available")
+    except Exception:
+        # Nothing was acknowledged; retrying with the same key is safe
+        return error("Could not record the submission. Please retry.", 503)
+
+    # A retry reports what was recorded the first time
+    correct, total = stored["score"], stored["total_items"]
+    pass_grade = passing_grade()
     score  = round((correct / total) * 100, 2) if total else 0
     passed = score >= pass_grade
 
-    submission = execute_returning(
-        "INSERT INTO assessment_results (assessment_id, user_id, score, total_items) VALUES (%s, %s, %s, %s) RETURNING id, date_taken",
-        [assess_id, auth.user_id, correct, total],
-    )
-    log_action("Assessment submitted", a["title"], assess_id, user_id=auth.user_id, ip=auth.ip)
     return ok({
-        "submission_id":  str(submission["id"]),
-        "score":          score,
-        "passed":         passed,
-        "correct_count":  correct,
-        "total_items":    total,
-        "passing_grade":  pass_grade,
-        "submitted_at":   submission["date_taken"].isoformat(),
+        "submission_id":   str(stored["id"]),
+        "score":           score,
+        "passed":          passed,
+        "correct_count":   correct,
+        "total_items":     total,
+        "passing_grade":   pass_grade,
+        "submitted_at":    stored["date_taken"].isoformat(),
+        "idempotency_key": stored["idempotency_key"],
+        "duplicate":       stored["duplicate"],
     })
 
 
@@ -476,6 +577,8 @@ async def mobile_result(request: Request, assess_id: str):
     )
     if not sub: return not_found("No submission found")
     sub["id"] = str(sub["id"])
+    for col in ("layout_hash", "correct_mask", "choices", "mastery_applied"):  # answer vectors / bookkeeping stay server-side
+        sub.pop(col, None)
     return ok(sub)
 
 
@@ -553,6 +656,8 @@ def _update(assess_id: str, body: dict, auth, can_approve: bool):
 
     if questions is not None:
         _upsert_questions(assess_id, questions, auth.user_id)
+    else:
+        invalidate_answer_key(assess_id)  # status / title may have changed
 
     # Stage a request_change when faculty submits
     if new_status == "PENDING" and not can_approve:
@@ -584,5 +689,6 @@ def _delete(assess_id: str, auth, only_own: bool):
     if a["status"] == "APPROVED":
         return error("Cannot delete an approved assessment", 409)
     execute("DELETE FROM assessments WHERE id = %s", [assess_id])
+    invalidate_answer_key(assess_id)
     log_action("Deleted assessment", a["title"], assess_id, user_id=auth.user_id, ip=auth.ip)
     return no_content()
\ No newline at end of file
@@ -3,7 +3,6 @@ Auth routes — shared logic, two routers:
   /api/web/auth    → web_auth_router   (ADMIN + FACULTY only)
   /api/mobile/auth → mobile_auth_router (STUDENT only)
 """
-import bcrypt
 from fastapi import APIRouter, Request, Response, BackgroundTasks
 from fastapi.responses import JSONResponse
 from app.db import fetchone, fetchall, execute, execute_returning
@@ -18,6 +17,7 @@ from app.utils.responses import accout_removed, ok, error, unauthorized, created
 from app.utils.validators import validate_email, validate_password, require_fields, clean_str
 from app.utils.log import log_action
 from app.utils.email import queue_email
+from app.utils.passwords import hash_password, check_password
 
 web_auth_router    = APIRouter(prefix="/api/web/auth",    tags=["web-auth"])
 mobile_auth_router = APIRouter(prefix="/api/mobile/auth", tags=["mobile-auth"])
@@ -114,7 +114,7 @@ def _build_login_response(user):
     return response
 
 
-def _register(body: dict, expected_role: str, background_tasks: BackgroundTasks):
+async def _register(body: dict, expected_role: str, background_tasks: BackgroundTasks):
     required = ["cvsu_id", "first_name", "last_name", "email", "password"]
     missing = require_fields(body, required)
     if missing:
@@ -128,7 +128,7 @@ def _register(body: dict, expected_role: str, background_tasks: BackgroundTasks)
     if pw_err:
         return error(pw_err)
 
-    hashed = bcrypt.hashpw(body["password"].encode(), bcrypt.gensalt()).decode()
+    hashed = await hash_password(body["password"])
 
     if fetchone("SELECT id FROM users WHERE LOWER(email) = %s AND status != 'REMOVED'", [email]):
         return error("An account with this email is already registered. Please log in.", 409)
@@ -266,7 +266,7 @@ async def web_login(request: Request):
     user = _fetch_user_by_email(body["email"])
     if not user:
         return unauthorized("Invalid credentials")
-    if not bcrypt.checkpw(body["password"].encode(), user["password"].encode()):
+    if not await check_password(body["password"], user["password"]):
         return unauthorized("Invalid credentials")
 
     user, err = _do_login(user, ["ADMIN", "FACULTY"])
@@ -281,7 +281,7 @@ async def web_register(request: Request, background_tasks: BackgroundTasks):
         body = await request.json()
     except Exception:
         body = {}
-    return _register(body, "FACULTY", background_tasks)
+    return await _register(body, "FACULTY", background_tasks)
 
 
 @web_auth_router.post("/logout")
@@ -320,7 +320,7 @@ async def mobile_login(request: Request):
     user = _fetch_user_by_email(body["email"])
     if not user:
         return unauthorized("Invalid credentials")
-    if not bcrypt.checkpw(body["password"].encode(), user["password"].encode()):
+    if not await check_password(body["password"], user["password"]):
         return unauthorized("Invalid credentials")
 
     user, err = _do_login(user, ["STUDENT"])
@@ -361,7 +361,7 @@ async def mobile_register(request: Request, background_tasks: BackgroundTasks):
         body = await request.json()
     except Exception:
         body = {}
-    return _register(body, "STUDENT", background_tasks)
+    return await _register(body, "STUDENT", background_tasks)
 
 
 @mobile_auth_router.post("/logout")
@@ -442,7 +442,7 @@ async def web_signup(request: Request, background_tasks: BackgroundTasks):
         [email, clean_str(body["cvsu_id"]), role_name],
     )
 
-    hashed = bcrypt.hashpw(body["password"].encode(), bcrypt.gensalt()).decode()
+    hashed = await hash_password(body["password"])
 
     if wl_entry:
         user = execute_returning(
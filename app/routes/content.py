@@ -18,6 +18,7 @@ def _list_all_modules(request: Request, role: str, user_id: str = None):
     
     sql = """
         SELECT m.id, m.title, m.format, m.status, m.created_at, m.updated_at,
+               COALESCE(OCTET_LENGTH(m.content), 0) AS content_length,
                s.name AS subject_name, s.id AS subject_id,
                u.first_name || ' ' || u.last_name AS author_name
         FROM modules m
@@ -13,6 +13,7 @@ from app.utils.responses import ok, created, no_content, error, not_found, forbi
 from app.utils.pagination import get_page_params, get_search
 from app.utils.validators import require_fields, clean_str
 from app.utils.log import log_action
+from app.utils.answer_keys import invalidate_passing_grade
 
 settings_router   = APIRouter(prefix="/api/web/admin/settings", tags=["settings"])
 admin_logs_router = APIRouter(prefix="/api/web/admin/logs",     tags=["admin-logs"])
@@ -56,6 +57,7 @@ async def update_settings(request: Request):
             clean_str(body.get("academic_year", s["academic_year"]))
         ]
     )
+    invalidate_passing_grade()
     log_action("Updated system settings", user_id=auth.user_id, ip=auth.ip)
     updated["id"] = str(updated["id"])
     return ok(updated)
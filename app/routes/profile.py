@@ -3,12 +3,15 @@ Mobile student profile routes.
   PATCH /api/mobile/student/profile  — update own profile fields
   GET   /api/mobile/student/profile  — fetch own profile
 """
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from app.db import fetchone, execute_returning
 from app.middleware.auth import mobile_permission_required
 from app.utils.responses import ok, error, not_found
 from app.utils.validators import clean_str
-from app.utils.storage import validate_and_normalise_avatar, upload_avatar_bytes
+from app.utils.storage import validate_and_normalise_avatar
+from app.utils import storage_async
+from app.utils.avatars import transcode_avatar, version_tag, FULL_SIZE
 
 mobile_profile_router = APIRouter(
     prefix="/api/mobile/student/profile",
@@ -39,6 +42,19 @@ def get_preset_url(index: int) -> str | None:
     return f"preset:{letters[index]}"
 
 
+async def _store_photo_avatar(img_bytes: bytes, user_id: str, first_name: str, mime_type: str) -> str:
+    """
+    Transcode to the WebP size set and upload; the 256 px URL (with a
+    content-hash version) is what gets stored. Falls back to the raw upload
+    when Pillow is not installed.
+    """
+    variants = await run_in_threadpool(transcode_avatar, img_bytes)
+    if variants is None:
+        return await storage_async.upload_avatar_bytes(img_bytes, user_id, first_name, mime_type)
+    urls = await storage_async.upload_avatar_variants(variants, user_id)
+    return f"{urls[FULL_SIZE]}?v={version_tag(variants)}"
+
+
 def _fmt_profile(u: dict) -> dict:
     u["id"] = str(u["id"])
     u.pop("password", None)
@@ -69,7 +85,7 @@ async def get_profile(request: Request):
 
 
 @mobile_profile_router.patch("")
-async def update_profile(request: Request):
+async def update_profile(request: Request, background_tasks: BackgroundTasks):
     auth = mobile_permission_required("mobile_edit_profile")(request)
     try:
         body = await request.json()
@@ -104,6 +120,7 @@ async def update_profile(request: Request):
 
     set_clauses = []
     params = []
+    replaced_avatar = None
 
     for field, (col, transform) in UPDATABLE_FIELDS.items():
         if field in body:
@@ -121,10 +138,11 @@ async def update_profile(request: Request):
                     mime_type  = mime_match.group(1) if mime_match else "image/png"
                     raw_b64    = value.split(",", 1)[1]
                     img_bytes  = _b64.b64decode(raw_b64)
-                    # Fetch first_name from DB for the filename
-                    user_row   = fetchone("SELECT first_name FROM users WHERE id = %s", [auth.user_id])
+                    # Fetch first_name from DB for the fallback filename
+                    user_row   = fetchone("SELECT first_name, photo_avatar FROM users WHERE id = %s", [auth.user_id])
                     first_name = (user_row or {}).get("first_name", "user")
-                    value = upload_avatar_bytes(img_bytes, str(auth.user_id), first_name, mime_type)
+                    value = await _store_photo_avatar(img_bytes, str(auth.user_id), first_name, mime_type)
+                    replaced_avatar = (user_row or {}).get("photo_avatar")
                 except Exception as e:
                     return error(f"Invalid profile photo: {str(e)}")
             
@@ -146,6 +164,10 @@ async def update_profile(request: Request):
         updated = execute_returning(sql, params)
         if not updated:
             return not_found("User not found")
+        # Legacy .png upload superseded by the WebP variants — drop it
+        old_path = (replaced_avatar or "").split("?", 1)[0]
+        if old_path and old_path != (updated.get("photo_avatar") or "").split("?", 1)[0]:
+            storage_async.queue_storage_cleanup(background_tasks, [old_path])
         return ok(_fmt_profile(updated))
     except Exception as e:
         print(f"[PROFILE] Database update error: {e}")
@@ -1,32 +1,45 @@
 """
 Subjects routes - Admin, Faculty, and Mobile (Student)
 """
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, UploadFile, File, Form, BackgroundTasks
 from app.db import fetchone, fetchall, execute, execute_returning, paginate
 from app.middleware.auth import login_required, permission_required, mobile_permission_required
-from app.utils.responses import ok, created, no_content, error, not_found, forbidden
+from app.utils.responses import ok, ok_etag, created, no_content, error, not_found, forbidden
 from app.utils.pagination import get_page_params, get_search
 from app.utils.validators import require_fields, clean_str
 from app.utils.log import log_action
-from app.utils.storage import upload_pdf_bytes, delete_pdf_by_url, _slugify, DuplicateFileError
+from app.utils.storage import _slugify, DuplicateFileError
+from app.utils import storage_async
+from app.utils.tos_index import (
+    active_tos_subject_names, active_tos_subject_ids,
+    sync_tos_subject_ids, invalidate_tos_index,
+)
+from app.utils.mastery import invalidate_mastery_cache
 import json
+import re
+import uuid
 from psycopg2.extras import Json as PgJson
 
 admin_subjects_router   = APIRouter(prefix="/api/web/admin/subjects",         tags=["admin-subjects"])
 faculty_subjects_router = APIRouter(prefix="/api/web/faculty/subjects",       tags=["faculty-subjects"])
 mobile_subjects_router  = APIRouter(prefix="/api/mobile/student/subjects",    tags=["mobile-subjects"])
 
+_UPLOAD_CHUNK_SIZE = 256 * 1024
+_UNSAFE_NAME_RE    = re.compile(r"[^a-zA-Z0-9._-]")
+_CONTENT_BATCH_MAX = 100
+
+# Trees carry metadata only; bodies come from the single-module / batch
+# content endpoints. content_length is in bytes; Postgres answers it from the
+# TOAST header without decompressing the body.
+_MODULE_META_COLS = """t.id, t.subject_id, t.parent_id, t.title, t.description, t.type, t.format,
+                       t.file_url, t.file_name, t.tos_section, t.sort_order, t.status,
+                       t.created_by, t.created_at, t.updated_at,
+                       COALESCE(OCTET_LENGTH(t.content), 0) AS content_length"""
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CORE HELPERS & CONDITIONAL ACCESS LOGIC
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _get_active_tos_subjects() -> list[str] | None:
-    row = fetchone("SELECT data FROM tos_versions WHERE status = 'ACTIVE' LIMIT 1")
-    if not row: return None
-    data = row.get("data") or {}
-    subjects_list = data.get("subjects") or []
-    return [s["subject"] for s in subjects_list if s.get("subject")]
-
 def _format_module(m: dict) -> dict:
     m["id"] = str(m["id"])
     m["subject_id"] = str(m["subject_id"])
@@ -36,6 +49,8 @@ def _format_module(m: dict) -> dict:
     m["fileName"] = m.pop("file_name", None)
     m["tos_section"] = m.get("tos_section")
     if not m.get("type"): m["type"] = "MODULE"
+    if "content_length" not in m:
+        m["content_length"] = len((m.get("content") or "").encode())
     
     if m.get("format") == "PDF":
         m["fileData"] = m.pop("content", None)
@@ -44,27 +59,78 @@ def _format_module(m: dict) -> dict:
         
     return m
 
-def _build_module_tree(subject_id: str, parent_id=None, role: str = "ADMIN", user_id: str = None) -> list:
-    sql = """SELECT t.*, u.first_name || ' ' || u.last_name AS created_by_name
-             FROM modules t LEFT JOIN users u ON u.id = t.created_by
-             WHERE t.subject_id = %s AND t.parent_id IS NOT DISTINCT FROM %s"""
-    params = [subject_id, parent_id]
-
+def _visibility_sql(role: str, user_id: str = None) -> tuple:
+    """Extra WHERE clause (alias t) limiting modules to what the role may see."""
     if role == "FACULTY":
-        sql += " AND (t.status = 'APPROVED' OR t.created_by = %s)"
-        params.append(user_id)
-    elif role == "STUDENT":
-        sql += " AND t.status = 'APPROVED'"
-
-    sql += " ORDER BY t.sort_order, t.created_at"
-    
-    rows = fetchall(sql, params)
-    result = []
+        return " AND (t.status = 'APPROVED' OR t.created_by = %s)", [user_id]
+    if role == "STUDENT":
+        return " AND t.status = 'APPROVED'", []
+    return "", []
+
+def _fetch_module_rows(subject_id: str, role: str = "ADMIN", user_id: str = None) -> list:
+    """Every module of a subject visible to the role, in sibling order — one query, no bodies."""
+    where, extra = _visibility_sql(role, user_id)
+    sql = f"""SELECT {_MODULE_META_COLS}, u.first_name || ' ' || u.last_name AS created_by_name
+              FROM modules t LEFT JOIN users u ON u.id = t.created_by
+              WHERE t.subject_id = %s{where}
+              ORDER BY t.sort_order, t.created_at"""
+    return fetchall(sql, [subject_id] + extra)
+
+def _module_contents(request: Request, subject_id: str, role: str, user_id: str = None):
+    """
+    Shared body of GET /{subject_id}/modules/batch?ids=a,b,c — full modules
+    (content / fileData included) for the requested ids, ETagged on the payload.
+    """
+    ids = [i.strip() for i in request.query_params.get("ids", "").split(",") if i.strip()]
+    if not ids:
+        return error("ids is required", 400)
+    if len(ids) > _CONTENT_BATCH_MAX:
+        return error(f"At most {_CONTENT_BATCH_MAX} ids per request", 400)
+    try:
+        ids = [str(uuid.UUID(i)) for i in ids]
+    except ValueError:
+        return error("ids must be UUIDs", 400)
+
+    where, extra = _visibility_sql(role, user_id)
+    rows = fetchall(
+        f"""SELECT t.*, u.first_name || ' ' || u.last_name AS created_by_name
+            FROM modules t LEFT JOIN users u ON u.id = t.created_by
+            WHERE t.subject_id = %s AND t.id = ANY(%s::uuid[]){where}
+            ORDER BY t.sort_order, t.created_at""",
+        [subject_id, ids] + extra,
+    )
+    return ok_etag(request, [_format_module(r) for r in rows])
+
+def _assemble_module_tree(rows: list, parent_id=None) -> list:
+    """
+    Nest flat module rows under parent_id in O(n). Sibling order follows the
+    row order; nodes under a filtered-out (or missing) parent are dropped,
+    exactly as a level-by-level walk would.
+    """
+    children = {}
     for r in rows:
-        r = _format_module(r)
-        r["subTopics"] = _build_module_tree(subject_id, r["id"], role, user_id)
-        result.append(r)
-    return result
+        children.setdefault(str(r["parent_id"]) if r.get("parent_id") else None, []).append(r)
+
+    seen = set()
+
+    def build(pid):
+        result = []
+        for r in children.get(pid, ()):
+            r = _format_module(r)
+            if r["id"] in seen:  # malformed parent cycle
+                continue
+            seen.add(r["id"])
+            r["subTopics"] = build(r["id"])
+            result.append(r)
+        return result
+
+    root = str(parent_id) if parent_id else None
+    if root:
+        seen.add(root)
+    return build(root)
+
+def _build_module_tree(subject_id: str, parent_id=None, role: str = "ADMIN", user_id: str = None) -> list:
+    return _assemble_module_tree(_fetch_module_rows(subject_id, role, user_id), parent_id)
 
 def _get_subject_tree(subject_id: str, role: str = "ADMIN", user_id: str = None) -> dict | None:
     s = fetchone(
@@ -99,13 +165,11 @@ def _list_subjects(request: Request, role: str):
         params += [search, search]
 
     if active_tos_only:
-        active_subjects = _get_active_tos_subjects()
-        if active_subjects is None or len(active_subjects) == 0:
+        if not active_tos_subject_names():
             sql.append("AND 1=0")
         else:
-            placeholders = ",".join(["%s"] * len(active_subjects))
-            sql.append(f"AND s.name IN ({placeholders})")
-            params += active_subjects
+            sql.append("AND s.id = ANY(%s::uuid[])")
+            params.append(active_tos_subject_ids())
         
     sql.append("ORDER BY s.name")
     result = paginate(" ".join(sql), params, page, per_page)
@@ -113,19 +177,27 @@ def _list_subjects(request: Request, role: str):
     for s in result["items"]:
         s["id"] = str(s["id"])
         s["passingRate"] = s.pop("passing_rate", 75)
-        
-        if role == "ADMIN":
-            cnt_mod = fetchone("SELECT COUNT(*) AS c FROM modules WHERE subject_id = %s AND type = 'MODULE'", [s["id"]])
-            cnt_ebook = fetchone("SELECT COUNT(*) AS c FROM modules WHERE subject_id = %s AND type = 'E-BOOK'", [s["id"]])
-        else:
-            cnt_mod = fetchone("SELECT COUNT(*) AS c FROM modules WHERE subject_id = %s AND type = 'MODULE' AND status = 'APPROVED'", [s["id"]])
-            cnt_ebook = fetchone("SELECT COUNT(*) AS c FROM modules WHERE subject_id = %s AND type = 'E-BOOK' AND status = 'APPROVED'", [s["id"]])
-        
-        s["module_count"] = cnt_mod["c"] if cnt_mod else 0
-        s["ebook_count"] = cnt_ebook["c"] if cnt_ebook else 0
+    _attach_module_counts(result["items"], approved_only=role != "ADMIN")
         
     return result
 
+def _attach_module_counts(items: list, approved_only: bool) -> None:
+    """Sets module_count / ebook_count on a page of subjects with one grouped query."""
+    if not items:
+        return
+    sql = """SELECT subject_id,
+                    COUNT(*) FILTER (WHERE type = 'MODULE') AS module_count,
+                    COUNT(*) FILTER (WHERE type = 'E-BOOK') AS ebook_count
+             FROM modules WHERE subject_id = ANY(%s::uuid[])"""
+    if approved_only:
+        sql += " AND status = 'APPROVED'"
+    sql += " GROUP BY subject_id"
+    counts = {str(r["subject_id"]): r for r in fetchall(sql, [[str(s["id"]) for s in items]])}
+    for s in items:
+        c = counts.get(str(s["id"]))
+        s["module_count"] = c["module_count"] if c else 0
+        s["ebook_count"]  = c["ebook_count"]  if c else 0
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # ADMIN ROUTES (Full Access)
@@ -142,6 +214,11 @@ async def admin_get(request: Request, subject_id: str):
     s = _get_subject_tree(subject_id, "ADMIN", auth.user_id)
     return ok(s) if s else not_found()
 
+@admin_subjects_router.get("/{subject_id}/modules/batch")
+async def admin_module_contents(request: Request, subject_id: str):
+    auth = permission_required("view_subjects")(request)
+    return _module_contents(request, subject_id, "ADMIN", auth.user_id)
+
 @admin_subjects_router.post("")
 async def admin_create(request: Request):
     auth = permission_required("create_subjects")(request)
@@ -154,6 +231,8 @@ async def admin_create(request: Request):
         [clean_str(body["name"]), clean_str(body.get("description")), body.get("color", "#6366f1"), 
          int(body.get("weight", 0)), int(body.get("passingRate", 75)), auth.user_id],
     )
+    sync_tos_subject_ids()
+    invalidate_mastery_cache()
     log_action("Created subject", s["name"], str(s["id"]), user_id=auth.user_id, ip=auth.ip)
     return created(_get_subject_tree(str(s["id"]), "ADMIN"))
 
@@ -201,6 +280,10 @@ async def admin_bulk_create_from_tos(request: Request):
         except Exception as e:
             failed.append({"name": subj_name, "reason": str(e)})
     
+    if created:
+        sync_tos_subject_ids()
+        invalidate_mastery_cache()
+
     return ok({
         "created": created, "existing": existing, "failed": failed,
         "summary": {"total": len(tos_subjects), "created_count": len(created), "existing_count": len(existing), "failed_count": len(failed)}
@@ -221,21 +304,25 @@ async def admin_update(request: Request, subject_id: str):
          body.get("color", s["color"]), int(body.get("weight", s.get("weight", 0))), 
          int(body.get("passingRate", s.get("passing_rate", 75))), subject_id],
     )
+    if updated["name"] != s["name"]:
+        sync_tos_subject_ids()
+        invalidate_mastery_cache()
     log_action("Updated subject", updated["name"], subject_id, user_id=auth.user_id, ip=auth.ip)
     return ok(_get_subject_tree(subject_id, "ADMIN"))
 
 @admin_subjects_router.delete("/{subject_id}")
-async def admin_delete(request: Request, subject_id: str):
+async def admin_delete(request: Request, subject_id: str, background_tasks: BackgroundTasks):
     auth = permission_required("delete_subjects")(request)
     s = fetchone("SELECT name FROM subjects WHERE id = %s", [subject_id])
     if not s: return not_found()
     
-    # ─── ADDED: CLEANUP PDFs BEFORE DELETING SUBJECT ───
+    # ─── CLEANUP PDFs AFTER DELETING SUBJECT (batched, off the request path) ───
     modules = fetchall("SELECT file_url FROM modules WHERE subject_id = %s AND format = 'PDF' AND file_url IS NOT NULL", [subject_id])
-    for m in modules:
-        delete_pdf_by_url(m["file_url"])
 
     execute("DELETE FROM subjects WHERE id = %s", [subject_id])
+    invalidate_tos_index()
+    invalidate_mastery_cache()
+    storage_async.queue_storage_cleanup(background_tasks, [m["file_url"] for m in modules])
     log_action("Deleted subject", s["name"], subject_id, user_id=auth.user_id, ip=auth.ip)
     return ok()
 
@@ -244,14 +331,44 @@ async def admin_add_module(request: Request, subject_id: str):
     auth = permission_required("create_content")(request)
     try: body = await request.json()
     except Exception: body = {}
-    return _add_module(subject_id, body, auth, auto_approve=True)
+    return await _add_module(subject_id, body, auth, auto_approve=True)
 
 @admin_subjects_router.put("/{subject_id}/modules/{module_id}")
 async def admin_update_module(request: Request, subject_id: str, module_id: str):
     auth = permission_required("edit_content")(request)
     try: body = await request.json()
     except Exception: body = {}
-    return _update_module(module_id, body, auth, auto_approve=True)
+    return await _update_module(module_id, body, auth, auto_approve=True)
+
+@admin_subjects_router.post("/{subject_id}/modules/upload")
+async def admin_add_module_upload(
+    request: Request, subject_id: str,
+    file: UploadFile = File(...),
+    title: str = Form(...),
+    description: str = Form(None),
+    module_type: str = Form("MODULE", alias="type"),
+    parent_id: str = Form(None),
+    tos_section: str = Form(None),
+    sort_order: int = Form(0),
+):
+    auth = permission_required("create_content")(request)
+    body = _upload_form_body(file, title=title, description=description, type=module_type,
+                             parent_id=parent_id, tos_section=tos_section, sort_order=sort_order)
+    return await _add_module(subject_id, body, auth, auto_approve=True, upload=file)
+
+@admin_subjects_router.put("/{subject_id}/modules/{module_id}/upload")
+async def admin_update_module_upload(
+    request: Request, subject_id: str, module_id: str,
+    file: UploadFile = File(...),
+    title: str = Form(None),
+    description: str = Form(None),
+    tos_section: str = Form(None),
+    sort_order: int = Form(None),
+):
+    auth = permission_required("edit_content")(request)
+    body = _upload_form_body(file, title=title, description=description,
+                             tos_section=tos_section, sort_order=sort_order)
+    return await _update_module(module_id, body, auth, auto_approve=True, upload=file)
 
 @admin_subjects_router.delete("/{subject_id}/modules/{module_id}")
 async def admin_delete_module(request: Request, subject_id: str, module_id: str):
@@ -260,7 +377,7 @@ async def admin_delete_module(request: Request, subject_id: str, module_id: str)
     # ─── ADDED: CLEANUP PDF BEFORE DELETING MODULE ───
     m = fetchone("SELECT file_url, format FROM modules WHERE id = %s AND subject_id = %s", [module_id, subject_id])
     if m and m.get("format") == "PDF" and m.get("file_url"):
-        delete_pdf_by_url(m["file_url"])
+        await storage_async.delete_pdf_by_url(m["file_url"])
 
     execute("DELETE FROM modules WHERE id = %s AND subject_id = %s", [module_id, subject_id])
     return no_content()
@@ -280,29 +397,89 @@ async def faculty_get(request: Request, subject_id: str):
     s = _get_subject_tree(subject_id, "FACULTY", auth.user_id)
     return ok(s) if s else not_found()
 
+@faculty_subjects_router.get("/{subject_id}/modules/batch")
+async def faculty_module_contents(request: Request, subject_id: str):
+    auth = permission_required("view_subjects")(request)
+    return _module_contents(request, subject_id, "FACULTY", auth.user_id)
+
 @faculty_subjects_router.post("/{subject_id}/modules")
 async def faculty_add_module(request: Request, subject_id: str):
     auth = permission_required("create_content")(request)
     try: body = await request.json()
     except Exception: body = {}
-    return _add_module(subject_id, body, auth, auto_approve=True)
+    return await _add_module(subject_id, body, auth, auto_approve=True)
 
 @faculty_subjects_router.put("/{subject_id}/modules/{module_id}")
 async def faculty_update_module(request: Request, subject_id: str, module_id: str):
     auth = permission_required("edit_content")(request)
     try: body = await request.json()
     except Exception: body = {}
-    return _update_module(module_id, body, auth, auto_approve=True)
+    return await _update_module(module_id, body, auth, auto_approve=True)
+
+@faculty_subjects_router.post("/{subject_id}/modules/upload")
+async def faculty_add_module_upload(
+    request: Request, subject_id: str,
+    file: UploadFile = File(...),
+    title: str = Form(...),
+    description: str = Form(None),
+    module_type: str = Form("MODULE", alias="type"),
+    parent_id: str = Form(None),
+    tos_section: str = Form(None),
+    sort_order: int = Form(0),
+):
+    auth = permission_required("create_content")(request)
+    body = _upload_form_body(file, title=title, description=description, type=module_type,
+                             parent_id=parent_id, tos_section=tos_section, sort_order=sort_order)
+    return await _add_module(subject_id, body, auth, auto_approve=True, upload=file)
+
+@faculty_subjects_router.put("/{subject_id}/modules/{module_id}/upload")
+async def faculty_update_module_upload(
+    request: Request, subject_id: str, module_id: str,
+    file: UploadFile = File(...),
+    title: str = Form(None),
+    description: str = Form(None),
+    tos_section: str = Form(None),
+    sort_order: int = Form(None),
+):
+    auth = permission_required("edit_content")(request)
+    body = _upload_form_body(file, title=title, description=description,
+                             tos_section=tos_section, sort_order=sort_order)
+    return await _update_module(module_id, body, auth, auto_approve=True, upload=file)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # SHARED TOPIC WRITE HELPERS
 # ─────────────────────────────────────────────────────────────────────────────
 
-# ─────────────────────────────────────────────────────────────────────────────
-# SHARED TOPIC WRITE HELPERS
-# ─────────────────────────────────────────────────────────────────────────────
+def _upload_form_body(file: UploadFile, **fields) -> dict:
+    """Shape multipart form fields like the JSON body the write helpers expect."""
+    body = {k: v for k, v in fields.items() if v is not None}
+    body["format"] = "PDF"
+    body["fileName"] = file.filename or "document.pdf"
+    return body
+
+
+async def _iter_upload(file: UploadFile):
+    # Starlette has already spooled the part to disk; read it back chunk by chunk
+    while True:
+        chunk = await file.read(_UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _store_module_upload(file: UploadFile, safe_name: str, subject_name: str) -> str:
+    """Stream a multipart PDF straight into the subject's bucket."""
+    head = await file.read(5)
+    if head != b"%PDF-":
+        raise ValueError("Uploaded file is not a PDF.")
+    await file.seek(0)
+    return await storage_async.upload_pdf_stream(
+        _iter_upload(file), filename=safe_name, bucket_name=_slugify(subject_name),
+        content_length=file.size,
+    )
+
 
-def _add_module(subject_id: str, body: dict, auth, auto_approve: bool):
+async def _add_module(subject_id: str, body: dict, auth, auto_approve: bool, upload: UploadFile = None):
     subj = fetchone("SELECT id, name FROM subjects WHERE id = %s", [subject_id])
     if not subj: return not_found("Subject not found")
     if require_fields(body, ["title"]): return error("Missing title")
@@ -313,20 +490,25 @@ def _add_module(subject_id: str, body: dict, auth, auto_approve: bool):
     content_payload = body.get("content")
     
     # 1. Catch PDF Upload Errors
-    if body.get("format") == "PDF" and body.get("fileData"):
-        import base64 as _b64, re as _re
+    if upload is not None or (body.get("format") == "PDF" and body.get("fileData")):
+        import base64 as _b64
         try:
-            raw_b64 = body["fileData"].split(",", 1)[-1] if "," in body["fileData"] else body["fileData"]
-            pdf_bytes = _b64.b64decode(raw_b64)
-            safe_name = _re.sub(r"[^a-zA-Z0-9._-]", "_", body.get("fileName", "document.pdf"))
-            
-            # Map the subject name directly to the dynamic bucket name
-            file_url = upload_pdf_bytes(pdf_bytes, filename=safe_name, bucket_name=_slugify(subj["name"]))
+            safe_name = _UNSAFE_NAME_RE.sub("_", body.get("fileName", "document.pdf"))
+            if upload is not None:
+                file_url = await _store_module_upload(upload, safe_name, subj["name"])
+            else:
+                raw_b64 = body["fileData"].split(",", 1)[-1] if "," in body["fileData"] else body["fileData"]
+                pdf_bytes = _b64.b64decode(raw_b64)
+                # Map the subject name directly to the dynamic bucket name
+                file_url = await storage_async.upload_pdf_bytes(pdf_bytes, filename=safe_name, bucket_name=_slugify(subj["name"]))
             content_payload = None
             
         except DuplicateFileError as e:
             # Send clean 409 Conflict error directly to frontend UI
             return error(str(e), 409)
+
+        except ValueError as e:
+            return error(str(e), 400)
             
         except Exception as e:
             import traceback
@@ -361,7 +543,7 @@ def _add_module(subject_id: str, body: dict, auth, auto_approve: bool):
         return error(f"Database insertion failed: {str(e)}", 500)
 
 
-def _update_module(module_id: str, body: dict, auth, auto_approve: bool):
+async def _update_module(module_id: str, body: dict, auth, auto_approve: bool, upload: UploadFile = None):
     existing = fetchone("SELECT * FROM modules WHERE id = %s", [module_id])
     if not existing: return not_found("Module not found")
     
@@ -371,20 +553,25 @@ def _update_module(module_id: str, body: dict, auth, auto_approve: bool):
     file_url = body.get("fileUrl", existing.get("file_url"))
     content_payload = body.get("content", existing.get("content"))
     
-    if body.get("format") == "PDF" and body.get("fileData"):
-        import base64 as _b64, re as _re
+    if upload is not None or (body.get("format") == "PDF" and body.get("fileData")):
+        import base64 as _b64
         try:
-            raw_b64 = body["fileData"].split(",", 1)[-1] if "," in body["fileData"] else body["fileData"]
-            pdf_bytes = _b64.b64decode(raw_b64)
-            safe_name = _re.sub(r"[^a-zA-Z0-9._-]", "_", body.get("fileName") or existing.get("file_name") or "document.pdf")
-            
-            # Map the subject name directly to the dynamic bucket name
-            file_url = upload_pdf_bytes(pdf_bytes, filename=safe_name, bucket_name=_slugify(subj["name"]))
+            safe_name = _UNSAFE_NAME_RE.sub("_", body.get("fileName") or existing.get("file_name") or "document.pdf")
+            if upload is not None:
+                file_url = await _store_module_upload(upload, safe_name, subj["name"])
+            else:
+                raw_b64 = body["fileData"].split(",", 1)[-1] if "," in body["fileData"] else body["fileData"]
+                pdf_bytes = _b64.b64decode(raw_b64)
+                # Map the subject name directly to the dynamic bucket name
+                file_url = await storage_async.upload_pdf_bytes(pdf_bytes, filename=safe_name, bucket_name=_slugify(subj["name"]))
             content_payload = None
             
         except DuplicateFileError as e:
             # Send clean 409 Conflict error directly to frontend UI
             return error(str(e), 409)
+
+        except ValueError as e:
+            return error(str(e), 400)
             
         except Exception as e:
             import traceback
@@ -432,7 +619,7 @@ def _update_module(module_id: str, body: dict, auth, auto_approve: bool):
         if old_file_url and existing.get("format") == "PDF":
             new_format = body.get("format", existing.get("format", "TEXT"))
             if new_format != "PDF" or file_url != old_file_url:
-                delete_pdf_by_url(old_file_url)
+                await storage_async.delete_pdf_by_url(old_file_url)
 
         updated = execute_returning(
             """UPDATE modules SET title = %s, description = %s, content = %s,
@@ -496,15 +683,14 @@ async def mobile_list_subjects(request: Request):
         sql += " AND LOWER(s.name) LIKE LOWER(%s)"
         params.append(f"%{search}%")
 
-    active_tos_subjects = _get_active_tos_subjects()
+    active_tos_subjects = active_tos_subject_names()
     if active_tos_subjects is None:
         pass
     elif len(active_tos_subjects) == 0:
         sql += " AND 1=0"
     else:
-        placeholders = ",".join(["%s"] * len(active_tos_subjects))
-        sql += f" AND s.name IN ({placeholders})"
-        params += active_tos_subjects
+        sql += " AND s.id = ANY(%s::uuid[])"
+        params.append(active_tos_subject_ids())
 
     sql += " ORDER BY s.name"
     from app.db import paginate
@@ -513,10 +699,7 @@ async def mobile_list_subjects(request: Request):
     for r in result["items"]:
         r["id"] = str(r["id"])
         if r.get("created_by"): r["created_by"] = str(r["created_by"])
-        cnt_mod   = fetchone("SELECT COUNT(*) AS c FROM modules WHERE subject_id = %s AND type = 'MODULE'  AND status = 'APPROVED'", [r["id"]])
-        cnt_ebook = fetchone("SELECT COUNT(*) AS c FROM modules WHERE subject_id = %s AND type = 'E-BOOK' AND status = 'APPROVED'", [r["id"]])
-        r["module_count"] = cnt_mod["c"]   if cnt_mod   else 0
-        r["ebook_count"]  = cnt_ebook["c"] if cnt_ebook else 0
+    _attach_module_counts(result["items"], approved_only=True)
 
     return ok(result)
 
@@ -532,6 +715,12 @@ async def mobile_get_subject(request: Request, subject_id: str):
     return ok(subject)
 
 
+@mobile_subjects_router.get("/{subject_id}/modules/batch")
+async def mobile_module_contents(request: Request, subject_id: str):
+    auth = mobile_permission_required("mobile_view_modules")(request)
+    return _module_contents(request, subject_id, "STUDENT")
+
+
 @mobile_subjects_router.get("/{subject_id}/modules/{module_id}")
 async def mobile_get_module(request: Request, subject_id: str, module_id: str):
     auth = mobile_permission_required("mobile_view_modules")(request)
@@ -544,7 +733,7 @@ async def mobile_get_module(request: Request, subject_id: str, module_id: str):
     if not m: return not_found("Module not found")
     formatted = _format_module(m)
     formatted["subTopics"] = _build_module_tree(subject_id, module_id, "STUDENT")
-    return ok(formatted)
+    return ok_etag(request, formatted)
 
 
 @mobile_subjects_router.post("/{subject_id}/modules/{module_id}/read")
@@ -40,19 +40,25 @@ The TOS data structure (tos_versions.data) mirrors extractor.py output:
 import hashlib
 import os
 import tempfile
+import time
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Path, Request, UploadFile, File, Form
+from fastapi import APIRouter, Path, Request, UploadFile, File, Form, BackgroundTasks
 from fastapi.responses import RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from psycopg2.extras import Json as PgJson
 
-from app.db import fetchone, fetchall, execute, execute_returning, paginate
+from app.db import fetchone, fetchall, execute, execute_returning, paginate, get_cursor
 from app.middleware.auth import login_required, permission_required
-from app.utils.responses import ok, created, no_content, error, not_found
+from app.utils.responses import ok, created, no_content, error, not_found, not_modified, etag_matches, json_bytes
 from app.utils.pagination import get_page_params, get_search
 from app.utils.validators import clean_str
 from app.utils.log import log_action
-from app.utils.storage import upload_pdf_bytes, delete_pdf_by_url
+from app.utils import storage_async
+from app.utils.tos_index import rebuild_tos_subjects, invalidate_tos_index
+from app.utils.mastery import invalidate_mastery_cache
+from app.utils.compression import PrecompressedCache
+from app.utils import metrics
 
 admin_tos_router  = APIRouter(prefix="/api/web/admin/tos",    tags=["tos"])
 faculty_tos_router = APIRouter(prefix="/api/web/faculty/tos", tags=["tos-faculty"])
@@ -61,6 +67,13 @@ mobile_tos_router = APIRouter(prefix="/api/mobile/tos",      tags=["tos-mobile"]
 # ── Extractor module (lives at app/extractor/extractor.py) ────────────────────
 from app.extractor import extractor as _ext
 
+# Read size for streaming uploads to disk (1 MiB keeps memory flat per request)
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Serialized (and lazily compressed) body of the ACTIVE version, keyed by its
+# ETag. updated_at moves on every activate/edit, so a stale entry can never match.
+_active_payload_cache = PrecompressedCache(max_entries=1)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Helpers
@@ -79,10 +92,51 @@ def _serialize(row: dict) -> dict:
     return row
 
 
-def _sha256_of_bytes(data: bytes) -> str:
-    h = hashlib.sha256()
-    h.update(data)
-    return h.hexdigest()
+def _active_tos_response(request: Request):
+    """
+    Shared body of the faculty/mobile GET /active endpoints.
+
+    Looks up only (id, updated_at) per request; the data blob is fetched,
+    serialized and compressed once per version and served from memory after.
+    """
+    head = fetchone("""
+        SELECT id, updated_at
+        FROM tos_versions
+        WHERE status = 'ACTIVE'
+        ORDER BY updated_at DESC
+        LIMIT 1
+    """)
+    if not head:
+        return not_found("No active TOS version found")
+
+    etag = f'W/"tos-{head["id"]}-{head["updated_at"].timestamp():.6f}"'
+    headers = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return not_modified(etag, headers)
+
+    payload = _active_payload_cache.get(etag)
+    if payload is None:
+        row = fetchone("""
+            SELECT id, label, academic_year, data, extracted_at, updated_at
+            FROM tos_versions
+            WHERE id = %s
+        """, [head["id"]])
+        if not row:
+            return not_found("No active TOS version found")
+        payload = _active_payload_cache.put(
+            etag, json_bytes({"success": True, "message": "Success", "data": _serialize(row)})
+        )
+
+    headers["ETag"] = etag
+    return payload.response(request, headers=headers)
+
+
+def _unshared_pdf_url(row: dict):
+    """The version's PDF URL, unless another version still points at it."""
+    url = row.get("pdf_url")
+    if url and fetchone("SELECT 1 FROM tos_versions WHERE pdf_url = %s AND id <> %s LIMIT 1", [url, row["id"]]):
+        return None
+    return url
 
 
 def _deactivate_current_active():
@@ -119,69 +173,88 @@ async def upload_tos_pdf(
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         return error("Only PDF files are accepted.", 400)
 
-    pdf_bytes = await file.read()
-    if not pdf_bytes:
-        return error("Uploaded file is empty.", 400)
-    
-    source_hash = _sha256_of_bytes(pdf_bytes)
-
-    # Check for duplicate hash — block re-uploading the exact same PDF bytes.
-    # Only reject if a non-ARCHIVED version with this hash already exists;
-    # allow re-upload if the previous record was archived or deleted.
-    existing = fetchone(
-        "SELECT id, label, status FROM tos_versions WHERE source_hash = %s AND status != 'ARCHIVED' LIMIT 1",
-        [source_hash]
-    )
-    if existing:
-        return error(
-            f"This PDF has already been uploaded as \"{existing['label']}\" "
-            f"(status: {existing['status'].title()}). "
-            "Upload a different PDF to create a new version.",
-            409
-        )
-
-    version_label = clean_str(label) or Path(file.filename).stem
-    version_year  = clean_str(academic_year) or "2024-2025"
-    version_notes = clean_str(notes) or None
+    # Stream the upload to a temp file in chunks, hashing as we go, so peak
+    # memory stays at one chunk no matter how large the PDF is. Storage and
+    # the extractor both read from this file afterwards.
+    hasher = hashlib.sha256()
+    size = 0
+    tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    tmp_path = tmp.name
 
-    # Upload PDF to Supabase Storage bucket
     try:
-        pdf_url = upload_pdf_bytes(pdf_bytes, filename=f"{source_hash}.pdf", bucket_name="tos-pdfs")
-    except Exception as exc:
-        return error(f"Failed to upload PDF to storage: {exc}", 500)
-
-    # Write PDF to a temp file for the extractor
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-        tmp.write(pdf_bytes)
-        tmp_path = tmp.name
-
-    try:
-        success, status_msg, raw = _ext.extract(tmp_path, source_hash)
-
-        if not success:
-            return error(f"Extraction failed: {status_msg}", 422)
-
-        extraction_method = raw.get("extraction_method", "geometry")
-        extracted_at_str  = raw.get("extracted_at")
-        data_payload      = raw.get("data", {})
+        with tmp:
+            while True:
+                chunk = await file.read(_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+
+        if not size:
+            return error("Uploaded file is empty.", 400)
+
+        source_hash = hasher.hexdigest()
+
+        # Check for duplicate hash — block re-uploading the exact same PDF bytes.
+        # Only reject if a non-ARCHIVED version with this hash already exists;
+        # allow re-upload if the previous record was archived or deleted.
+        existing = fetchone(
+            "SELECT id, label, status FROM tos_versions WHERE source_hash = %s AND status != 'ARCHIVED' LIMIT 1",
+            [source_hash]
+        )
+        if existing:
+            return error(
+                f"This PDF has already been uploaded as \"{existing['label']}\" "
+                f"(status: {existing['status'].title()}). "
+                "Upload a different PDF to create a new version.",
+                409
+            )
+
+        version_label = clean_str(label) or Path(file.filename).stem
+        version_year  = clean_str(academic_year) or "2024-2025"
+        version_notes = clean_str(notes) or None
+
+        # Upload PDF to Supabase Storage bucket (streamed from the temp file)
+        try:
+            pdf_url = await storage_async.upload_pdf_file(tmp_path, filename=f"{source_hash}.pdf", bucket_name="tos-pdfs")
+        except Exception as exc:
+            return error(f"Failed to upload PDF to storage: {exc}", 500)
 
-        extracted_at = None
-        if extracted_at_str:
+        try:
+            # LlamaParse polling + pdfplumber are blocking — keep them off the loop
+            t_extract = time.perf_counter()
             try:
-                extracted_at = datetime.fromisoformat(
-                    extracted_at_str.replace("Z", "+00:00")
-                )
-            except ValueError:
-                extracted_at = datetime.now(timezone.utc)
-
-    except ImportError as exc:
-        return error(
-            f"pdf_extractor module not found. "
-            f"Make sure app/extractor/extractor.py exists. ({exc})",
-            500
-        )
-    except Exception as exc:
-        return error(f"Extraction error: {exc}", 500)
+                success, status_msg, raw = await run_in_threadpool(_ext.extract, tmp_path, source_hash)
+            except Exception:
+                metrics.EXTRACTION.observe(time.perf_counter() - t_extract, "error")
+                raise
+            metrics.EXTRACTION.observe(time.perf_counter() - t_extract, "ok" if success else "failed")
+
+            if not success:
+                return error(f"Extraction failed: {status_msg}", 422)
+
+            extraction_method = raw.get("extraction_method", "geometry")
+            extracted_at_str  = raw.get("extracted_at")
+            data_payload      = raw.get("data", {})
+
+            extracted_at = None
+            if extracted_at_str:
+                try:
+                    extracted_at = datetime.fromisoformat(
+                        extracted_at_str.replace("Z", "+00:00")
+                    )
+                except ValueError:
+                    extracted_at = datetime.now(timezone.utc)
+
+        except ImportError as exc:
+            return error(
+                f"pdf_extractor module not found. "
+                f"Make sure app/extractor/extractor.py exists. ({exc})",
+                500
+            )
+        except Exception as exc:
+            return error(f"Extraction error: {exc}", 500)
     finally:
         try:
             os.unlink(tmp_path)
@@ -328,6 +401,13 @@ async def update_tos_version(tos_id: str, request: Request):
         RETURNING *
     """, [label, academic_year, notes, status, PgJson(data), tos_id])
 
+    if status == "ACTIVE":
+        rebuild_tos_subjects(tos_id, row["data"])
+        invalidate_mastery_cache()
+    elif existing["status"] == "ACTIVE":
+        invalidate_tos_index()
+        invalidate_mastery_cache()
+
     log_action("Updated TOS version", label, tos_id, user_id=auth.user_id, ip=auth.ip)
     return ok(_serialize(row))
 
@@ -350,6 +430,8 @@ async def activate_tos_version(tos_id: str, request: Request):
         "UPDATE tos_versions SET status = 'ACTIVE', updated_at = NOW() WHERE id = %s RETURNING *",
         [tos_id]
     )
+    rebuild_tos_subjects(tos_id, row["data"])
+    invalidate_mastery_cache()
 
     log_action("Activated TOS version", existing["label"], tos_id, user_id=auth.user_id, ip=auth.ip)
     return ok(_serialize(row))
@@ -415,7 +497,7 @@ async def get_tos_subject_status(tos_id: str, request: Request):
 # ─────────────────────────────────────────────────────────────────────────────
 
 @admin_tos_router.post("/{tos_id}/delete-with-options")
-async def delete_tos_with_options(tos_id: str, request: Request):
+async def delete_tos_with_options(tos_id: str, request: Request, background_tasks: BackgroundTasks):
     auth = permission_required("delete_tos")(request)
 
     existing = fetchone("SELECT * FROM tos_versions WHERE id = %s", [tos_id])
@@ -430,18 +512,38 @@ async def delete_tos_with_options(tos_id: str, request: Request):
     
     retain_subject_ids = body.get("retain_subject_ids", [])
     
-    names = [s.get("subject", "").strip() for s in existing.get("data", {}).get("subjects", []) if s.get("subject")]
-    
-    if names:
-        db_subjects = fetchall(f"SELECT id, name FROM subjects WHERE LOWER(name) IN ({','.join(['LOWER(%s)'] * len(names))})", names)
-        for s in db_subjects:
-            s_id_str = str(s["id"])
-            if s_id_str not in retain_subject_ids:
-                execute("DELETE FROM subjects WHERE id = %s", [s_id_str])
-                log_action("Deleted subject during TOS removal", s["name"], s_id_str, user_id=auth.user_id, ip=auth.ip)
+    names = [s.get("subject", "").strip().lower() for s in existing.get("data", {}).get("subjects", []) if s.get("subject")]
+    retain = [str(i) for i in retain_subject_ids]
+
+    # The version's own source PDF is only removed when explicitly requested
+    deleted, file_urls = [], [_unshared_pdf_url(existing)] if body.get("delete_pdf") else []
+    with get_cursor() as cur:
+        if names:
+            # Module PDFs go with the subjects (ON DELETE CASCADE) — collect them first
+            cur.execute(
+                """SELECT m.file_url
+                   FROM   modules m JOIN subjects s ON s.id = m.subject_id
+                   WHERE  LOWER(s.name) = ANY(%s) AND NOT (s.id::text = ANY(%s::text[]))
+                     AND  m.format = 'PDF' AND m.file_url IS NOT NULL""",
+                [names, retain],
+            )
+            file_urls += [r["file_url"] for r in cur.fetchall()]
+            cur.execute(
+                """DELETE FROM subjects
+                   WHERE  LOWER(name) = ANY(%s) AND NOT (id::text = ANY(%s::text[]))
+                   RETURNING id, name""",
+                [names, retain],
+            )
+            deleted = cur.fetchall()
+        cur.execute("DELETE FROM tos_versions WHERE id = %s", [tos_id])
 
-    execute("DELETE FROM tos_versions WHERE id = %s", [tos_id])
+    if names:
+        invalidate_tos_index()
+        invalidate_mastery_cache()
+    for s in deleted:
+        log_action("Deleted subject during TOS removal", s["name"], str(s["id"]), user_id=auth.user_id, ip=auth.ip)
     log_action("Deleted TOS version (with options)", existing["label"], tos_id, user_id=auth.user_id, ip=auth.ip)
+    storage_async.queue_storage_cleanup(background_tasks, file_urls)
     
     return no_content()
 
@@ -477,19 +579,7 @@ async def delete_tos_version(tos_id: str, request: Request):
 @faculty_tos_router.get("/active")
 async def get_active_tos_faculty(request: Request):
     auth = permission_required("view_tos")(request)
-
-    row = fetchone("""
-        SELECT id, label, academic_year, data, extracted_at, updated_at
-        FROM tos_versions
-        WHERE status = 'ACTIVE'
-        ORDER BY updated_at DESC
-        LIMIT 1
-    """)
-
-    if not row:
-        return not_found("No active TOS version found")
-
-    return ok(_serialize(row))
+    return _active_tos_response(request)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -499,16 +589,4 @@ async def get_active_tos_faculty(request: Request):
 @mobile_tos_router.get("/active")
 async def get_active_tos(request: Request):
     auth = login_required(request)
-
-    row = fetchone("""
-        SELECT id, label, academic_year, data, extracted_at, updated_at
-        FROM tos_versions
-        WHERE status = 'ACTIVE'
-        ORDER BY updated_at DESC
-        LIMIT 1
-    """)
-
-    if not row:
-        return not_found("No active TOS version found")
-
-    return ok(_serialize(row))
\ No newline at end of file
+    return _active_tos_response(request)
\ No newline at end of file
@@ -3,7 +3,6 @@ User management routes
   /api/web/admin/users   → full CRUD (ADMIN only)
   /api/web/faculty/users → read-only, filtered to students
 """
-import bcrypt
 from fastapi import APIRouter, Request, BackgroundTasks
 from app.db import fetchone, fetchall, execute, execute_returning, paginate
 from app.middleware.auth import login_required, permission_required, AuthState
@@ -12,6 +11,8 @@ from app.utils.pagination import get_page_params, get_search, get_filter
 from app.utils.validators import validate_email, validate_password, require_fields, clean_str
 from app.utils.log import log_action
 from app.utils.email import queue_email
+from app.utils.passwords import hash_password
+from app.utils.avatars import avatar_thumbnail_url
 
 admin_users_router   = APIRouter(prefix="/api/web/admin/users",   tags=["admin-users"])
 faculty_users_router = APIRouter(prefix="/api/web/faculty/users", tags=["faculty-users"])
@@ -20,7 +21,7 @@ VALID_ROLES    = {"ADMIN", "FACULTY", "STUDENT"}
 VALID_STATUSES = {"PENDING", "ACTIVE", "REMOVED", "REMOVED"}
 
 
-def _fmt(u: dict) -> dict:
+def _fmt(u: dict, thumbnail: bool = False) -> dict:
     u["id"] = str(u["id"])
     u.pop("password", None)
     u["name"] = " ".join(filter(None, [u.get("first_name"), u.get("middle_name"), u.get("last_name")]))
@@ -32,6 +33,8 @@ def _fmt(u: dict) -> dict:
         u["date_created"] = u["date_created"].isoformat()
     if u.get("photo_avatar"):
         u["photo_avatar"] = str(u["photo_avatar"])
+        if thumbnail:  # list views render small avatars — send the 64 px variant
+            u["photo_avatar"] = avatar_thumbnail_url(u["photo_avatar"])
     return u
 
 
@@ -72,7 +75,7 @@ def _list_users(request: Request, role_lock: str = None):
 
     sql.append("ORDER BY u.date_created DESC")
     result = paginate(" ".join(sql), params, page, per_page)
-    result["items"] = [_fmt(u) for u in result["items"]]
+    result["items"] = [_fmt(u, thumbnail=True) for u in result["items"]]
     return result
 
 
@@ -97,7 +100,7 @@ async def admin_pending(request: Request):
         ORDER BY u.date_created ASC
     """
     result = paginate(sql, [], page, per_page)
-    result["items"] = [_fmt(u) for u in result["items"]]
+    result["items"] = [_fmt(u, thumbnail=True) for u in result["items"]]
     return ok(result)
 
 
@@ -146,7 +149,7 @@ async def admin_create(request: Request, background_tasks: BackgroundTasks):
     if not role_row:
         return error("Invalid role")
 
-    hashed = bcrypt.hashpw(body["password"].encode(), bcrypt.gensalt()).decode()
+    hashed = await hash_password(body["password"])
     user = execute_returning(
         """INSERT INTO users
                (cvsu_id, first_name, middle_name, last_name,
@@ -198,7 +201,7 @@ async def admin_update(request: Request, user_id: str):
         body = await request.json()
     except Exception:
         body = {}
-    return _do_update(user_id, existing, body, auth)
+    return await _do_update(user_id, existing, body, auth)
 
 
 @admin_users_router.patch("/{user_id}/status")
@@ -323,7 +326,7 @@ async def faculty_update_student_status(request: Request, user_id: str, backgrou
     return ok({"id": user_id, "status": new_status})
 
 
-def _do_update(user_id: str, existing: dict, body: dict, auth: AuthState):
+async def _do_update(user_id: str, existing: dict, body: dict, auth: AuthState):
     email = (body.get("email") or existing["email"]).strip().lower()
     if email != existing["email"].lower():
         if not validate_email(email):
@@ -343,7 +346,7 @@ def _do_update(user_id: str, existing: dict, body: dict, auth: AuthState):
         pw_err = validate_password(body["password"])
         if pw_err:
             return error(pw_err)
-        password = bcrypt.hashpw(body["password"].encode(), bcrypt.gensalt()).decode()
+        password = await hash_password(body["password"])
     try:
         updated = execute_returning(
             """UPDATE users
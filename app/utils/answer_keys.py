@@ -0,0 +1,160 @@
+"""
+Precompiled answer keys for assessment scoring.
+
+mobile_submit used to reload the assessment, every question with its options
+and the institutional passing grade on each submission. An AnswerKey holds
+the APPROVED assessment's id/title plus, per question in display order, the
+correct option text already stripped and lower-cased — scoring a submission
+is then dict lookups and string compares, with no question queries.
+
+score() also produces the attempt's answer vectors, stored compactly on
+assessment_results for item analysis:
+
+  layout_hash   16 hex chars naming the question order (answer_layouts row)
+  correct_mask  bytea, bit i = question i answered correctly; bits run from
+                the least significant bit of each byte, so SQL get_bit(mask, i)
+                reads question i directly
+  choices       smallint[], chosen option index per question;
+                NO_ANSWER (-1) when blank, UNMATCHED (-2) when the text
+                matches none of the options
+
+Keys are cached in-process and dropped on question save, status change
+(approve / reject / back to PENDING), edit and delete. The passing grade is
+cached alongside and dropped when system settings are saved. A short TTL is
+the backstop for other worker processes that did not see the write.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from app.db import fetchone, fetchall
+
+_CACHE_TTL = 60   # seconds
+_MAX_KEYS  = 256  # assessments kept hot per process
+
+_lock       = threading.Lock()
+_keys       = OrderedDict()  # assess_id -> AnswerKey (LRU order)
+_pass_grade = None           # (loaded_at, grade)
+
+NO_ANSWER = -1
+UNMATCHED = -2
+
+
+def _normalize(value) -> str:
+    return str(value).strip().lower()
+
+
+def pack_mask(flags) -> bytes:
+    """Booleans → bytea bitmask (bit i in byte i // 8, least significant bit first)."""
+    flags = list(flags)
+    out = bytearray((len(flags) + 7) // 8)
+    for i, f in enumerate(flags):
+        if f:
+            out[i >> 3] |= 1 << (i & 7)
+    return bytes(out)
+
+
+def unpack_mask(mask: bytes, n: int) -> list:
+    mask = bytes(mask or b"")
+    return [bool(mask[i >> 3] >> (i & 7) & 1) if (i >> 3) < len(mask) else False for i in range(n)]
+
+
+def layout_hash(question_ids) -> str:
+    return hashlib.blake2b(",".join(question_ids).encode(), digest_size=8).hexdigest()
+
+
+class AnswerKey:
+    __slots__ = ("assessment_id", "title", "question_ids", "correct", "options", "layout_hash", "loaded_at")
+
+    def __init__(self, assessment: dict, questions: list):
+        self.assessment_id = str(assessment["id"])
+        self.title         = assessment["title"]
+        self.loaded_at     = time.monotonic()
+
+        ids, correct, options = [], [], []
+        for q in questions:
+            opts = q.get("options") or []
+            if isinstance(opts, str):
+                opts = json.loads(opts)
+            idx = q.get("correct_answer", 0)
+            ids.append(str(q["id"]))
+            correct.append(_normalize(opts[idx]) if 0 <= idx < len(opts) else "")
+            lookup = {}
+            for i, o in enumerate(opts):
+                lookup.setdefault(_normalize(o), i)
+            options.append(lookup)
+        self.question_ids = tuple(ids)
+        self.correct      = tuple(correct)
+        self.options      = tuple(options)  # normalized option text -> index
+        self.layout_hash  = layout_hash(self.question_ids)
+
+    @property
+    def total(self) -> int:
+        return len(self.question_ids)
+
+    def score(self, answers: dict) -> tuple:
+        """(correct_count, correct_mask, choices) for {question_id: answer}."""
+        flags, choices = [], []
+        for qid, key, lookup in zip(self.question_ids, self.correct, self.options):
+            given = _normalize(answers.get(qid, ""))
+            flags.append(given == key)
+            choices.append(lookup.get(given, UNMATCHED) if given else NO_ANSWER)
+        return sum(flags), pack_mask(flags), choices
+
+
+# ── Cached reads ──────────────────────────────────────────────────────────────
+
+def get_answer_key(assess_id: str) -> AnswerKey | None:
+    """Answer key of an APPROVED assessment, or None if it isn't available."""
+    assess_id = str(assess_id)
+    with _lock:
+        key = _keys.get(assess_id)
+        if key is not None and time.monotonic() - key.loaded_at < _CACHE_TTL:
+            _keys.move_to_end(assess_id)
+            return key
+
+    a = fetchone("SELECT id, title FROM assessments WHERE id = %s AND status = 'APPROVED'", [assess_id])
+    if not a:
+        invalidate_answer_key(assess_id)
+        return None
+    questions = fetchall(
+        "SELECT id, options, correct_answer FROM questions WHERE assessment_id = %s ORDER BY sort_order, date_created",
+        [assess_id],
+    )
+    key = AnswerKey(a, questions)
+    with _lock:
+        _keys[assess_id] = key
+        _keys.move_to_end(assess_id)
+        while len(_keys) > _MAX_KEYS:
+            _keys.popitem(last=False)
+    return key
+
+
+def passing_grade() -> int:
+    """system_settings.institutional_passing_grade (75 when unset)."""
+    global _pass_grade
+    with _lock:
+        cached = _pass_grade
+    if cached is not None and time.monotonic() - cached[0] < _CACHE_TTL:
+        return cached[1]
+
+    row   = fetchone("SELECT institutional_passing_grade FROM system_settings LIMIT 1")
+    grade = (row or {}).get("institutional_passing_grade", 75)
+    with _lock:
+        _pass_grade = (time.monotonic(), grade)
+    return grade
+
+
+# ── Invalidation ──────────────────────────────────────────────────────────────
+
+def invalidate_answer_key(assess_id: str):
+    with _lock:
+        _keys.pop(str(assess_id), None)
+
+
+def invalidate_passing_grade():
+    global _pass_grade
+    with _lock:
+        _pass_grade = None
@@ -0,0 +1,80 @@
+"""
+Avatar transcoding.
+
+Phone uploads (up to 2 MB, any format Pillow reads) are decoded once,
+EXIF-rotated, centre-cropped square and re-encoded as WebP in AVATAR_SIZES.
+Variants live under deterministic keys in the avatars bucket:
+
+    {user_id}-256.webp   — profile screens; this URL is what users.photo_avatar holds
+    {user_id}-64.webp    — thumbnails for list endpoints (avatar_thumbnail_url)
+
+The stored URL carries ?v=<content hash> so CDN/browser caches pick up a new
+photo even though the key is reused. Pillow is optional: without it the
+upload is stored untouched, as before.
+"""
+import io
+import re
+import hashlib
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow missing — transcode_avatar() returns None
+    Image = None
+
+AVATAR_SIZES   = (256, 64)
+FULL_SIZE      = 256
+THUMB_SIZE     = 64
+WEBP_QUALITY   = 80
+MAX_PIXELS     = 40_000_000  # refuse decompression bombs well before Pillow's own limit
+
+_VARIANT_RE = re.compile(rf"-{FULL_SIZE}\.webp(?=$|\?)")
+
+
+def avatar_key(user_id: str, size: int) -> str:
+    return f"{user_id}-{size}.webp"
+
+
+def transcode_available() -> bool:
+    return Image is not None
+
+
+def transcode_avatar(image_bytes: bytes) -> dict | None:
+    """
+    {size: webp_bytes} for every AVATAR_SIZES entry, or None when Pillow is
+    not installed. Raises ValueError for data that is not a readable image.
+    CPU-bound — call it from a worker thread.
+    """
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        if img.width * img.height > MAX_PIXELS:
+            raise ValueError(f"Image is too large ({img.width}x{img.height}).")
+        # JPEG can decode at 1/2, 1/4, 1/8 scale — far cheaper than full size
+        img.draft("RGB", (FULL_SIZE * 2, FULL_SIZE * 2))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+    except ValueError:
+        raise
+    except Exception as exc:
+        raise ValueError("File is not a readable image.") from exc
+
+    variants = {}
+    base = ImageOps.fit(img, (FULL_SIZE, FULL_SIZE), Image.LANCZOS)
+    for size in AVATAR_SIZES:
+        out = base if size == FULL_SIZE else base.resize((size, size), Image.LANCZOS)
+        buf = io.BytesIO()
+        out.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+        variants[size] = buf.getvalue()
+    return variants
+
+
+def version_tag(variants: dict) -> str:
+    return hashlib.sha1(variants[FULL_SIZE]).hexdigest()[:10]
+
+
+def avatar_thumbnail_url(photo_avatar: str | None) -> str | None:
+    """The 64 px variant of a transcoded avatar URL; anything else unchanged."""
+    if not photo_avatar:
+        return photo_avatar
+    return _VARIANT_RE.sub(f"-{THUMB_SIZE}.webp", str(photo_avatar), count=1)
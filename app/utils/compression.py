@@ -0,0 +1,138 @@
+"""
+Response compression helpers.
+
+  - choose_encoding() : pick br / gzip from an Accept-Encoding header
+  - compress()        : one-shot body compression
+  - Precompressed     : a serialized body plus its encoded variants, each
+                        built at most once — for cached payloads (active TOS,
+                        cohort analytics) that are served many times
+  - PrecompressedCache: small keyed store of Precompressed bodies with an
+                        optional TTL
+
+Responses built from a Precompressed already carry Content-Encoding, so
+CompressionMiddleware (app/middleware/compression.py) passes them through
+untouched. brotli is optional; without it only gzip is offered.
+"""
+import gzip
+import time
+import threading
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional — gzip only
+    brotli = None
+
+GZIP_LEVEL     = 6
+BROTLI_QUALITY = 5   # cached payloads can afford more than the middleware's per-request level
+
+_COMPRESSIBLE_PREFIXES = ("text/",)
+_COMPRESSIBLE_TYPES = {
+    "application/json", "application/javascript", "application/xml",
+    "application/problem+json", "image/svg+xml",
+}
+
+
+def is_compressible(content_type: str) -> bool:
+    ctype = (content_type or "").split(";", 1)[0].strip().lower()
+    return ctype.startswith(_COMPRESSIBLE_PREFIXES) or ctype in _COMPRESSIBLE_TYPES
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Best supported coding the client accepts: br, then gzip, else None."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    wildcard = accepted.get("*", 0.0)
+    for enc in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(enc, wildcard) > 0:
+            return enc
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+# ── Precompressed payloads ────────────────────────────────────────────────────
+
+class Precompressed:
+    """A serialized body whose encoded variants are built on first use, then kept."""
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body       = body
+        self.media_type = media_type
+        self._variants  = {}
+        self._lock      = threading.Lock()
+
+    def variant(self, encoding: str) -> bytes:
+        data = self._variants.get(encoding)
+        if data is None:
+            data = compress(self.body, encoding)
+            with self._lock:
+                self._variants.setdefault(encoding, data)
+        return data
+
+    def response(self, request: Request, status: int = 200, headers: dict = None) -> Response:
+        headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(content=self.variant(encoding), status_code=status,
+                            media_type=self.media_type, headers=headers)
+        return Response(content=self.body, status_code=status,
+                        media_type=self.media_type, headers=headers)
+
+
+class PrecompressedCache:
+    """
+    key -> Precompressed. ttl (seconds) bounds staleness for data without an
+    explicit invalidation point; max_entries bounds memory (oldest dropped).
+    """
+
+    def __init__(self, ttl: float = None, max_entries: int = 32):
+        self.ttl         = ttl
+        self.max_entries = max_entries
+        self._entries    = {}  # key -> (stored_at, Precompressed)
+        self._lock       = threading.Lock()
+
+    def get(self, key) -> Precompressed | None:
+        with self._lock:
+            hit = self._entries.get(key)
+        if hit is None or (self.ttl is not None and time.monotonic() - hit[0] > self.ttl):
+            return None
+        return hit[1]
+
+    def put(self, key, body: bytes, media_type: str = "application/json") -> Precompressed:
+        payload = Precompressed(body, media_type)
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic(), payload)
+        return payload
+
+    def get_or_build(self, key, build) -> Precompressed:
+        """Cached payload for key, else build() -> bytes is serialized once and stored."""
+        return self.get(key) or self.put(key, build())
+
+    def invalidate(self, key=None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -4,6 +4,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr  # <-- This is the missing import that caused the error!
 from fastapi import BackgroundTasks
+from app.utils import metrics
 
 def send_email_sync(to_email: str, subject: str, html_content: str):
     """Synchronous function to send an email via SMTP."""
@@ -36,7 +37,14 @@ def send_email_sync(to_email: str, subject: str, html_content: str):
     except Exception as e:
         print(f"[Email Error] Failed to send to {to_email}: {e}")
 
+def _send_queued(to_email: str, subject: str, html_content: str):
+    try:
+        send_email_sync(to_email, subject, html_content)
+    finally:
+        metrics.EMAIL_QUEUE.dec()
+
 def queue_email(background_tasks: BackgroundTasks, to_email: str, subject: str, html_content: str):
     """Queues the email to be sent in the background."""
     if to_email:
-        background_tasks.add_task(send_email_sync, to_email, subject, html_content)
\ No newline at end of file
+        metrics.EMAIL_QUEUE.inc()
+        background_tasks.add_task(_send_queued, to_email, subject, html_content)
\ No newline at end of file
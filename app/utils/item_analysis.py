@@ -0,0 +1,263 @@
+"""
+Item analysis over stored answer vectors (see answer_keys / submissions).
+
+For one assessment, per question:
+
+  p_value         share of attempts that answered it correctly (difficulty)
+  point_biserial  correlation between getting it right and the rest of the
+                  attempt's score (item-rest, so the item doesn't inflate it)
+  options         how often each option was picked, plus blank / unmatched
+  flags           too_easy / too_hard / low_discrimination / negative_discrimination
+                  / misleading_distractor (a wrong option outdrawing the key)
+
+Attempts are grouped by layout (the question order they were scored
+against). Each group reduces to sufficient statistics per question — n,
+Σx, Σr, Σr², Σxr and option counts — which simply add up across groups,
+so re-ordered or edited assessments still analyse per question. A group is
+reduced with NumPy in a handful of array operations (unpackbits + column sums
++ one bincount); _reduce_python is the plain reference the bench checks it
+against.
+
+Results are cached per assessment and reused while its stamp (attempt
+count, last attempt, last question edit) is unchanged — one indexed query
+per request. Committed submission batches drop the entry right away.
+"""
+import json
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.db import fetchone, fetchall
+from app.utils.answer_keys import NO_ANSWER, UNMATCHED, unpack_mask
+from app.utils import submissions
+
+EASY_P       = 0.90
+HARD_P       = 0.20
+LOW_DISCRIM  = 0.20
+_MAX_ENTRIES = 64
+
+_lock  = threading.Lock()
+_cache = OrderedDict()  # assess_id -> (stamp, result)
+
+
+class _Stats:
+    """Per-question sufficient statistics, mergeable across layouts."""
+    __slots__ = ("n", "sx", "sr", "srr", "sxr", "choices", "blank", "unmatched")
+
+    def __init__(self):
+        self.n = self.sx = self.sr = self.srr = self.sxr = 0
+        self.choices   = {}  # option index -> count
+        self.blank     = 0
+        self.unmatched = 0
+
+    def add(self, n, sx, sr, srr, sxr):
+        self.n   += n
+        self.sx  += sx
+        self.sr  += sr
+        self.srr += srr
+        self.sxr += sxr
+
+    def add_choice(self, idx: int, count: int = 1):
+        if idx == NO_ANSWER:
+            self.blank += count
+        elif idx == UNMATCHED or idx < 0:
+            self.unmatched += count
+        else:
+            self.choices[idx] = self.choices.get(idx, 0) + count
+
+    def p_value(self):
+        return self.sx / self.n if self.n else None
+
+    def point_biserial(self):
+        if self.n < 2:
+            return None
+        n = self.n
+        p = self.sx / n
+        mean_r = self.sr / n
+        var_x = p * (1 - p)
+        var_r = self.srr / n - mean_r * mean_r
+        if var_x <= 0 or var_r <= 1e-12:
+            return None
+        cov = self.sxr / n - p * mean_r
+        return max(-1.0, min(1.0, cov / math.sqrt(var_x * var_r)))
+
+
+# ── Reducers (one layout group → per-position stats) ──────────────────────────
+
+def _reduce_numpy(masks: list, choices: list, k: int, stats: list):
+    n = len(masks)
+    width = (k + 7) // 8
+    raw = np.frombuffer(b"".join(bytes(m or b"").ljust(width, b"\0")[:width] for m in masks), dtype=np.uint8)
+    X = np.unpackbits(raw.reshape(n, width), axis=1, bitorder="little")[:, :k].astype(np.int64)
+    R = X.sum(axis=1, keepdims=True) - X
+    sx, sr, srr, sxr = X.sum(0), R.sum(0), (R * R).sum(0), (X * R).sum(0)
+
+    C = np.full((n, k), NO_ANSWER, dtype=np.int64)
+    for i, row in enumerate(choices):
+        if row:
+            C[i, :min(k, len(row))] = row[:k]
+    # Shift so blank/unmatched land in slots 0/1, then count every column in one bincount
+    C = np.clip(C - UNMATCHED, 0, None)
+    slots = int(C.max()) + 1
+    counts = np.bincount((C + np.arange(k) * slots).ravel(), minlength=k * slots).reshape(k, slots)
+
+    for j in range(k):
+        st = stats[j]
+        st.add(n, int(sx[j]), int(sr[j]), int(srr[j]), int(sxr[j]))
+        for slot in np.nonzero(counts[j])[0]:
+            st.add_choice(int(slot) + UNMATCHED, int(counts[j, slot]))
+
+
+def _reduce_python(masks: list, choices: list, k: int, stats: list):
+    """Row-at-a-time reference for _reduce_numpy (scripts/bench_item_analysis.py)."""
+    for mask, row in zip(masks, choices):
+        x = unpack_mask(mask, k)
+        total = sum(x)
+        row = row or []
+        for j in range(k):
+            xj = 1 if x[j] else 0
+            r = total - xj
+            stats[j].add(1, xj, r, r * r, xj * r)
+            stats[j].add_choice(row[j] if j < len(row) else NO_ANSWER)
+
+
+# ── Analysis ──────────────────────────────────────────────────────────────────
+
+def _stamp(assess_id: str) -> tuple:
+    row = fetchone(
+        """SELECT (SELECT COUNT(*) FROM assessment_results
+                   WHERE assessment_id = %s AND layout_hash IS NOT NULL) AS attempts,
+                  (SELECT MAX(date_taken) FROM assessment_results
+                   WHERE assessment_id = %s AND layout_hash IS NOT NULL) AS last_taken,
+                  (SELECT MAX(last_updated) FROM questions WHERE assessment_id = %s) AS questions_updated""",
+        [assess_id, assess_id, assess_id],
+    ) or {}
+    return (row.get("attempts"), row.get("last_taken"), row.get("questions_updated"))
+
+
+def _flags(p, rpb, options: list) -> list:
+    flags = []
+    if p is not None and p > EASY_P:
+        flags.append("too_easy")
+    if p is not None and p < HARD_P:
+        flags.append("too_hard")
+    if rpb is not None:
+        if rpb < 0:
+            flags.append("negative_discrimination")
+        elif rpb < LOW_DISCRIM:
+            flags.append("low_discrimination")
+    key_share = next((o["share"] for o in options if o["is_correct"]), None)
+    if key_share is not None and any(o["share"] > key_share for o in options if not o["is_correct"]):
+        flags.append("misleading_distractor")
+    return flags
+
+
+def compute(assess_id: str) -> dict:
+    """Run the analysis from the database (uncached)."""
+    questions = fetchall(
+        """SELECT id, text, options, correct_answer FROM questions
+           WHERE assessment_id = %s ORDER BY sort_order, date_created""",
+        [assess_id],
+    )
+    layouts = {
+        r["layout_hash"]: [str(q) for q in r["question_ids"]]
+        for r in fetchall("SELECT layout_hash, question_ids FROM answer_layouts WHERE assessment_id = %s", [assess_id])
+    }
+    rows = fetchall(
+        """SELECT layout_hash, correct_mask, choices FROM assessment_results
+           WHERE assessment_id = %s AND layout_hash IS NOT NULL""",
+        [assess_id],
+    )
+
+    groups = {}
+    for r in rows:
+        g = groups.setdefault(r["layout_hash"], ([], []))
+        g[0].append(r["correct_mask"])
+        g[1].append(r["choices"])
+
+    per_question = {}
+    attempts = 0
+    for h, (masks, choices) in groups.items():
+        qids = layouts.get(h)
+        if not qids:
+            continue
+        attempts += len(masks)
+        stats = [per_question.setdefault(q, _Stats()) for q in qids]
+        _reduce_numpy(masks, choices, len(qids), stats)
+
+    items = []
+    for pos, q in enumerate(questions):
+        qid  = str(q["id"])
+        st   = per_question.get(qid, _Stats())
+        opts = q.get("options") or []
+        if isinstance(opts, str):
+            opts = json.loads(opts)
+        n    = st.n
+        options = [{
+            "index":      i,
+            "text":       str(text),
+            "is_correct": i == q.get("correct_answer"),
+            "count":      st.choices.get(i, 0),
+            "share":      round(st.choices.get(i, 0) / n, 4) if n else 0.0,
+        } for i, text in enumerate(opts)]
+        p, rpb = st.p_value(), st.point_biserial()
+        items.append({
+            "question_id":    qid,
+            "position":       pos + 1,
+            "text":           q["text"],
+            "attempts":       n,
+            "p_value":        round(p, 4) if p is not None else None,
+            "point_biserial": round(rpb, 4) if rpb is not None else None,
+            "options":        options,
+            "blank":          st.blank,
+            "unmatched":      st.unmatched,
+            "flags":          _flags(p, rpb, options) if n else [],
+        })
+
+    answered = [i["p_value"] for i in items if i["p_value"] is not None]
+    return {
+        "assessment_id": str(assess_id),
+        "attempts":      attempts,
+        "computed_at":   datetime.now(timezone.utc).isoformat(),
+        "summary": {
+            "items":   len(items),
+            "mean_p":  round(sum(answered) / len(answered), 4) if answered else None,
+            "flagged": sum(1 for i in items if i["flags"]),
+        },
+        "items": items,
+    }
+
+
+def item_analysis(assess_id: str) -> dict:
+    """Cached analysis; recomputed when attempts or questions changed since."""
+    assess_id = str(assess_id)
+    stamp = _stamp(assess_id)
+    with _lock:
+        hit = _cache.get(assess_id)
+        if hit is not None and hit[0] == stamp:
+            _cache.move_to_end(assess_id)
+            return hit[1]
+
+    result = compute(assess_id)
+    with _lock:
+        _cache[assess_id] = (stamp, result)
+        _cache.move_to_end(assess_id)
+        while len(_cache) > _MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return result
+
+
+def invalidate_item_analysis(assess_id: str):
+    with _lock:
+        _cache.pop(str(assess_id), None)
+
+
+def _on_flush(rows: list):
+    for aid in {str(r["assessment_id"]) for r in rows}:
+        invalidate_item_analysis(aid)
+
+
+submissions.add_flush_listener(_on_flush)
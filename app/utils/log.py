@@ -1,6 +1,7 @@
 """Activity log helper — call log_action() from any route."""
 import sys
-from app.db import execute
+from psycopg2.extras import execute_values
+from app.db import execute, get_cursor
 
 
 def log_action(action: str, target: str = None, target_id: str = None,
@@ -18,3 +19,22 @@ def log_action(action: str, target: str = None, target_id: str = None,
         )
     except Exception as e:
         print(f"[log_action] Failed to write activity log: {e!r}", file=sys.stderr)
+
+
+def log_actions(entries: list):
+    """
+    Insert many activity log rows in one statement.
+    entries: (user_id, action, target, target_id, ip) tuples. Never raises.
+    """
+    if not entries:
+        return
+    try:
+        with get_cursor() as cur:
+            execute_values(
+                cur,
+                "INSERT INTO activity_logs (user_id, action, target, target_id, ip_address) VALUES %s",
+                entries,
+                page_size=len(entries),
+            )
+    except Exception as e:
+        print(f"[log_actions] Failed to write {len(entries)} activity logs: {e!r}", file=sys.stderr)
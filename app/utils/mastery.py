@@ -0,0 +1,297 @@
+"""
+Competency and Bloom-level mastery.
+
+questions.competency_codes names TOS competency codes ("1.1", "2.3", …) of the
+assessment's subject. competency_mastery keeps, per (student, subject, code),
+how many tagged questions the student answered and how many correctly. It is
+maintained per committed submission batch (submissions flush listener) with
+one set-based statement: the new results are claimed (mastery_applied) and
+their stored answer vectors expanded through answer_layouts — get_bit on the
+correct mask — so no assessment_results are rescanned on read.
+
+Reads join the counters to the ACTIVE TOS (tos_competencies) for the code
+descriptions and sections; Bloom-level mastery weights each competency by its
+planned items per Bloom level. Re-tagged questions move their applied
+answers between codes in place (retag_questions), and deleted questions take
+theirs out, matching what rebuild_mastery() counts; moving an assessment to
+another subject is repaired with rebuild_mastery().
+
+The cohort view is the same for every viewer and is served from a
+precompressed copy. It is dropped whenever a batch is folded in and must be
+dropped (invalidate_mastery_cache) after a re-tag, a rebuild or a change to
+the ACTIVE TOS; the TTL only bounds staleness for other worker processes.
+"""
+import sys
+
+from app.db import fetchall, get_cursor
+from app.utils.tos_index import BLOOM_LEVELS, active_tos_version_id
+from app.utils.answer_keys import passing_grade
+from app.utils.compression import PrecompressedCache
+from app.utils.responses import json_bytes
+from app.utils import submissions
+
+MIN_ATTEMPTS = 3     # answered questions before a competency counts as strength / weakness
+_APPLY_MAX   = 5000  # results claimed per incremental pass
+_LOCK_KEY    = 4127  # pg_advisory_xact_lock key serialising counter writes
+_COHORT_TTL  = 60    # seconds
+
+_cohort_cache = PrecompressedCache(ttl=_COHORT_TTL, max_entries=1)
+
+# {claim} selects the assessment_results rows to fold in; it must return
+# user_id, assessment_id, layout_hash, correct_mask and date_taken.
+_ACCUMULATE = """
+    WITH claimed AS ({claim})
+    INSERT INTO competency_mastery (user_id, subject_id, code, attempted, correct, last_attempt)
+    SELECT ar.user_id, a.subject_id, c.code,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE get_bit(ar.correct_mask, (l.pos - 1)::int) = 1),
+           MAX(ar.date_taken)
+    FROM   claimed ar
+    JOIN   assessments a     ON a.id = ar.assessment_id AND a.subject_id IS NOT NULL
+    JOIN   answer_layouts al ON al.assessment_id = ar.assessment_id AND al.layout_hash = ar.layout_hash
+    CROSS  JOIN LATERAL unnest(al.question_ids) WITH ORDINALITY AS l(question_id, pos)
+    JOIN   questions q       ON q.id = l.question_id
+    CROSS  JOIN LATERAL jsonb_array_elements_text(q.competency_codes) AS c(code)
+    WHERE  ar.user_id IS NOT NULL
+    GROUP  BY ar.user_id, a.subject_id, c.code
+    ON CONFLICT (user_id, subject_id, code) DO UPDATE
+    SET    attempted    = competency_mastery.attempted + EXCLUDED.attempted,
+           correct      = competency_mastery.correct   + EXCLUDED.correct,
+           last_attempt = GREATEST(competency_mastery.last_attempt, EXCLUDED.last_attempt)
+"""
+
+_CLAIM_PENDING = """
+    UPDATE assessment_results SET mastery_applied = TRUE
+    WHERE  id IN (SELECT id FROM assessment_results
+                  WHERE  NOT mastery_applied AND layout_hash IS NOT NULL
+                  ORDER  BY date_taken LIMIT %s)
+    RETURNING user_id, assessment_id, layout_hash, correct_mask, date_taken
+"""
+
+_CLAIM_ALL = """
+    UPDATE assessment_results SET mastery_applied = TRUE
+    WHERE  layout_hash IS NOT NULL {scope}
+    RETURNING user_id, assessment_id, layout_hash, correct_mask, date_taken
+"""
+
+
+# ── Maintenance ───────────────────────────────────────────────────────────────
+
+def apply_pending(limit: int = _APPLY_MAX) -> int:
+    """
+    Fold not-yet-applied results into the counters; returns rows upserted.
+    Never waits for the lock: while a rebuild or re-tag holds it the results
+    stay unclaimed and the next batch picks them up.
+    """
+    with get_cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", [_LOCK_KEY])
+        if not cur.fetchone()["locked"]:
+            return 0
+        cur.execute(_ACCUMULATE.format(claim=_CLAIM_PENDING), [limit])
+        return cur.rowcount
+
+
+def rebuild_mastery(subject_id: str = None) -> int:
+    """Recompute the counters (of one subject, or all) from assessment_results."""
+    with get_cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", [_LOCK_KEY])
+        if subject_id:
+            cur.execute("DELETE FROM competency_mastery WHERE subject_id = %s", [subject_id])
+            claim = _CLAIM_ALL.format(
+                scope="AND assessment_id IN (SELECT id FROM assessments WHERE subject_id = %s)")
+            cur.execute(_ACCUMULATE.format(claim=claim), [subject_id])
+        else:
+            cur.execute("DELETE FROM competency_mastery")
+            cur.execute(_ACCUMULATE.format(claim=_CLAIM_ALL.format(scope="")))
+        return cur.rowcount
+
+
+def retag_questions(cur, assess_id: str, changes: dict):
+    """
+    Move one assessment's already-applied answers from old to new competency
+    codes. changes: question_id -> (old_codes, new_codes); new_codes is empty
+    for a question being deleted. Runs on the caller's cursor, in the
+    transaction that updates the questions, so results applied concurrently
+    are counted under the new codes exactly once.
+    """
+    tags = []  # (question_id, code, +1 added / -1 removed)
+    for qid, (old, new) in changes.items():
+        old, new = set(old or []), set(new or [])
+        tags += [(qid, code, -1) for code in old - new]
+        tags += [(qid, code, 1) for code in new - old]
+    if not tags:
+        return
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", [_LOCK_KEY])
+    cur.execute(
+        """WITH tags AS (
+               SELECT * FROM unnest(%s::uuid[], %s::text[], %s::int[]) AS t(question_id, code, sign)
+           ),
+           delta AS (
+               SELECT ar.user_id, a.subject_id, t.code,
+                      SUM(t.sign) AS attempted,
+                      COALESCE(SUM(t.sign) FILTER (WHERE get_bit(ar.correct_mask, (l.pos - 1)::int) = 1), 0) AS correct,
+                      MAX(ar.date_taken) AS last_attempt
+               FROM   assessment_results ar
+               JOIN   assessments a     ON a.id = ar.assessment_id AND a.subject_id IS NOT NULL
+               JOIN   answer_layouts al ON al.assessment_id = ar.assessment_id AND al.layout_hash = ar.layout_hash
+               CROSS  JOIN LATERAL unnest(al.question_ids) WITH ORDINALITY AS l(question_id, pos)
+               JOIN   tags t ON t.question_id = l.question_id
+               WHERE  ar.assessment_id = %s AND ar.mastery_applied AND ar.user_id IS NOT NULL
+               GROUP  BY ar.user_id, a.subject_id, t.code
+           ),
+           updated AS (
+               UPDATE competency_mastery cm
+               SET    attempted = GREATEST(0, cm.attempted + d.attempted),
+                      correct   = GREATEST(0, cm.correct   + d.correct)
+               FROM   delta d
+               WHERE  cm.user_id = d.user_id AND cm.subject_id = d.subject_id AND cm.code = d.code
+               RETURNING cm.user_id, cm.subject_id, cm.code
+           )
+           INSERT INTO competency_mastery (user_id, subject_id, code, attempted, correct, last_attempt)
+           SELECT d.user_id, d.subject_id, d.code, d.attempted, d.correct, d.last_attempt
+           FROM   delta d
+           WHERE  d.attempted > 0
+             AND  NOT EXISTS (SELECT 1 FROM updated u
+                              WHERE u.user_id = d.user_id AND u.subject_id = d.subject_id AND u.code = d.code)""",
+        [[t[0] for t in tags], [t[1] for t in tags], [t[2] for t in tags], assess_id],
+    )
+
+
+def invalidate_mastery_cache():
+    _cohort_cache.invalidate()
+
+
+def _on_flush(rows: list):
+    if rows:
+        try:
+            if apply_pending():
+                invalidate_mastery_cache()
+        except Exception as e:
+            # Results stay unclaimed and are picked up by the next batch
+            print(f"[mastery] Incremental update failed: {e!r}", file=sys.stderr)
+
+
+submissions.add_flush_listener(_on_flush)
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+
+def _pct(correct, attempted):
+    return round(correct * 100 / attempted, 1) if attempted else None
+
+
+def _summarize(rows: list, per_row) -> dict:
+    """competencies / subjects / bloom / strengths / weaknesses from joined TOS rows."""
+    competencies, subjects = [], {}
+    bloom = [[0.0, 0.0] for _ in BLOOM_LEVELS]  # weighted attempted, correct
+    for r in rows:
+        attempted, correct = int(r["attempted"] or 0), int(r["correct"] or 0)
+        item = {
+            "subject":     r["subject_name"],
+            "subjectId":   str(r["subject_id"]) if r["subject_id"] else None,
+            "code":        r["code"],
+            "description": r["description"],
+            "section":     r["section"],
+            "attempted":   attempted,
+            "correct":     correct,
+            "mastery":     _pct(correct, attempted),
+        }
+        item.update(per_row(r))
+        competencies.append(item)
+
+        s = subjects.setdefault(r["subject_name"], {
+            "subject": r["subject_name"], "subjectId": item["subjectId"],
+            "attempted": 0, "correct": 0, "competencies": 0, "covered": 0,
+        })
+        s["attempted"]    += attempted
+        s["correct"]      += correct
+        s["competencies"] += 1
+        s["covered"]      += 1 if attempted else 0
+
+        planned = [int(b or 0) for b in (r["bloom"] or [])][:len(BLOOM_LEVELS)]
+        total = sum(planned)
+        if total and attempted:
+            for i, b in enumerate(planned):
+                bloom[i][0] += attempted * b / total
+                bloom[i][1] += correct * b / total
+
+    for s in subjects.values():
+        s["mastery"] = _pct(s["correct"], s["attempted"])
+
+    ranked = sorted((c for c in competencies if c["attempted"] >= MIN_ATTEMPTS),
+                    key=lambda c: (c["mastery"], c["attempted"]), reverse=True)
+    return {
+        "competencies": competencies,
+        "subjects":     list(subjects.values()),
+        "bloom": [{
+            "level":     level.capitalize(),
+            "key":       level,
+            "attempted": round(att, 1),
+            "mastery":   _pct(cor, att) if att >= 0.5 else None,
+        } for level, (att, cor) in zip(BLOOM_LEVELS, bloom)],
+        "strengths":  ranked[:3],
+        "weaknesses": ranked[::-1][:3],
+    }
+
+
+def _empty() -> dict:
+    return {"tosVersionId": None, "competencies": [], "subjects": [], "bloom": [],
+            "strengths": [], "weaknesses": []}
+
+
+def student_mastery(user_id: str) -> dict:
+    """One student's mastery of every competency of the ACTIVE TOS."""
+    version_id = active_tos_version_id()
+    if not version_id:
+        return _empty()
+    rows = fetchall(
+        """SELECT tc.subject_name, ts.subject_id, tc.code, tc.description, tc.section, tc.bloom,
+                  cm.attempted, cm.correct, cm.last_attempt
+           FROM   tos_competencies tc
+           JOIN   tos_subjects ts ON ts.version_id = tc.version_id AND ts.subject_name = tc.subject_name
+           LEFT   JOIN competency_mastery cm
+                  ON cm.user_id = %s AND cm.subject_id = ts.subject_id AND cm.code = tc.code
+           WHERE  tc.version_id = %s
+           ORDER  BY ts.sort_order, tc.sort_order""",
+        [user_id, version_id],
+    )
+    data = _summarize(rows, lambda r: {
+        "lastAttempt": r["last_attempt"].isoformat() if r["last_attempt"] else None,
+    })
+    return {"tosVersionId": version_id, **data}
+
+
+def cohort_mastery() -> dict:
+    """Mastery of every competency of the ACTIVE TOS across all students."""
+    version_id = active_tos_version_id()
+    if not version_id:
+        return {**_empty(), "passingStandard": None}
+    grade = passing_grade()
+    rows = fetchall(
+        """SELECT tc.subject_name, ts.subject_id, tc.code, tc.description, tc.section, tc.bloom,
+                  SUM(cm.attempted) AS attempted, SUM(cm.correct) AS correct,
+                  COUNT(cm.user_id) AS students,
+                  COUNT(cm.user_id) FILTER (WHERE cm.attempted >= %s
+                                              AND cm.correct * 100 >= %s * cm.attempted) AS mastered
+           FROM   tos_competencies tc
+           JOIN   tos_subjects ts ON ts.version_id = tc.version_id AND ts.subject_name = tc.subject_name
+           LEFT   JOIN competency_mastery cm ON cm.subject_id = ts.subject_id AND cm.code = tc.code
+           WHERE  tc.version_id = %s
+           GROUP  BY tc.subject_name, ts.subject_id, tc.code, tc.description, tc.section, tc.bloom,
+                     ts.sort_order, tc.sort_order
+           ORDER  BY ts.sort_order, tc.sort_order""",
+        [MIN_ATTEMPTS, grade, version_id],
+    )
+    data = _summarize(rows, lambda r: {
+        "students":      int(r["students"] or 0),
+        "mastered":      int(r["mastered"] or 0),
+        "masteredShare": round(int(r["mastered"] or 0) * 100 / int(r["students"]), 1) if r["students"] else None,
+    })
+    return {"tosVersionId": version_id, "passingStandard": grade, **data}
+
+
+def cohort_mastery_payload():
+    """The cohort_mastery() response body, serialized and compressed once per cache period."""
+    return _cohort_cache.get_or_build(
+        "cohort", lambda: json_bytes({"success": True, "message": "Success", "data": cohort_mastery()})
+    )
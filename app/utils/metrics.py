@@ -0,0 +1,196 @@
+"""
+In-process Prometheus metrics.
+
+A deliberately small registry (no prometheus_client dependency): counters,
+gauges and fixed-bucket histograms keyed by label values, each guarded by
+its own lock so observations from the event loop and worker threads
+aggregate safely. An observation is one dict lookup, a bisect and a few
+additions under an uncontended lock.
+
+render() produces the text exposition format served at GET /metrics (only
+when METRICS_TOKEN is set; scrapers send it as a bearer token).
+Numbers are per process — each uvicorn worker / serverless instance
+reports its own series.
+"""
+import sys
+import time
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS      = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+JOB_BUCKETS     = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry      = []
+_registry_lock = threading.Lock()
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self._values    = {} if self.labelnames else {(): 0}
+        self._lock      = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Settable gauge, or — with fn — a callback read at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames=(), fn=None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> list:
+        if self.fn is not None:
+            items = [((), self.fn())]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = self._header()
+        for labels, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = 'le="' + _num(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: tuple):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for m in metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── Call-site labels for DB queries ───────────────────────────────────────────
+
+_SKIP_MODULES = ("app.db", "contextlib", "psycopg2")
+_site_cache   = {}  # code object -> "module:function"
+
+
+def call_site(depth: int = 2) -> str:
+    """module:function of the first caller outside the DB layer."""
+    f = sys._getframe(depth)
+    while f is not None and f.f_globals.get("__name__", "").startswith(_SKIP_MODULES):
+        f = f.f_back
+    if f is None:
+        return "unknown"
+    code = f.f_code
+    site = _site_cache.get(code)
+    if site is None:
+        site = _site_cache[code] = f"{f.f_globals.get('__name__', '?')}:{code.co_name}"
+    return site
+
+
+# ── Application metrics ───────────────────────────────────────────────────────
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to response headers by route template.", ("method", "route"))
+
+DB_QUERY = Histogram(
+    "db_query_duration_seconds", "SQL statement latency by calling function.", ("site",), DB_BUCKETS)
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections currently checked out of the pool.")
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_seconds", "Time spent in pool.getconn().", buckets=DB_BUCKETS)
+DB_POOL_EXHAUSTED = Counter("db_pool_exhausted_total", "Checkouts refused because the pool was full.")
+
+EMAIL_QUEUE = Gauge("email_queue_depth", "Emails queued as background tasks and not yet sent.")
+
+EXTRACTION = Histogram(
+    "tos_extraction_duration_seconds", "TOS PDF extraction time by outcome.", ("result",), JOB_BUCKETS)
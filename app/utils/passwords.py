@@ -0,0 +1,42 @@
+"""
+bcrypt hashing off the event loop.
+
+bcrypt is deliberately slow (~100-250 ms per call at the default cost), and
+it used to run inline in async handlers, stalling every other request on
+the worker. hash_password / check_password run it on worker threads, at most
+BCRYPT_MAX_WORKERS at a time; extra logins queue for a slot. The queue
+depth and in-flight count are exported as metrics.
+"""
+import os
+
+import anyio
+import bcrypt
+
+from app.utils import metrics
+
+_limiter = anyio.CapacityLimiter(int(os.getenv("BCRYPT_MAX_WORKERS", "2")))
+
+BCRYPT_SECONDS = metrics.Histogram(
+    "bcrypt_duration_seconds", "bcrypt hash/check time including queueing.", ("op",))
+metrics.Gauge("bcrypt_queue_depth", "bcrypt calls waiting for a worker slot.",
+              fn=lambda: _limiter.statistics().tasks_waiting)
+metrics.Gauge("bcrypt_in_flight", "bcrypt calls currently running.",
+              fn=lambda: _limiter.statistics().borrowed_tokens)
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+
+def _check(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+async def hash_password(password: str) -> str:
+    with BCRYPT_SECONDS.time("hash"):
+        return await anyio.to_thread.run_sync(_hash, password, limiter=_limiter)
+
+
+async def check_password(password: str, hashed: str) -> bool:
+    with BCRYPT_SECONDS.time("check"):
+        return await anyio.to_thread.run_sync(_check, password, hashed, limiter=_limiter)
@@ -3,14 +3,24 @@
 Uses a custom JSON encoder so that datetime, date, Decimal, UUID, and bytes
 values are automatically serialized — no manual .isoformat() calls needed in
 route handlers.
+
+When orjson is installed it does the encoding (datetime/date/UUID handled
+natively in C, same ISO strings as .isoformat()); anything it refuses —
+e.g. integers beyond 64 bits — falls back to the stdlib _Encoder path.
 """
 import json
 import uuid
+import hashlib
 from datetime import date, datetime
 from decimal import Decimal
 
 from fastapi.responses import Response
 
+try:
+    import orjson
+except ImportError:  # optional speed-up — stdlib json is used without it
+    orjson = None
+
 
 class _Encoder(json.JSONEncoder):
     """Serialize types that stdlib json cannot handle."""
@@ -27,12 +37,33 @@ class _Encoder(json.JSONEncoder):
         return super().default(o)
 
 
-def _json(data) -> bytes:
+def _orjson_default(o):
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, bytes):
+        return o.decode("utf-8", errors="replace")
+    raise TypeError
+
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def _json_std(data) -> bytes:
     return json.dumps(data, cls=_Encoder, separators=(",", ":")).encode("utf-8")
 
 
+def json_bytes(data) -> bytes:
+    """Encode *data* to compact JSON bytes, for callers that cache or compress bodies."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_orjson_default, option=_ORJSON_OPTS)
+        except TypeError:
+            pass  # let the stdlib encoder serialize it (or raise its usual error)
+    return _json_std(data)
+
+
 def _resp(body: dict, status: int = 200) -> Response:
-    return Response(content=_json(body), status_code=status,
+    return Response(content=json_bytes(body), status_code=status,
                     media_type="application/json")
 
 
@@ -47,6 +78,31 @@ def created(data=None, message="Created"):
 def no_content():
     return Response(status_code=204)
 
+def not_modified(etag: str, headers: dict = None):
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == bare:
+            return True
+    return False
+
+def ok_etag(request, data=None, message="Success"):
+    """ok() with a content-hash ETag; a matching If-None-Match gets a 304."""
+    body = json_bytes({"success": True, "message": message, "data": data})
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return not_modified(etag, {"Cache-Control": "private, no-cache"})
+    return Response(content=body, media_type="application/json", headers=headers)
+
 def error(message="An error occurred", status=400, errors=None):
     body = {"success": False, "message": message}
     if errors:
@@ -6,18 +6,40 @@ Architecture:
               Path pattern:  {subject_slug}/{filename}.pdf
   - Avatars : single "avatars" bucket. Only phone-uploaded photos go here.
               Path pattern:  avatars/{user_id}-{first_name_slug}.png
+
+Backends (STORAGE_BACKEND):
+  - supabase : default — Supabase Storage REST API
+  - local    : app/utils/storage_local.py — same layout and public-URL
+               scheme on local disk, for offline development and load tests
 """
 
 import os
 import uuid
 import base64
 import re
+import threading
 import httpx
+from app.utils.timing import TimedTransport
 
 # ── Constants & Exceptions ─────────────────────────────────────────────────────
 
 AVATAR_BUCKET = "avatars"
 
+# One pooled keep-alive client per process: uploads reuse warm TLS
+# connections instead of paying a handshake on every call.
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+_HTTP_LIMITS  = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+
+_client      = None
+_client_lock = threading.Lock()
+
+# Buckets confirmed to exist (or just created) — skips the per-upload GET.
+_known_buckets      = set()
+_known_buckets_lock = threading.Lock()
+
+_local      = None
+_local_lock = threading.Lock()
+
 class DuplicateFileError(Exception):
     """Raised when a file with the same name already exists in the bucket."""
     pass
@@ -46,8 +68,55 @@ def _storage_headers(key: str) -> dict:
     }
 
 
+def local_backend():
+    """The LocalStorage backend when STORAGE_BACKEND=local, else None (Supabase)."""
+    global _local
+    if os.getenv("STORAGE_BACKEND", "supabase").strip().lower() != "local":
+        return None
+    if _local is None:
+        with _local_lock:
+            if _local is None:
+                from app.utils.storage_local import LocalStorage
+                _local = LocalStorage.from_env()
+    return _local
+
+
+def _get_client() -> httpx.Client:
+    """Return the shared storage client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(timeout=_HTTP_TIMEOUT, transport=TimedTransport(limits=_HTTP_LIMITS))
+    return _client
+
+
+def close_client() -> None:
+    """Close the shared client (tests / shutdown). A new one is made on next use."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def _forget_bucket(bucket: str) -> None:
+    with _known_buckets_lock:
+        _known_buckets.discard(bucket)
+
+
+def _is_bucket_missing(resp: httpx.Response) -> bool:
+    return resp.status_code == 404 or (
+        resp.status_code == 400 and "not found" in resp.text.lower()
+    )
+
+
 def _ensure_bucket_exists(client: httpx.Client, url: str, key: str, bucket: str) -> None:
-    """Create the bucket if it doesn't already exist (idempotent)."""
+    """Create the bucket if it doesn't already exist (idempotent, cached per process)."""
+    with _known_buckets_lock:
+        if bucket in _known_buckets:
+            return
+
     headers = _storage_headers(key)
     
     bucket_url = f"{url}/storage/v1/bucket/{bucket}"
@@ -56,9 +125,7 @@ def _ensure_bucket_exists(client: httpx.Client, url: str, key: str, bucket: str)
     if resp.status_code != 200:
         print(f"\n[Supabase Storage INFO] Checking bucket '{bucket}' returned {resp.status_code}: {resp.text}")
     
-    bucket_missing = resp.status_code == 404 or (
-        resp.status_code == 400 and "not found" in resp.text.lower()
-    )
+    bucket_missing = _is_bucket_missing(resp)
     
     if bucket_missing:
         print(f"[Supabase Storage INFO] Bucket '{bucket}' missing. Attempting to auto-create...")
@@ -76,6 +143,11 @@ def _ensure_bucket_exists(client: httpx.Client, url: str, key: str, bucket: str)
             create_resp.raise_for_status()
         else:
             print(f"[Supabase Storage SUCCESS] Auto-created bucket '{bucket}' successfully.\n")
+    elif resp.status_code >= 400:
+        return  # unknown state — don't cache, let the upload surface the error
+
+    with _known_buckets_lock:
+        _known_buckets.add(bucket)
 
 
 def _strip_data_uri(data_str: str) -> tuple[str, str]:
@@ -91,13 +163,18 @@ def _strip_data_uri(data_str: str) -> tuple[str, str]:
 
 # ── PDF upload ─────────────────────────────────────────────────────────────────
 
-def upload_pdf_bytes(file_bytes: bytes, filename: str, bucket_name: str) -> str:
+def _upload_pdf_content(content, filename: str, bucket_name: str) -> str:
     """
-    Upload raw PDF bytes to a dynamically created subject bucket.
+    POST a PDF body (bytes or an open binary file) to a subject bucket.
+    File objects are streamed by httpx in chunks rather than read into memory.
     """
     if not bucket_name:
         bucket_name = "default-subject"
-        
+
+    local = local_backend()
+    if local:
+        return local.put(bucket_name, filename, content)
+
     supabase_url, supabase_key = _supabase_creds()
     object_path = filename
     upload_url = f"{supabase_url}/storage/v1/object/{bucket_name}/{object_path}"
@@ -108,28 +185,44 @@ def upload_pdf_bytes(file_bytes: bytes, filename: str, bucket_name: str) -> str:
         "x-upsert": "false",  # strict: do not overwrite if file already exists
     }
 
-    with httpx.Client(timeout=60) as client:
-        _ensure_bucket_exists(client, supabase_url, supabase_key, bucket_name)
-        resp = client.post(upload_url, headers=headers, content=file_bytes)
-        
-        # --- Handle specific Duplicate file error (409) ---
-        if resp.status_code == 400 and "Duplicate" in resp.text:
-            raise DuplicateFileError(f"A file named '{filename}' already exists in the '{bucket_name}' subject.")
-            
-        if resp.status_code >= 400:
-            print(f"\n[Supabase Storage ERROR] Failed to upload '{object_path}' to bucket '{bucket_name}'")
-            print(f"Status: {resp.status_code}")
-            print(f"Response: {resp.text}\n")
-            raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
+    client = _get_client()
+    _ensure_bucket_exists(client, supabase_url, supabase_key, bucket_name)
+    resp = client.post(upload_url, headers=headers, content=content)
+    # --- Handle specific Duplicate file error (409) ---
+    if resp.status_code == 400 and "Duplicate" in resp.text:
+        raise DuplicateFileError(f"A file named '{filename}' already exists in the '{bucket_name}' subject.")
+
+    if resp.status_code >= 400:
+        if _is_bucket_missing(resp):
+            _forget_bucket(bucket_name)  # deleted behind our back — re-check next time
+        print(f"\n[Supabase Storage ERROR] Failed to upload '{object_path}' to bucket '{bucket_name}'")
+        print(f"Status: {resp.status_code}")
+        print(f"Response: {resp.text}\n")
+        raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
 
     return f"{supabase_url}/storage/v1/object/public/{bucket_name}/{object_path}"
 
 
+def upload_pdf_bytes(file_bytes: bytes, filename: str, bucket_name: str) -> str:
+    """
+    Upload raw PDF bytes to a dynamically created subject bucket.
+    """
+    return _upload_pdf_content(file_bytes, filename, bucket_name)
+
+
+def upload_pdf_file(file_path: str, filename: str, bucket_name: str) -> str:
+    """
+    Upload a PDF that is already on disk, streaming it from the file
+    instead of loading the whole document into memory.
+    """
+    with open(file_path, "rb") as fh:
+        return _upload_pdf_content(fh, filename, bucket_name)
+
+
 def upload_pdf_base64(base64_str: str, filename: str, subject_name: str) -> str:
     """
     Upload a base64-encoded PDF to the dynamically created subject bucket.
     """
-    supabase_url, supabase_key = _supabase_creds()
     base64_str, _ = _strip_data_uri(base64_str)
 
     try:
@@ -139,6 +232,12 @@ def upload_pdf_base64(base64_str: str, filename: str, subject_name: str) -> str:
 
     bucket_name = _slugify(subject_name)
     object_path = f"{uuid.uuid4().hex}.pdf"
+
+    local = local_backend()
+    if local:
+        return local.put(bucket_name, object_path, file_bytes)
+
+    supabase_url, supabase_key = _supabase_creds()
     upload_url = f"{supabase_url}/storage/v1/object/{bucket_name}/{object_path}"
 
     headers = {
@@ -147,15 +246,17 @@ def upload_pdf_base64(base64_str: str, filename: str, subject_name: str) -> str:
         "x-upsert": "false",
     }
 
-    with httpx.Client(timeout=60) as client:
-        _ensure_bucket_exists(client, supabase_url, supabase_key, bucket_name)
-        resp = client.post(upload_url, headers=headers, content=file_bytes)
-        
-        if resp.status_code >= 400:
-            print(f"\n[Supabase Storage ERROR] Failed to upload '{object_path}' to bucket '{bucket_name}'")
-            print(f"Status: {resp.status_code}")
-            print(f"Response: {resp.text}\n")
-            raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
+    client = _get_client()
+    _ensure_bucket_exists(client, supabase_url, supabase_key, bucket_name)
+    resp = client.post(upload_url, headers=headers, content=file_bytes)
+
+    if resp.status_code >= 400:
+        if _is_bucket_missing(resp):
+            _forget_bucket(bucket_name)
+        print(f"\n[Supabase Storage ERROR] Failed to upload '{object_path}' to bucket '{bucket_name}'")
+        print(f"Status: {resp.status_code}")
+        print(f"Response: {resp.text}\n")
+        raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
 
     return f"{supabase_url}/storage/v1/object/public/{bucket_name}/{object_path}"
 
@@ -167,6 +268,13 @@ def delete_pdf_by_url(public_url: str) -> None:
     if not public_url:
         return
 
+    local = local_backend()
+    if local:
+        parts = local.split_public_url(public_url)
+        if parts:
+            local.remove(parts[0], [parts[1]])
+        return
+
     try:
         supabase_url, supabase_key = _supabase_creds()
     except ValueError:
@@ -187,30 +295,34 @@ def delete_pdf_by_url(public_url: str) -> None:
     bucket_name, object_path = parts
     delete_url = f"{supabase_url}/storage/v1/object/{bucket_name}/{object_path}"
 
-    with httpx.Client(timeout=30) as client:
-        resp = client.delete(delete_url, headers=_storage_headers(supabase_key))
-        # Ignore 404s (the file is already deleted or doesn't exist)
-        if resp.status_code >= 400 and resp.status_code != 404:
-            print(f"[Warning] Failed to delete PDF {object_path} from bucket {bucket_name}: {resp.text}")
+    resp = _get_client().delete(delete_url, headers=_storage_headers(supabase_key), timeout=30)
+    # Ignore 404s (the file is already deleted or doesn't exist)
+    if resp.status_code >= 400 and resp.status_code != 404:
+        print(f"[Warning] Failed to delete PDF {object_path} from bucket {bucket_name}: {resp.text}")
 
 
 # ── Avatar upload / helpers ──────────────────────────────────────────────────────────────
 
 def upload_avatar_bytes(image_bytes: bytes, user_id: str, first_name: str, mime_type: str = "image/png") -> str:
-    supabase_url, supabase_key = _supabase_creds()
     first_slug = _slugify(first_name) if first_name else "user"
     filename = f"{user_id}-{first_slug}.png"
+    local = local_backend()
+    if local:
+        return local.put(AVATAR_BUCKET, filename, image_bytes, upsert=True)
+    supabase_url, supabase_key = _supabase_creds()
     upload_url = f"{supabase_url}/storage/v1/object/{AVATAR_BUCKET}/{filename}"
     headers = {
         **_storage_headers(supabase_key),
         "Content-Type": mime_type,
         "x-upsert": "true",
     }
-    with httpx.Client(timeout=60) as client:
-        _ensure_bucket_exists(client, supabase_url, supabase_key, AVATAR_BUCKET)
-        resp = client.post(upload_url, headers=headers, content=image_bytes)
-        if resp.status_code >= 400:
-            raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
+    client = _get_client()
+    _ensure_bucket_exists(client, supabase_url, supabase_key, AVATAR_BUCKET)
+    resp = client.post(upload_url, headers=headers, content=image_bytes)
+    if resp.status_code >= 400:
+        if _is_bucket_missing(resp):
+            _forget_bucket(AVATAR_BUCKET)
+        raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
     return f"{supabase_url}/storage/v1/object/public/{AVATAR_BUCKET}/{filename}"
 
 def validate_and_normalise_avatar(value: str) -> str:
@@ -0,0 +1,328 @@
+"""
+Async Supabase Storage API — same functions as storage.py, but awaitable.
+
+Use these from async route handlers so a slow upload only suspends the
+request that issued it instead of blocking the worker's event loop.
+
+  - One pooled httpx.AsyncClient per event loop (keep-alive, explicit timeouts)
+  - At most STORAGE_MAX_CONCURRENCY storage calls in flight per worker;
+    callers wait up to _SLOT_TIMEOUT seconds for a slot before failing
+  - Shares the known-bucket cache and credential helpers with storage.py
+  - Honours STORAGE_BACKEND=local (see storage_local.py) like storage.py
+  - Bulk deletes use the batch-remove endpoint: one request per bucket per
+    _BATCH_REMOVE_MAX objects, run after the response via BackgroundTasks
+"""
+
+import os
+import uuid
+import base64
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import anyio
+import httpx
+
+from app.utils.timing import AsyncTimedTransport
+
+from app.utils.storage import (
+    AVATAR_BUCKET,
+    DuplicateFileError,
+    _slugify,
+    _supabase_creds,
+    _storage_headers,
+    _strip_data_uri,
+    _is_bucket_missing,
+    _forget_bucket,
+    _known_buckets,
+    _known_buckets_lock,
+    local_backend,
+)
+
+_HTTP_TIMEOUT   = httpx.Timeout(60.0, connect=10.0)
+_HTTP_LIMITS    = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+_MAX_CONCURRENT = int(os.getenv("STORAGE_MAX_CONCURRENCY", "4"))
+_SLOT_TIMEOUT   = 30.0
+_FILE_CHUNK     = 256 * 1024
+_BATCH_REMOVE_MAX = 1000  # Storage API limit per remove call
+
+# AsyncClient and Semaphore are bound to the loop they were first used on
+_loop_state = {}  # loop -> (client, semaphore)
+
+
+def _state() -> tuple:
+    loop = asyncio.get_running_loop()
+    st = _loop_state.get(loop)
+    if st is None:
+        for dead in [l for l in _loop_state if l.is_closed()]:
+            _loop_state.pop(dead, None)
+        st = (httpx.AsyncClient(timeout=_HTTP_TIMEOUT, transport=AsyncTimedTransport(limits=_HTTP_LIMITS)),
+              asyncio.Semaphore(_MAX_CONCURRENT))
+        _loop_state[loop] = st
+    return st
+
+
+@asynccontextmanager
+async def _slot():
+    """Yield the shared client once a concurrency slot is free."""
+    client, sem = _state()
+    try:
+        await asyncio.wait_for(sem.acquire(), timeout=_SLOT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise RuntimeError("Storage is busy — please retry the upload.") from None
+    try:
+        yield client
+    finally:
+        sem.release()
+
+
+async def aclose_client() -> None:
+    """Close this loop's client (tests / shutdown). A new one is made on next use."""
+    st = _loop_state.pop(asyncio.get_running_loop(), None)
+    if st:
+        await st[0].aclose()
+
+
+async def _ensure_bucket_exists(client: httpx.AsyncClient, url: str, key: str, bucket: str) -> None:
+    """Create the bucket if it doesn't already exist (idempotent, cached per process)."""
+    with _known_buckets_lock:
+        if bucket in _known_buckets:
+            return
+
+    headers = _storage_headers(key)
+    resp = await client.get(f"{url}/storage/v1/bucket/{bucket}", headers=headers)
+
+    if _is_bucket_missing(resp):
+        print(f"[Supabase Storage INFO] Bucket '{bucket}' missing. Attempting to auto-create...")
+        create_resp = await client.post(
+            f"{url}/storage/v1/bucket",
+            headers=headers,
+            json={"id": bucket, "name": bucket, "public": True},
+        )
+        if create_resp.status_code >= 400 and "already exists" not in create_resp.text.lower():
+            print(f"[Supabase Storage ERROR] Failed to auto-create bucket '{bucket}'.")
+            print(f"Status: {create_resp.status_code}")
+            print(f"Response: {create_resp.text}\n")
+            create_resp.raise_for_status()
+    elif resp.status_code >= 400:
+        print(f"\n[Supabase Storage INFO] Checking bucket '{bucket}' returned {resp.status_code}: {resp.text}")
+        return
+
+    with _known_buckets_lock:
+        _known_buckets.add(bucket)
+
+
+async def _iter_file(file_path: str):
+    async with await anyio.open_file(file_path, "rb") as fh:
+        while True:
+            chunk = await fh.read(_FILE_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+# ── PDF upload ─────────────────────────────────────────────────────────────────
+
+async def _upload_pdf_content(content, filename: str, bucket_name: str,
+                              content_length: int = None) -> str:
+    if not bucket_name:
+        bucket_name = "default-subject"
+
+    local = local_backend()
+    if local:
+        return await local.aput(bucket_name, filename, content)
+
+    supabase_url, supabase_key = _supabase_creds()
+    object_path = filename
+    upload_url = f"{supabase_url}/storage/v1/object/{bucket_name}/{object_path}"
+
+    headers = {
+        **_storage_headers(supabase_key),
+        "Content-Type": "application/pdf",
+        "x-upsert": "false",  # strict: do not overwrite if file already exists
+    }
+    if content_length is not None:
+        headers["Content-Length"] = str(content_length)
+
+    async with _slot() as client:
+        await _ensure_bucket_exists(client, supabase_url, supabase_key, bucket_name)
+        resp = await client.post(upload_url, headers=headers, content=content)
+
+    if resp.status_code == 400 and "Duplicate" in resp.text:
+        raise DuplicateFileError(f"A file named '{filename}' already exists in the '{bucket_name}' subject.")
+
+    if resp.status_code >= 400:
+        if _is_bucket_missing(resp):
+            _forget_bucket(bucket_name)
+        print(f"\n[Supabase Storage ERROR] Failed to upload '{object_path}' to bucket '{bucket_name}'")
+        print(f"Status: {resp.status_code}")
+        print(f"Response: {resp.text}\n")
+        raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
+
+    return f"{supabase_url}/storage/v1/object/public/{bucket_name}/{object_path}"
+
+
+async def upload_pdf_bytes(file_bytes: bytes, filename: str, bucket_name: str) -> str:
+    """Upload raw PDF bytes to a dynamically created subject bucket."""
+    return await _upload_pdf_content(file_bytes, filename, bucket_name)
+
+
+async def upload_pdf_file(file_path: str, filename: str, bucket_name: str) -> str:
+    """Upload a PDF that is already on disk, streaming it in chunks."""
+    local = local_backend()
+    if local:
+        return await local.aput(bucket_name or "default-subject", filename, _iter_file(file_path))
+    size = os.path.getsize(file_path)
+    return await _upload_pdf_content(_iter_file(file_path), filename, bucket_name, content_length=size)
+
+
+async def upload_pdf_stream(chunks, filename: str, bucket_name: str, content_length: int = None) -> str:
+    """Upload a PDF from an async iterator of byte chunks (e.g. a multipart upload)."""
+    return await _upload_pdf_content(chunks, filename, bucket_name, content_length=content_length)
+
+
+async def upload_pdf_base64(base64_str: str, filename: str, subject_name: str) -> str:
+    """Upload a base64-encoded PDF to the dynamically created subject bucket."""
+    base64_str, _ = _strip_data_uri(base64_str)
+    try:
+        file_bytes = base64.b64decode(base64_str)
+    except Exception as exc:
+        raise ValueError(f"Invalid Base64 string: {exc}") from exc
+    return await _upload_pdf_content(file_bytes, f"{uuid.uuid4().hex}.pdf", _slugify(subject_name))
+
+
+def _split_public_url(public_url: str, supabase_url: str):
+    """(bucket, object_path) for one of our public URLs, else None."""
+    prefix = f"{supabase_url}/storage/v1/object/public/"
+    if not public_url or not public_url.startswith(prefix):
+        return None  # Not a file we own — skip
+    parts = public_url[len(prefix):].split("/", 1)
+    return tuple(parts) if len(parts) == 2 else None
+
+
+async def delete_pdf_by_url(public_url: str) -> None:
+    """Delete a previously uploaded PDF given its public URL (404s ignored)."""
+    if not public_url:
+        return
+    local = local_backend()
+    if local:
+        parts = local.split_public_url(public_url)
+        if parts:
+            await local.aremove(parts[0], [parts[1]])
+        return
+    try:
+        supabase_url, supabase_key = _supabase_creds()
+    except ValueError:
+        return
+
+    parts = _split_public_url(public_url, supabase_url)
+    if not parts:
+        return
+    bucket_name, object_path = parts
+
+    async with _slot() as client:
+        resp = await client.delete(
+            f"{supabase_url}/storage/v1/object/{bucket_name}/{object_path}",
+            headers=_storage_headers(supabase_key), timeout=30,
+        )
+    if resp.status_code >= 400 and resp.status_code != 404:
+        print(f"[Warning] Failed to delete PDF {object_path} from bucket {bucket_name}: {resp.text}")
+
+
+async def _remove_batch(supabase_url: str, supabase_key: str, bucket: str, paths: list) -> None:
+    async with _slot() as client:
+        resp = await client.request(
+            "DELETE", f"{supabase_url}/storage/v1/object/{bucket}",
+            headers=_storage_headers(supabase_key), json={"prefixes": paths}, timeout=30,
+        )
+    if resp.status_code >= 400 and resp.status_code != 404:
+        print(f"[Warning] Failed to remove {len(paths)} object(s) from bucket {bucket}: {resp.text}")
+
+
+async def delete_pdfs_by_url(public_urls) -> int:
+    """
+    Delete many uploaded files in as few requests as possible.
+    URLs are grouped by bucket and removed in batches; batches for different
+    buckets run concurrently within the storage slot limit. Returns the
+    number of objects requested for removal.
+    """
+    local = local_backend()
+    if local:
+        by_bucket = defaultdict(list)
+        for url in public_urls or ():
+            parts = local.split_public_url(url)
+            if parts:
+                by_bucket[parts[0]].append(parts[1])
+        for bucket, paths in by_bucket.items():
+            await local.aremove(bucket, paths)
+        return sum(len(p) for p in by_bucket.values())
+
+    try:
+        supabase_url, supabase_key = _supabase_creds()
+    except ValueError:
+        return 0
+
+    by_bucket = defaultdict(set)
+    for url in public_urls or ():
+        parts = _split_public_url(url, supabase_url)
+        if parts:
+            by_bucket[parts[0]].add(parts[1])
+
+    batches = []
+    for bucket, paths in by_bucket.items():
+        paths = sorted(paths)
+        for i in range(0, len(paths), _BATCH_REMOVE_MAX):
+            batches.append(_remove_batch(supabase_url, supabase_key, bucket, paths[i:i + _BATCH_REMOVE_MAX]))
+
+    results = await asyncio.gather(*batches, return_exceptions=True)
+    for exc in results:
+        if isinstance(exc, Exception):
+            print(f"[Warning] Storage batch remove failed: {exc!r}")
+    return sum(len(p) for p in by_bucket.values())
+
+
+def queue_storage_cleanup(background_tasks, public_urls) -> None:
+    """Remove files after the response has been sent (see queue_email)."""
+    urls = [u for u in public_urls if u]
+    if urls:
+        background_tasks.add_task(delete_pdfs_by_url, urls)
+
+
+# ── Avatar upload ──────────────────────────────────────────────────────────────
+
+async def _upload_avatar_object(data: bytes, filename: str, mime_type: str) -> str:
+    local = local_backend()
+    if local:
+        return await local.aput(AVATAR_BUCKET, filename, data, upsert=True)
+    supabase_url, supabase_key = _supabase_creds()
+    upload_url = f"{supabase_url}/storage/v1/object/{AVATAR_BUCKET}/{filename}"
+    headers = {
+        **_storage_headers(supabase_key),
+        "Content-Type": mime_type,
+        "x-upsert": "true",
+    }
+    async with _slot() as client:
+        await _ensure_bucket_exists(client, supabase_url, supabase_key, AVATAR_BUCKET)
+        resp = await client.post(upload_url, headers=headers, content=data)
+    if resp.status_code >= 400:
+        if _is_bucket_missing(resp):
+            _forget_bucket(AVATAR_BUCKET)
+        raise RuntimeError(f"Supabase storage error ({resp.status_code}): {resp.text}")
+    return f"{supabase_url}/storage/v1/object/public/{AVATAR_BUCKET}/{filename}"
+
+
+async def upload_avatar_bytes(image_bytes: bytes, user_id: str, first_name: str,
+                              mime_type: str = "image/png") -> str:
+    """Store an avatar as uploaded (fallback when it can't be transcoded)."""
+    first_slug = _slugify(first_name) if first_name else "user"
+    return await _upload_avatar_object(image_bytes, f"{user_id}-{first_slug}.png", mime_type)
+
+
+async def upload_avatar_variants(variants: dict, user_id: str) -> dict:
+    """Upload transcoded WebP variants ({size: bytes}) concurrently; returns {size: url}."""
+    from app.utils.avatars import avatar_key
+    sizes = list(variants)
+    urls = await asyncio.gather(*(
+        _upload_avatar_object(variants[size], avatar_key(user_id, size), "image/webp") for size in sizes
+    ))
+    return dict(zip(sizes, urls))
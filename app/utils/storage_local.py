@@ -0,0 +1,140 @@
+"""
+Local-disk storage backend — STORAGE_BACKEND=local.
+
+Keeps the Supabase layout and URL scheme so nothing above storage.py /
+storage_async.py has to know which backend is active:
+
+  - Objects : {STORAGE_LOCAL_DIR}/{bucket}/{path}   (default ./.storage)
+  - URLs    : {STORAGE_PUBLIC_URL}/storage/v1/object/public/{bucket}/{path}
+              (default http://localhost:8000), served by the StaticFiles
+              mount that create_app() adds when this backend is selected
+
+Same semantics as the REST API: buckets are created on first write, PDFs
+refuse to overwrite (DuplicateFileError), avatars upsert, deleting a missing
+object is a no-op. Meant for offline development and load tests.
+"""
+
+import os
+import shutil
+import tempfile
+
+import anyio
+
+from app.utils.storage import DuplicateFileError
+
+_PUBLIC_PREFIX = "/storage/v1/object/public/"
+
+
+class LocalStorage:
+    def __init__(self, root: str, base_url: str):
+        self.root     = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    @classmethod
+    def from_env(cls) -> "LocalStorage":
+        return cls(
+            os.getenv("STORAGE_LOCAL_DIR", ".storage"),
+            os.getenv("STORAGE_PUBLIC_URL", f"http://localhost:{os.getenv('PORT', 8000)}"),
+        )
+
+    # ── Paths / URLs ──────────────────────────────────────────────────────────
+
+    def _path(self, bucket: str, object_path: str) -> str:
+        full = os.path.abspath(os.path.join(self.root, bucket, object_path))
+        if not full.startswith(os.path.join(self.root, bucket, "")):
+            raise ValueError(f"Invalid object path '{object_path}'")
+        return full
+
+    def public_url(self, bucket: str, object_path: str) -> str:
+        return f"{self.base_url}{_PUBLIC_PREFIX}{bucket}/{object_path}"
+
+    def split_public_url(self, public_url: str):
+        """(bucket, object_path) for one of our public URLs, else None."""
+        prefix = f"{self.base_url}{_PUBLIC_PREFIX}"
+        if not public_url or not public_url.startswith(prefix):
+            return None
+        parts = public_url[len(prefix):].split("/", 1)
+        return tuple(parts) if len(parts) == 2 else None
+
+    # ── Write helpers ─────────────────────────────────────────────────────────
+
+    def _duplicate(self, bucket: str, object_path: str) -> DuplicateFileError:
+        return DuplicateFileError(f"A file named '{object_path}' already exists in the '{bucket}' subject.")
+
+    def _reserve(self, bucket: str, object_path: str, upsert: bool) -> tuple:
+        """(dest, fd, tmp) — temp file next to the destination, same filesystem."""
+        dest = self._path(bucket, object_path)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if not upsert and os.path.exists(dest):
+            raise self._duplicate(bucket, object_path)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".upload-")
+        return dest, fd, tmp
+
+    def _commit(self, tmp: str, dest: str, bucket: str, object_path: str, upsert: bool) -> str:
+        """
+        Move a fully written temp file into place: rename for upserts, hard
+        link otherwise so a concurrent writer of the same name loses cleanly.
+        Readers never see a partial object.
+        """
+        try:
+            if upsert:
+                os.replace(tmp, dest)
+            else:
+                try:
+                    os.link(tmp, dest)
+                except FileExistsError:
+                    raise self._duplicate(bucket, object_path) from None
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return self.public_url(bucket, object_path)
+
+    # ── Sync API ──────────────────────────────────────────────────────────────
+
+    def put(self, bucket: str, object_path: str, content, upsert: bool = False) -> str:
+        """Store bytes, an open binary file or an iterable of byte chunks."""
+        dest, fd, tmp = self._reserve(bucket, object_path, upsert)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if isinstance(content, (bytes, bytearray, memoryview)):
+                    out.write(content)
+                elif hasattr(content, "read"):
+                    shutil.copyfileobj(content, out)
+                else:
+                    for chunk in content:
+                        out.write(chunk)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return self._commit(tmp, dest, bucket, object_path, upsert)
+
+    def remove(self, bucket: str, object_paths) -> int:
+        removed = 0
+        for object_path in object_paths:
+            try:
+                os.unlink(self._path(bucket, object_path))
+                removed += 1
+            except (FileNotFoundError, ValueError):
+                pass
+        return removed
+
+    # ── Async API (disk I/O on worker threads) ────────────────────────────────
+
+    async def aput(self, bucket: str, object_path: str, content, upsert: bool = False) -> str:
+        """Like put(); async iterators are written chunk by chunk as they arrive."""
+        if not hasattr(content, "__aiter__"):
+            return await anyio.to_thread.run_sync(self.put, bucket, object_path, content, upsert)
+
+        dest, fd, tmp = self._reserve(bucket, object_path, upsert)
+        os.close(fd)
+        try:
+            async with await anyio.open_file(tmp, "wb") as out:
+                async for chunk in content:
+                    await out.write(chunk)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return await anyio.to_thread.run_sync(self._commit, tmp, dest, bucket, object_path, upsert)
+
+    async def aremove(self, bucket: str, object_paths) -> int:
+        return await anyio.to_thread.run_sync(self.remove, bucket, list(object_paths))
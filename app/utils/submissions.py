@@ -0,0 +1,266 @@
+"""
+Write-behind ingestion for assessment submissions.
+
+Synchronised mock exams put hundreds of submits on a worker within seconds,
+each paying its own pooled connection, INSERT and commit plus another for
+the activity log. Here the route scores in memory (answer_keys) and hands
+the result to ingest(), which:
+
+  - deduplicates on (user_id, assessment_id, idempotency key): a retry still queued or in
+    flight awaits the same write; one already committed gets the stored row
+    back (ON CONFLICT DO NOTHING on a partial unique index)
+  - queues it and flushes every SUBMIT_FLUSH_MS (default 20 ms), or at once
+    when SUBMIT_BATCH_MAX (default 200) rows are waiting: one multi-row
+    INSERT and commit per batch, then one activity-log INSERT
+  - returns only after that commit, so the acknowledgement is durable; a
+    batch rejected for one row's data is retried row by row so only that
+    submission fails, and a failed flush fails its waiters, who retry with
+    the same key
+
+Flush listeners (add_flush_listener) run once per batch with the new rows,
+so derived data refreshes per batch instead of per submission. They run in
+the background after the waiters have been answered, never on the ack path.
+"""
+import os
+import sys
+import uuid
+import asyncio
+import contextvars
+
+from psycopg2 import Binary, IntegrityError, DataError
+from psycopg2.extras import execute_values
+from starlette.concurrency import run_in_threadpool
+
+from app.db import get_cursor
+from app.utils import metrics
+from app.utils.log import log_actions
+
+_FLUSH_DELAY = int(os.getenv("SUBMIT_FLUSH_MS", "20")) / 1000
+_BATCH_MAX   = int(os.getenv("SUBMIT_BATCH_MAX", "200"))
+KEY_MAX_LEN  = 100
+
+_listeners     = []
+_loop_state    = {}     # loop -> _Batcher (futures and timers are loop-bound)
+_known_layouts = set()  # (assessment_id, layout_hash) already in answer_layouts
+
+BATCH_SIZE = metrics.Histogram(
+    "submission_batch_size", "Submissions written per flush.", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+metrics.Gauge("submission_queue_depth", "Submissions waiting for the next flush.",
+              fn=lambda: sum(len(b.pending) for b in list(_loop_state.values())))
+
+
+class Submission:
+    __slots__ = ("assessment_id", "user_id", "idempotency_key", "correct", "total", "title", "ip",
+                 "question_ids", "layout_hash", "correct_mask", "choices")
+
+    def __init__(self, assessment_id: str, user_id: str, correct: int, total: int,
+                 idempotency_key: str = None, title: str = None, ip: str = None,
+                 question_ids: tuple = (), layout_hash: str = None,
+                 correct_mask: bytes = None, choices: list = None):
+        self.assessment_id   = str(assessment_id)
+        self.user_id         = str(user_id)
+        self.idempotency_key = idempotency_key or uuid.uuid4().hex
+        self.correct         = correct
+        self.total           = total
+        self.title           = title
+        self.ip              = ip
+        # Answer vectors (see answer_keys); question_ids is the layout they index into
+        self.question_ids    = question_ids
+        self.layout_hash     = layout_hash
+        self.correct_mask    = correct_mask
+        self.choices         = choices
+
+    @property
+    def dedupe_key(self) -> tuple:
+        return (self.user_id, self.assessment_id, self.idempotency_key)
+
+
+def add_flush_listener(fn):
+    """fn(rows) is called in a worker thread after each committed batch with the newly inserted rows."""
+    _listeners.append(fn)
+
+
+# ── Batch write (worker thread) ───────────────────────────────────────────────
+
+_RESULT_COLS = "id, assessment_id, user_id, score, total_items, idempotency_key, date_taken"
+
+
+def _row_key(row: dict) -> tuple:
+    return (str(row["user_id"]), str(row["assessment_id"]), row["idempotency_key"])
+
+
+def _insert(subs: list) -> dict:
+    """Insert submissions in one transaction; dedupe_key -> stored row for those found."""
+    layouts = {}
+    for s in subs:
+        if s.layout_hash and (s.assessment_id, s.layout_hash) not in _known_layouts:
+            layouts[(s.assessment_id, s.layout_hash)] = list(s.question_ids)
+
+    with get_cursor() as cur:
+        if layouts:
+            execute_values(
+                cur,
+                """INSERT INTO answer_layouts (assessment_id, layout_hash, question_ids) VALUES %s
+                   ON CONFLICT (assessment_id, layout_hash) DO NOTHING""",
+                [(aid, h, ids) for (aid, h), ids in layouts.items()],
+                template="(%s, %s, %s::uuid[])",
+                page_size=len(layouts),
+            )
+        inserted = execute_values(
+            cur,
+            f"""INSERT INTO assessment_results
+                    (assessment_id, user_id, score, total_items, idempotency_key,
+                     layout_hash, correct_mask, choices)
+                VALUES %s
+                ON CONFLICT (user_id, assessment_id, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+                RETURNING {_RESULT_COLS}""",
+            [(s.assessment_id, s.user_id, s.correct, s.total, s.idempotency_key,
+              s.layout_hash, Binary(s.correct_mask) if s.correct_mask is not None else None, s.choices)
+             for s in subs],
+            template="(%s, %s, %s, %s, %s, %s, %s, %s::smallint[])",
+            page_size=len(subs),
+            fetch=True,
+        )
+        stored = {_row_key(r): dict(r, duplicate=False) for r in inserted}
+
+        retries = [s for s in subs if s.dedupe_key not in stored]
+        if retries:
+            cur.execute(
+                f"""SELECT {_RESULT_COLS} FROM assessment_results
+                    WHERE (user_id, assessment_id, idempotency_key) IN
+                          (SELECT * FROM unnest(%s::uuid[], %s::uuid[], %s::text[]))""",
+                [[s.user_id for s in retries], [s.assessment_id for s in retries],
+                 [s.idempotency_key for s in retries]],
+            )
+            for r in cur.fetchall():
+                stored[_row_key(r)] = dict(r, duplicate=True)
+
+    _known_layouts.update(layouts)
+    return stored
+
+
+def _write_batch(subs: list) -> list:
+    """
+    Write a batch; returns, per submission, its stored row or the exception
+    that row failed with. A batch rejected for its data (e.g. an assessment
+    deleted since scoring) is retried row by row, so one bad row fails alone.
+    """
+    errors = {}
+    try:
+        stored = _insert(subs)
+    except (IntegrityError, DataError) as e:
+        if len(subs) == 1:
+            raise
+        print(f"[submissions] Batch of {len(subs)} rejected ({e!r}), retrying rows one by one", file=sys.stderr)
+        stored = {}
+        for s in subs:
+            try:
+                stored.update(_insert([s]))
+            except (IntegrityError, DataError) as row_error:
+                errors[s.dedupe_key] = row_error
+
+    results = []
+    for s in subs:
+        row = stored.get(s.dedupe_key)
+        if row is None:
+            # e.g. the conflicting row was deleted before it could be read back
+            row = errors.get(s.dedupe_key) or LookupError(f"Submission {s.idempotency_key} was not recorded")
+        results.append(row)
+
+    log_actions([
+        (s.user_id, "Assessment submitted", s.title, s.assessment_id, s.ip)
+        for s, r in zip(subs, results) if isinstance(r, dict) and not r["duplicate"]
+    ])
+    return results
+
+
+def _notify(new_rows: list):
+    for fn in _listeners:
+        try:
+            fn(new_rows)
+        except Exception as e:
+            print(f"[submissions] Flush listener {fn.__name__} failed: {e!r}", file=sys.stderr)
+
+
+# ── Per-loop queue ────────────────────────────────────────────────────────────
+
+class _Batcher:
+    def __init__(self, loop):
+        self.loop     = loop
+        self.pending  = []   # [(Submission, Future)]
+        self.inflight = {}   # dedupe_key -> Future
+        self.timer    = None
+        self.tasks    = set()
+
+    async def submit(self, sub: Submission) -> dict:
+        fut = self.inflight.get(sub.dedupe_key)
+        if fut is not None:
+            return dict(await asyncio.shield(fut), duplicate=True)
+
+        fut = self.inflight[sub.dedupe_key] = self.loop.create_future()
+        self.pending.append((sub, fut))
+        if len(self.pending) >= _BATCH_MAX:
+            self.flush()
+        elif self.timer is None:
+            # Empty context: the flush belongs to no single request's timings
+            self.timer = self.loop.call_later(_FLUSH_DELAY, self.flush, context=contextvars.Context())
+        return await asyncio.shield(fut)
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.pending:
+            batch, self.pending = self.pending[:_BATCH_MAX], self.pending[_BATCH_MAX:]
+            self._spawn(self._write(batch))
+
+    def _spawn(self, coro):
+        task = self.loop.create_task(coro, context=contextvars.Context())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _write(self, batch: list):
+        BATCH_SIZE.observe(len(batch))
+        try:
+            rows = await run_in_threadpool(_write_batch, [s for s, _ in batch])
+        except Exception as e:
+            print(f"[submissions] Batch of {len(batch)} failed: {e!r}", file=sys.stderr)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+                    fut.exception()  # retrieved — waiters that went away don't warn
+        else:
+            for (_, fut), row in zip(batch, rows):
+                if fut.done():
+                    continue
+                if isinstance(row, Exception):
+                    fut.set_exception(row)
+                    fut.exception()
+                else:
+                    fut.set_result(row)
+            # Derived data refreshes after the waiters are answered, off the ack path
+            new_rows = [r for r in rows if isinstance(r, dict) and not r["duplicate"]]
+            if new_rows and _listeners:
+                self._spawn(run_in_threadpool(_notify, new_rows))
+        finally:
+            for sub, _ in batch:
+                self.inflight.pop(sub.dedupe_key, None)
+
+
+def _batcher() -> _Batcher:
+    loop = asyncio.get_running_loop()
+    b = _loop_state.get(loop)
+    if b is None:
+        for dead in [l for l in _loop_state if l.is_closed()]:
+            _loop_state.pop(dead, None)
+        b = _loop_state[loop] = _Batcher(loop)
+    return b
+
+
+async def ingest(sub: Submission) -> dict:
+    """
+    Queue a scored submission and wait for its batch to commit. Returns the
+    stored assessment_results row plus duplicate=True when the idempotency
+    key had already been recorded for this user and assessment.
+    """
+    return await _batcher().submit(sub)
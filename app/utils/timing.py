@@ -0,0 +1,105 @@
+"""
+Per-request timing counters.
+
+TimingMiddleware (app/middleware/timing.py) puts a RequestTimings in a
+context variable for the lifetime of each request. Instrumented layers add
+to it without knowing about the request:
+
+  - app/db.py        : pool checkout wait, every cursor.execute()
+  - storage clients  : every HTTP round trip (TimedTransport / AsyncTimedTransport)
+
+Context variables follow the request into run_in_threadpool and background
+tasks; counters are lock-protected because sync handlers run on worker
+threads. Outside a request (scripts, startup) recording is a no-op.
+"""
+import time
+import threading
+import contextvars
+
+import httpx
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    __slots__ = ("started", "db_count", "db_ms", "pool_ms", "http_count", "http_ms", "_lock")
+
+    def __init__(self):
+        self.started    = time.perf_counter()
+        self.db_count   = 0
+        self.db_ms      = 0.0
+        self.pool_ms    = 0.0
+        self.http_count = 0
+        self.http_ms    = 0.0
+        self._lock      = threading.Lock()
+
+    def add_db(self, ms: float):
+        with self._lock:
+            self.db_count += 1
+            self.db_ms    += ms
+
+    def add_pool(self, ms: float):
+        with self._lock:
+            self.pool_ms += ms
+
+    def add_http(self, ms: float):
+        with self._lock:
+            self.http_count += 1
+            self.http_ms    += ms
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+def begin() -> tuple:
+    """Start collecting for the current request; returns (timings, reset_token)."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end(token) -> None:
+    _current.reset(token)
+
+
+def current() -> RequestTimings | None:
+    return _current.get()
+
+
+def record_db(ms: float):
+    t = _current.get()
+    if t is not None:
+        t.add_db(ms)
+
+
+def record_pool(ms: float):
+    t = _current.get()
+    if t is not None:
+        t.add_pool(ms)
+
+
+def record_http(ms: float):
+    t = _current.get()
+    if t is not None:
+        t.add_http(ms)
+
+
+# ── httpx transports ──────────────────────────────────────────────────────────
+
+class TimedTransport(httpx.HTTPTransport):
+    """Sync transport that reports each round trip (request body → response headers)."""
+
+    def handle_request(self, request):
+        t0 = time.perf_counter()
+        try:
+            return super().handle_request(request)
+        finally:
+            record_http((time.perf_counter() - t0) * 1000)
+
+
+class AsyncTimedTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request):
+        t0 = time.perf_counter()
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            record_http((time.perf_counter() - t0) * 1000)
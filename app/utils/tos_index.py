@@ -0,0 +1,149 @@
+"""
+Active-TOS subject index.
+
+tos_subjects holds one row per (TOS version, subject) — name, weight and the
+resolved subjects.id — built from tos_versions.data whenever a version is
+activated (or its data edited while ACTIVE). Readiness queries join on it
+instead of unnesting the JSONB blob. tos_competencies is rebuilt alongside:
+one row per competency code with its section and planned items per Bloom
+level, which competency mastery (app/utils/mastery.py) joins on.
+
+The ACTIVE version's id and subject names / ids are cached in-process. The
+cache is dropped on activation and on subject create/rename/delete; a short
+TTL is the backstop for other worker processes that did not see the write.
+"""
+import time
+import threading
+from psycopg2.extras import execute_values
+from app.db import fetchall, execute, get_cursor
+
+_CACHE_TTL = 60  # seconds
+
+_lock     = threading.Lock()
+_snapshot = None  # (loaded_at, names | None, subject_ids, version_id | None)
+
+BLOOM_LEVELS = ("remembering", "understanding", "applying", "analyzing", "evaluating", "creating")
+
+
+# ── Build / sync ──────────────────────────────────────────────────────────────
+
+def _int(value) -> int:
+    try:
+        return max(0, int(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _competency_rows(subject_name: str, sections: list, section_title: str = "", out: list = None) -> list:
+    """Flatten nested sections into (subject, code, description, section, items, bloom[6]) rows."""
+    out = [] if out is None else out
+    for sec in sections or []:
+        title = sec.get("title") or section_title
+        for c in sec.get("competencies") or []:
+            code = str(c.get("code") or "").strip().rstrip(".,")
+            if code:
+                out.append((
+                    subject_name, code, c.get("description") or "", title,
+                    _int(c.get("no_of_items")), [_int(c.get(f"bloom_{b}")) for b in BLOOM_LEVELS],
+                ))
+        _competency_rows(subject_name, sec.get("subsections"), title, out)
+    return out
+
+
+def rebuild_tos_subjects(version_id: str, data: dict):
+    """Replace the tos_subjects / tos_competencies rows of one version from its data blob."""
+    names, weights, competencies = [], [], {}
+    for s in (data or {}).get("subjects") or []:
+        if s.get("subject"):
+            names.append(s["subject"])
+            weights.append(str(s.get("weight") or ""))
+            for row in _competency_rows(s["subject"], s.get("sections")):
+                competencies.setdefault(row[:2], row)  # first occurrence of a code wins
+
+    with get_cursor() as cur:
+        cur.execute("DELETE FROM tos_subjects WHERE version_id = %s", [version_id])
+        if names:
+            cur.execute(
+                """INSERT INTO tos_subjects (version_id, subject_name, subject_id, weight, sort_order)
+                   SELECT %s, v.name, s.id, v.weight, v.ord
+                   FROM   unnest(%s::text[], %s::text[]) WITH ORDINALITY AS v(name, weight, ord)
+                   LEFT   JOIN subjects s ON s.name = v.name
+                   ON CONFLICT (version_id, subject_name) DO NOTHING""",
+                [version_id, names, weights],
+            )
+        cur.execute("DELETE FROM tos_competencies WHERE version_id = %s", [version_id])
+        if competencies:
+            execute_values(
+                cur,
+                """INSERT INTO tos_competencies
+                       (version_id, subject_name, code, description, section, no_of_items, bloom, sort_order)
+                   VALUES %s""",
+                [(version_id, *row, i) for i, row in enumerate(competencies.values())],
+                template="(%s, %s, %s, %s, %s, %s, %s::int[], %s)",
+                page_size=len(competencies),
+            )
+    invalidate_tos_index()
+
+
+def sync_tos_subject_ids():
+    """Re-resolve subject_id after subjects are created or renamed."""
+    execute(
+        """UPDATE tos_subjects ts
+           SET    subject_id = (SELECT s.id FROM subjects s WHERE s.name = ts.subject_name)
+           WHERE  ts.subject_id IS DISTINCT FROM
+                  (SELECT s.id FROM subjects s WHERE s.name = ts.subject_name)"""
+    )
+    invalidate_tos_index()
+
+
+def invalidate_tos_index():
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+# ── Cached reads ──────────────────────────────────────────────────────────────
+
+def _load():
+    global _snapshot
+    with _lock:
+        snap = _snapshot
+        if snap is not None and time.monotonic() - snap[0] < _CACHE_TTL:
+            return snap
+
+    rows = fetchall(
+        """SELECT tv.id AS version_id, ts.subject_name, ts.subject_id
+           FROM   tos_versions tv
+           LEFT   JOIN tos_subjects ts ON ts.version_id = tv.id
+           WHERE  tv.status = 'ACTIVE'
+           ORDER  BY tv.updated_at DESC, ts.sort_order"""
+    )
+    if not rows:
+        names, ids, version_id = None, [], None
+    else:
+        version_id = rows[0]["version_id"]
+        rows  = [r for r in rows if r["version_id"] == version_id and r["subject_name"]]
+        names = [r["subject_name"] for r in rows]
+        ids   = [str(r["subject_id"]) for r in rows if r["subject_id"]]
+        version_id = str(version_id)
+
+    snap = (time.monotonic(), names, ids, version_id)
+    with _lock:
+        _snapshot = snap
+    return snap
+
+
+def active_tos_subject_names() -> list[str] | None:
+    """Subject names of the ACTIVE TOS, or None when no version is active."""
+    names = _load()[1]
+    return list(names) if names is not None else None
+
+
+def active_tos_subject_ids() -> list[str]:
+    """subjects.id values that the ACTIVE TOS names (unmatched names skipped)."""
+    return list(_load()[2])
+
+
+def active_tos_version_id() -> str | None:
+    """id of the ACTIVE TOS version, or None when no version is active."""
+    return _load()[3]
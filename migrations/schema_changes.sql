@@ -28,7 +28,11 @@ DROP TABLE IF EXISTS student_sessions       CASCADE;
 DROP TABLE IF EXISTS student_moods          CASCADE;
 DROP TABLE IF EXISTS activity_logs          CASCADE;
 DROP TABLE IF EXISTS announcements          CASCADE;
+DROP TABLE IF EXISTS competency_mastery     CASCADE;
+DROP TABLE IF EXISTS tos_competencies       CASCADE;
+DROP TABLE IF EXISTS tos_subjects           CASCADE;
 DROP TABLE IF EXISTS tos_versions           CASCADE;
+DROP TABLE IF EXISTS answer_layouts         CASCADE;
 DROP TABLE IF EXISTS assessment_results     CASCADE;
 DROP TABLE IF EXISTS questions              CASCADE;
 DROP TABLE IF EXISTS assessments            CASCADE;
@@ -196,7 +200,30 @@ CREATE TABLE assessment_results (
     assessment_id UUID        REFERENCES assessments(id) ON DELETE CASCADE,
     score         INT         NOT NULL DEFAULT 0,
     total_items   INT         NOT NULL,
-    date_taken    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    date_taken    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    -- Client-supplied (or server-generated) key; retries of a submit
+    -- resolve to the row already recorded for (user_id, assessment_id, idempotency_key)
+    idempotency_key VARCHAR(100),
+    -- Answer vectors (NULL on rows recorded before they existed):
+    --   layout_hash  → answer_layouts row giving the question order
+    --   correct_mask → bit i (get_bit(correct_mask, i)) = question i correct
+    --   choices      → chosen option index per question; -1 blank, -2 unmatched
+    layout_hash   CHAR(16),
+    correct_mask  BYTEA,
+    choices       SMALLINT[],
+    -- Folded into competency_mastery yet (app/utils/mastery.py)
+    mastery_applied BOOLEAN   NOT NULL DEFAULT FALSE
+);
+
+-- ── ANSWER LAYOUTS ────────────────────────────────────────────
+-- Question order an assessment was scored against. Written once per
+-- distinct order, so each attempt stores 16 chars instead of its ids.
+CREATE TABLE answer_layouts (
+    assessment_id UUID        NOT NULL REFERENCES assessments(id) ON DELETE CASCADE,
+    layout_hash   CHAR(16)    NOT NULL,
+    question_ids  UUID[]      NOT NULL,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (assessment_id, layout_hash)
 );
 
 -- ── REQUEST CHANGES ───────────────────────────────────────────
@@ -258,6 +285,50 @@ CREATE TABLE tos_versions (
     updated_at        TIMESTAMPTZ  NOT NULL DEFAULT NOW()
 );
 
+-- ── TOS SUBJECTS ──────────────────────────────────────────────
+-- Normalised subject list of a TOS version, rebuilt from
+-- tos_versions.data on activation. subject_id is resolved by exact
+-- name so readiness joins never unnest the JSONB blob.
+CREATE TABLE tos_subjects (
+    version_id   UUID         NOT NULL REFERENCES tos_versions(id) ON DELETE CASCADE,
+    subject_name VARCHAR(200) NOT NULL,
+    subject_id   UUID         REFERENCES subjects(id) ON DELETE SET NULL,
+    weight       VARCHAR(20),
+    sort_order   INT          NOT NULL DEFAULT 0,
+    PRIMARY KEY (version_id, subject_name)
+);
+
+-- ── TOS COMPETENCIES ──────────────────────────────────────────
+-- Competency codes of a TOS version, rebuilt with tos_subjects.
+-- bloom = planned items per Bloom level (remembering … creating);
+-- questions.competency_codes entries name these codes.
+CREATE TABLE tos_competencies (
+    version_id   UUID         NOT NULL REFERENCES tos_versions(id) ON DELETE CASCADE,
+    subject_name VARCHAR(200) NOT NULL,
+    code         VARCHAR(50)  NOT NULL,
+    description  TEXT,
+    section      VARCHAR(300),
+    no_of_items  INT          NOT NULL DEFAULT 0,
+    bloom        INT[]        NOT NULL DEFAULT '{0,0,0,0,0,0}',
+    sort_order   INT          NOT NULL DEFAULT 0,
+    PRIMARY KEY (version_id, subject_name, code)
+);
+
+-- ── COMPETENCY MASTERY ────────────────────────────────────────
+-- Per-student running totals of answered questions per competency
+-- code of a subject, maintained per submission batch from the
+-- stored answer vectors (app/utils/mastery.py). Rebuildable from
+-- assessment_results at any time.
+CREATE TABLE competency_mastery (
+    user_id      UUID         NOT NULL REFERENCES users(id)    ON DELETE CASCADE,
+    subject_id   UUID         NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+    code         VARCHAR(50)  NOT NULL,
+    attempted    INT          NOT NULL DEFAULT 0,
+    correct      INT          NOT NULL DEFAULT 0,
+    last_attempt TIMESTAMPTZ,
+    PRIMARY KEY (user_id, subject_id, code)
+);
+
 -- ── ACTIVITY LOGS ─────────────────────────────────────────────
 CREATE TABLE activity_logs (
     id         UUID         PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -372,6 +443,11 @@ CREATE INDEX idx_assessments_status     ON assessments(status);
 CREATE INDEX idx_assessments_author_id  ON assessments(author_id);
 
 CREATE INDEX idx_results_user    ON assessment_results(user_id);
+CREATE INDEX idx_results_assessment ON assessment_results(assessment_id, layout_hash);
+CREATE UNIQUE INDEX idx_results_idempotency ON assessment_results(user_id, assessment_id, idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+CREATE INDEX idx_results_mastery_pending ON assessment_results(date_taken)
+    WHERE NOT mastery_applied AND layout_hash IS NOT NULL;
 
 CREATE INDEX idx_request_creator ON request_changes(created_by);
 CREATE INDEX idx_request_type    ON request_changes(type);
@@ -381,6 +457,9 @@ CREATE INDEX idx_tos_versions_status        ON tos_versions(status);
 CREATE INDEX idx_tos_versions_academic_year ON tos_versions(academic_year);
 CREATE INDEX idx_tos_versions_created_by    ON tos_versions(created_by);
 
+CREATE INDEX idx_tos_subjects_subject_id ON tos_subjects(subject_id);
+CREATE INDEX idx_competency_mastery_subject ON competency_mastery(subject_id, code);
+
 CREATE INDEX idx_activity_logs_user ON activity_logs(user_id);
 CREATE INDEX idx_activity_logs_date ON activity_logs(created_at);
 
@@ -393,6 +472,7 @@ CREATE INDEX idx_student_moods_date ON student_moods(mood_date);
 CREATE INDEX idx_student_moods_key  ON student_moods(mood_key);
 
 CREATE INDEX idx_questions_competency_codes ON questions USING gin(competency_codes);
+CREATE INDEX idx_questions_assessment      ON questions(assessment_id, sort_order);
 
 CREATE INDEX idx_module_reads_user    ON module_reads(user_id);
 CREATE INDEX idx_module_reads_subject ON module_reads(user_id, subject_id);
@@ -486,7 +566,8 @@ LEFT JOIN assessments a ON r.target_id  = a.id AND r.type = 'ASSESSMENT';
 
 -- view_student_individual_readiness
 --
--- Only considers subjects that are part of the currently ACTIVE TOS version.
+-- Only considers subjects that are part of the currently ACTIVE TOS version
+-- (via the normalised tos_subjects rows built on activation).
 -- Readiness formula uses weighted assessment types + mock exam reality-check blend:
 --   Weights: MOCK_EXAM=40%, FINAL_ASSESSMENT=30%, POST_ASSESSMENT=20%, QUIZ=10%
 --   Mock blend: if mock < computed → 70% computed + 30% mock
@@ -495,20 +576,17 @@ LEFT JOIN assessments a ON r.target_id  = a.id AND r.type = 'ASSESSMENT';
 CREATE OR REPLACE VIEW view_student_individual_readiness AS
 WITH
 active_tos AS (
-    SELECT data->'subjects' AS subjects
+    SELECT id
     FROM   tos_versions
     WHERE  status = 'ACTIVE'
     LIMIT 1
 ),
-active_subject_names AS (
-    SELECT jsonb_array_elements(subjects)->>'subject' AS name
-    FROM   active_tos
-),
 approved_subjects AS (
     SELECT s.id, s.name
-    FROM   subjects s
+    FROM   tos_subjects ts
+    JOIN   active_tos   t ON t.id = ts.version_id
+    JOIN   subjects     s ON s.id = ts.subject_id
     WHERE  s.status = 'APPROVED'
-      AND  s.name IN (SELECT name FROM active_subject_names)
 ),
 total_approved AS (
     SELECT COUNT(*) AS cnt FROM approved_subjects
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Extractor benchmark + golden-output regression check.
+
+Runs fully offline — no DB, no network:
+  * the markdown fixture is scripts/fixtures/extractor/tos_sample.md
+  * the PDF fixture is generated on the fly (plain Helvetica text, no deps)
+  * LlamaParse is stubbed to return the markdown fixture for extract()
+
+Golden outputs live next to the fixtures as *.golden.json. A parser change
+that alters any extracted value makes this script exit non-zero and print
+the first differing path.
+
+Usage:
+    python scripts/bench_extractor.py              # check goldens + timings
+    python scripts/bench_extractor.py --update     # rewrite golden files
+    python scripts/bench_extractor.py --repeat 50 --scale 40
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.getcwd())
+
+from app.extractor import extractor as _ext          # noqa: E402
+from app.extractor import config_inline as _config   # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "extractor")
+MD_FIXTURE  = os.path.join(FIXTURE_DIR, "tos_sample.md")
+
+
+# ── Synthetic PDF fixture ─────────────────────────────────────────────────────
+# Numeric columns (weight, items, 6 × Bloom) are left-aligned at fixed x so
+# _detect_col_boundaries finds eight clean clusters.
+
+PAGE_W, PAGE_H = 612, 792
+DESC_X   = 40
+NUM_COLS = [250, 290, 330, 370, 410, 450, 490, 530]
+
+PDF_PAGES = [
+    {
+        "header": ['ANNEX "A"', "Subject: Developmental Psychology", "Weight: 20%"],
+        "rows": [
+            ("Topics and Competencies", ["Weight", "Items", "Rem", "Und", "App", "Ana", "Eva", "Cre"]),
+            ("PQF Level 6", []),
+            ("A. Perspectives on Development", ["10%", "10"]),
+            ("1.1 Cite tenets of psychoanalytic theory", ["5%", "5", "2", "2", "1", "1", "1", "1"]),
+            ("1.2 Compare behavioural and", ["5%", "5", "1", "1", "1", "1", "1", "1"]),
+            ("cognitive views", []),
+            ("B. Research Methods", ["40%", "40"]),
+            ("1. Ethics in Research", ["15%", "15"]),
+            ("2.1 Explain ethical standards 12", ["15%", "15", "3", "4", "4", "2", "1", "1"]),
+            ("2.2 Explain developmental tasks", ["25%", "25", "5", "10", "5", "3", "1", "1"]),
+            ("TOTAL", ["40%", "40", "8", "14", "9", "5", "2", "2"]),
+            ("C. Developmental Theories", ["50%", "50"]),
+            ("3.1 Apply theories to vignettes", ["30%", "30", "5", "5", "10", "5", "3", "2"]),
+            ("3.2 Evaluate stage theories", ["20%", "20", "4", "4", "4", "4", "2", "2"]),
+            ("Grand Total", ["100%", "100", "22", "27", "24", "13", "7", "7"]),
+        ],
+    },
+    {
+        "header": ['ANNEX "B"', "Subject: Psychological Assessment", "Weight: 40%"],
+        "rows": [
+            ("A. Psychometric Principles", ["60%", "60"]),
+            ("1. Ascertain psychometric properties", ["10%", "10", "5", "2", "1", "1", "1", "1"]),
+            ("2. Describe reliability evidence", ["10%", "10", "2", "3", "3", "1", "1", "1"]),
+            ("1.3 Interpret norms and scores", ["40%", "40", "900", "10", "10", "10", "5", "1"]),
+        ],
+    },
+    {
+        # Same subject continuing on page 3 — must not flush.
+        "header": ["Subject: Psychological Assessment"],
+        "rows": [
+            ("B. Test Administration", ["40%", "40"]),
+            ("2.1 Administer tests per procedure", ["40%", "40", "10", "10", "10", "5", "3", "2"]),
+            ("", ["", "", "19", "15", "14", "17", "10", "5"]),
+            ("Total (for 100 items)", ["100%", "100", "30%", "40%", "30%"]),
+        ],
+    },
+]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(page: dict) -> bytes:
+    ops = ["BT", "/F1 8 Tf"]
+
+    def _put(x, y, text):
+        ops.append(f"1 0 0 1 {x} {y} Tm ({_pdf_escape(text)}) Tj")
+
+    y = PAGE_H - 40
+    for line in page["header"]:
+        _put(DESC_X, y, line)
+        y -= 14
+    y = PAGE_H - 200
+    for desc, nums in page["rows"]:
+        if desc:
+            _put(DESC_X, y, desc)
+        for x, val in zip(NUM_COLS, nums):
+            if val:
+                _put(x, y, val)
+        y -= 14
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_fixture_pdf(path: str, pages: list = PDF_PAGES):
+    """Write a minimal multi-page PDF (Helvetica, no external deps)."""
+    n = len(pages)
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # pages tree, filled below once kid ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in pages:
+        stream = _page_stream(page)
+        page_id, content_id = len(objs) + 1, len(objs) + 2
+        kids.append(f"{page_id} 0 R")
+        objs.append(
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_W} {PAGE_H}] "
+             f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {n} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    with open(path, "wb") as fh:
+        fh.write(bytes(out))
+
+
+# ── Flat-section fixture for _nest_sections ───────────────────────────────────
+
+def _comp(code, ni):
+    return {"code": code, "description": f"Competency {code}", "weight": f"{ni}%",
+            "no_of_items": ni, **_ext._zero_bloom()}
+
+
+NEST_FIXTURE = [{
+    "subject": "Nesting Fixture",
+    "sections": [
+        {"title": "", "competencies": [_comp("0.1", 2)], "total": None},
+        {"title": "A. Letter Only", "competencies": [_comp("1.1", 5)], "total": None},
+        {"title": "B. Letter With Children", "competencies": [], "total": None},
+        {"title": "1. First Child", "competencies": [_comp("2.1", 3)], "total": None},
+        {"title": "2. Second Child", "competencies": [_comp("2.2", 4)],
+         "total": {"weight": "7%", "total_items": 7, **_ext._zero_bloom()}},
+        {"title": "C. Trailing Letter", "competencies": [], "total": None},
+        {"title": "Unprefixed Heading", "competencies": [_comp("3.1", 1)], "total": None},
+    ],
+}]
+
+
+# ── Helper tables (inputs only — expected values come from the golden file) ──
+
+INT_CASES   = ["5", "(5)", "5%", "1,000", "", None, "X", "12 (40%)", "3.0", "  7 "]
+CLEAN_CASES = [
+    "Cite **major** tenets",
+    "Explain standards \\ 2. Research Methods \\ 12",
+    "  padded   text  ",
+    "Trailing code 2.1",
+]
+
+
+# ── Golden comparison ─────────────────────────────────────────────────────────
+
+def _first_diff(expected, actual, path="$"):
+    if type(expected) is not type(actual):
+        return path, expected, actual
+    if isinstance(expected, dict):
+        for k in sorted(set(expected) | set(actual)):
+            if k not in expected or k not in actual:
+                return f"{path}.{k}", expected.get(k, "<missing>"), actual.get(k, "<missing>")
+            d = _first_diff(expected[k], actual[k], f"{path}.{k}")
+            if d:
+                return d
+        return None
+    if isinstance(expected, list):
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            d = _first_diff(e, a, f"{path}[{i}]")
+            if d:
+                return d
+        if len(expected) != len(actual):
+            return f"{path}.length", len(expected), len(actual)
+        return None
+    return None if expected == actual else (path, expected, actual)
+
+
+def check_golden(name: str, actual, update: bool) -> bool:
+    path = os.path.join(FIXTURE_DIR, f"{name}.golden.json")
+    actual = json.loads(json.dumps(actual))   # normalise tuples / key types
+    if update or not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(actual, fh, indent=2, ensure_ascii=False)
+            fh.write("\n")
+        print(f"  ✎ {name}: golden written")
+        return True
+    with open(path, encoding="utf-8") as fh:
+        expected = json.load(fh)
+    diff = _first_diff(expected, actual)
+    if diff:
+        where, exp, got = diff
+        print(f"  ❌ {name}: mismatch at {where}\n       expected: {exp!r}\n       actual:   {got!r}")
+        return False
+    print(f"  ✅ {name}")
+    return True
+
+
+# ── Timing ────────────────────────────────────────────────────────────────────
+
+def bench(label: str, fn, repeat: int, lines: int = 0):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    med = statistics.median(samples)
+    rate = f"  {lines / med:>12,.0f} lines/s" if lines else ""
+    print(f"  {label:<34} min {min(samples) * 1e3:8.2f} ms   median {med * 1e3:8.2f} ms{rate}")
+    return med
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--update", action="store_true", help="rewrite golden files from current output")
+    ap.add_argument("--repeat", type=int, default=20, help="timing iterations per stage")
+    ap.add_argument("--scale", type=int, default=20,
+                    help="copies of the markdown fixture concatenated for the throughput run")
+    ap.add_argument("--no-bench", action="store_true", help="golden checks only")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    with open(MD_FIXTURE, encoding="utf-8") as fh:
+        md = fh.read()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_extractor_")
+    pdf_path = os.path.join(tmpdir, "tos_sample.pdf")
+    write_fixture_pdf(pdf_path)
+
+    # LlamaParse stub — extract() must never reach the network from here.
+    _ext.llamaparse_extract_markdown = lambda _path: md
+    _config.LLAMA_CLOUD_API_KEY = _config.LLAMA_CLOUD_API_KEY or "offline-stub"
+
+    print("🔎 Golden checks")
+    ok_all = True
+    ok_all &= check_golden("helpers", {
+        "_int":       {repr(v): _ext._int(v) for v in INT_CASES},
+        "_clean_desc": {v: _ext._clean_desc(v) for v in CLEAN_CASES},
+    }, args.update)
+    ok_all &= check_golden("tos_sample.markdown", _ext.parse_llamaparse_markdown(md), args.update)
+    ok_all &= check_golden("tos_sample.geometry", _ext.parse_pdf_geometry(pdf_path), args.update)
+    ok_all &= check_golden("nest_sections", _ext._nest_sections(copy.deepcopy(NEST_FIXTURE)), args.update)
+
+    success, msg, result = _ext.extract(pdf_path, "0" * 64)
+    if result:
+        result = {k: v for k, v in result.items() if k != "extracted_at"}
+    ok_all &= check_golden("extract", {"success": success, "message": msg, "result": result}, args.update)
+
+    if not args.no_bench:
+        big_md = "\n".join([md] * args.scale)
+        md_lines = md.count("\n") + 1
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            words = [w for p in pdf.pages for w in p.extract_words()]
+
+        print(f"\n⏱  Stage timings (repeat={args.repeat})")
+        bench("parse_llamaparse_markdown", lambda: _ext.parse_llamaparse_markdown(md), args.repeat, md_lines)
+        bench(f"parse_llamaparse_markdown ×{args.scale}",
+              lambda: _ext.parse_llamaparse_markdown(big_md), max(1, args.repeat // 4), md_lines * args.scale)
+        first_cells = [
+            _ext._STARS_RE.sub("", cells[0]).strip()
+            for cells in map(_ext._parse_md_table_row, big_md.splitlines()) if cells
+        ]
+        bench("_classify_row (first cells)",
+              lambda: [_ext._classify_row(c) for c in first_cells], args.repeat, len(first_cells))
+        bench("_extract_page_headers", lambda: _ext._extract_page_headers(pdf_path), args.repeat)
+        bench("_detect_col_boundaries", lambda: _ext._detect_col_boundaries(words, PAGE_W), args.repeat)
+        bench("parse_pdf_geometry", lambda: _ext.parse_pdf_geometry(pdf_path), args.repeat)
+        bench("_count_expected_subjects", lambda: _ext._count_expected_subjects(pdf_path), args.repeat)
+        nest_inputs = [copy.deepcopy(NEST_FIXTURE) for _ in range(args.repeat)]
+        bench("_nest_sections", lambda: _ext._nest_sections(nest_inputs.pop()), args.repeat)
+        bench("extract (LlamaParse stubbed)", lambda: _ext.extract(pdf_path, "0" * 64), args.repeat)
+
+    os.remove(pdf_path)
+    os.rmdir(tmpdir)
+
+    print("\n" + ("✅ All golden checks passed" if ok_all else "❌ Golden mismatches found"))
+    return 0 if ok_all else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Item-analysis check and benchmark for app/utils/item_analysis.py.
+
+Generates attempts offline from a two-parameter logistic model (student
+ability vs. item difficulty / discrimination), encodes them the way
+submissions are stored (answer_keys.score → correct_mask + choices) under
+two different question orders, and serves them to compute() from memory.
+
+Checks every question's p-value, item-rest point-biserial and option counts
+against a naive per-question reference (statistics.correlation), checks the
+NumPy reducer against the row-at-a-time _reduce_python, and times both.
+
+Usage:
+    python scripts/bench_item_analysis.py
+    python scripts/bench_item_analysis.py --attempts 1000,5000 --items 100
+"""
+
+import os
+import sys
+import math
+import time
+import uuid
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DB_URL", "postgresql://offline/offline")
+
+from app.utils import item_analysis as ia            # noqa: E402
+from app.utils.answer_keys import AnswerKey          # noqa: E402
+
+OPTIONS = ["A", "B", "C", "D"]
+
+
+def make_dataset(n_attempts: int, n_items: int, seed: int = 5):
+    rng = random.Random(seed)
+    assess_id = str(uuid.uuid4())
+    questions = [{
+        "id":             uuid.UUID(int=rng.getrandbits(128)),
+        "text":           f"Item {i}",
+        "options":        [f"{o}{i}" for o in OPTIONS],
+        "correct_answer": rng.randrange(4),
+        "a":              rng.uniform(-0.3, 2.0),   # a few items discriminate the wrong way
+        "b":              rng.uniform(-2.5, 2.5),
+    } for i in range(n_items)]
+
+    # Two question orders, as after a re-ordering edit
+    orders = [list(questions), rng.sample(questions, len(questions))]
+    keys = [AnswerKey({"id": assess_id, "title": "Bench"}, order) for order in orders]
+
+    results, truth = [], []
+    for n in range(n_attempts):
+        theta = rng.gauss(0, 1)
+        answers = {}
+        for q in questions:
+            p = 1 / (1 + math.exp(-q["a"] * (theta - q["b"])))
+            if rng.random() < 0.03:
+                continue  # blank
+            if rng.random() < p:
+                pick = q["correct_answer"]
+            else:
+                wrong = [i for i in range(4) if i != q["correct_answer"]]
+                pick = rng.choices(wrong, weights=[3, 1, 1][:len(wrong)])[0]
+            answers[str(q["id"])] = q["options"][pick].upper() if rng.random() < 0.2 else q["options"][pick]
+        key = keys[n % 2]
+        correct, mask, choices = key.score(answers)
+        results.append({"layout_hash": key.layout_hash, "correct_mask": mask, "choices": choices})
+        truth.append((key, answers))
+
+    layouts = [{"layout_hash": k.layout_hash, "question_ids": list(k.question_ids)} for k in keys]
+    return assess_id, questions, layouts, results, truth
+
+
+def install(questions, layouts, results):
+    def fake_fetchall(sql, params=None):
+        if "FROM questions" in sql:
+            return [dict(q) for q in questions]
+        if "FROM answer_layouts" in sql:
+            return layouts
+        return results
+    ia.fetchall = fake_fetchall
+
+
+def reference(questions, truth) -> dict:
+    """Straightforward per-question statistics from the raw answers."""
+    out = {}
+    for q in questions:
+        qid = str(q["id"])
+        xs, rests, picks = [], [], {}
+        for key, answers in truth:
+            given = answers.get(qid, "").strip().lower()
+            total = sum(answers.get(k, "").strip().lower() == c for k, c in zip(key.question_ids, key.correct))
+            x = int(given == q["options"][q["correct_answer"]].lower())
+            xs.append(x)
+            rests.append(total - x)
+            if given:
+                idx = [o.lower() for o in q["options"]].index(given)
+                picks[idx] = picks.get(idx, 0) + 1
+        try:
+            rpb = statistics.correlation(xs, rests)
+        except statistics.StatisticsError:
+            rpb = None
+        out[qid] = (sum(xs) / len(xs), rpb, picks)
+    return out
+
+
+def check(result: dict, ref: dict) -> bool:
+    for item in result["items"]:
+        p, rpb, picks = ref[item["question_id"]]
+        if abs(item["p_value"] - p) > 1e-4:
+            return False
+        if (rpb is None) != (item["point_biserial"] is None):
+            return False
+        if rpb is not None and abs(item["point_biserial"] - rpb) > 1e-3:
+            return False
+        if {o["index"]: o["count"] for o in item["options"] if o["count"]} != picks:
+            return False
+    return True
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--attempts", default="200,1000,5000", help="comma-separated attempt counts")
+    ap.add_argument("--items", type=int, default=100, help="questions per assessment")
+    args = ap.parse_args()
+
+    vectorized = ia._reduce_numpy
+    print(f"🔄 Item analysis, {args.items} questions, two layouts (NumPy {ia.np.__version__})\n")
+    ok = True
+    for n in (int(x) for x in args.attempts.split(",")):
+        assess_id, questions, layouts, results, truth = make_dataset(n, args.items)
+        install(questions, layouts, results)
+        ref = reference(questions, truth) if n <= 1000 else None
+
+        ia._reduce_numpy = ia._reduce_python
+        py_result = ia.compute(assess_id)
+        t_py = timed(lambda: ia.compute(assess_id))
+        ia._reduce_numpy = vectorized
+        np_result = ia.compute(assess_id)
+        t_np = timed(lambda: ia.compute(assess_id))
+
+        same = all(a["p_value"] == b["p_value"] and a["point_biserial"] == b["point_biserial"]
+                   and a["options"] == b["options"] and a["blank"] == b["blank"]
+                   for a, b in zip(py_result["items"], np_result["items"]))
+        good = same and (check(np_result, ref) if ref else True)
+
+        flagged = np_result["summary"]["flagged"]
+        verdict = ("matches reference" if ref else "reducers agree") if good else "MISMATCH"
+        print(f"  {n:>5} attempts   python {t_py * 1e3:8.1f} ms   numpy {t_np * 1e3:8.1f} ms   "
+              f"x{t_py / t_np:5.1f}   {flagged:>3} flagged   {verdict}")
+        ok &= good
+
+    print("\n" + ("✅ Item statistics match the per-question reference" if ok
+                  else "❌ Item statistics differ from the reference"))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
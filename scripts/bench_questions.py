@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Question-save benchmark for app/routes/assessments.py::_upsert_questions.
+
+Runs offline against a fake connection pool that sleeps --rtt-ms for every
+statement and every COMMIT, which is what dominates a save over the Supabase
+pooler. Each scenario edits an existing assessment the way the builder UI
+does: keeps 80% of the questions (edited), drops the rest and adds as many
+new "q-..." ones.
+
+  legacy  — the previous loop: one pooled connection + statement + commit
+            per DELETE / UPDATE / INSERT
+  batched — current code: one transaction, at most four statements
+
+Also checks that both paths delete, update and insert exactly the same rows.
+
+Usage:
+    python scripts/bench_questions.py
+    python scripts/bench_questions.py --rtt-ms 10 --sizes 10,100,500,1000
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+from contextlib import contextmanager
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DB_URL", "postgresql://offline/offline")
+
+from app.routes import assessments                   # noqa: E402
+
+
+# ── Fake pool ─────────────────────────────────────────────────────────────────
+
+class FakeDB:
+    def __init__(self, rtt: float, existing_ids: list):
+        self.rtt          = rtt
+        self.existing_ids = existing_ids
+        self.statements   = 0
+        self.commits      = 0
+        self.deleted      = set()
+        self.updated      = {}
+        self.inserted     = []
+
+    def round_trip(self):
+        time.sleep(self.rtt)
+
+    def commit(self):
+        self.commits += 1
+        self.round_trip()
+
+    # Logical effects, recorded the same way for both paths
+    def on_delete(self, ids):
+        self.deleted.update(str(i) for i in ids)
+
+    def on_update(self, qid, text, options, correct, sort_order):
+        self.updated[str(qid)] = (text, _adapted(options), correct, sort_order)
+
+    def on_insert(self, text, options, correct, sort_order):
+        self.inserted.append((text, _adapted(options), correct, sort_order))
+
+
+def _adapted(v):
+    return getattr(v, "adapted", v)
+
+
+class FakeCursor:
+    """Just enough of a psycopg2 cursor for _upsert_questions and execute_values."""
+
+    class connection:
+        encoding = "UTF8"
+
+    def __init__(self, db: FakeDB):
+        self.db      = db
+        self.rows    = []
+        self.pending = []
+
+    def mogrify(self, template, args):
+        self.pending.append(args)
+        return b"(...)"
+
+    def execute(self, sql, params=None):
+        self.db.statements += 1
+        self.db.round_trip()
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        rows, self.pending = self.pending, []
+        if sql.startswith("SELECT id, competency_codes FROM questions"):
+            self.rows = [{"id": i} for i in self.db.existing_ids]
+        elif sql.startswith("DELETE"):
+            self.db.on_delete(params[0])
+        elif sql.lstrip().startswith("UPDATE questions AS q"):
+            for qid, text, options, correct, sort_order, _codes in rows:
+                self.db.on_update(qid, text, options, correct, sort_order)
+        elif sql.startswith("INSERT INTO questions"):
+            for _aid, _author, text, options, correct, sort_order, _codes in rows:
+                self.db.on_insert(text, options, correct, sort_order)
+
+    def fetchall(self):
+        return self.rows
+
+
+def install(db: FakeDB):
+    @contextmanager
+    def get_cursor():
+        yield FakeCursor(db)
+        db.commit()
+
+    assessments.get_cursor = get_cursor
+
+
+# ── Previous implementation, one statement per helper call ────────────────────
+
+def legacy_upsert(db: FakeDB, assess_id: str, questions: list, author_id: str):
+    def call(kind, params):
+        db.statements += 1
+        db.round_trip()
+        db.commit()
+        if kind == "delete":
+            db.on_delete([params[0]])
+        elif kind == "update":
+            text, options, correct, sort_order, qid = params
+            db.on_update(qid, text, options, correct, sort_order)
+        elif kind == "insert":
+            _aid, _author, text, options, correct, sort_order = params
+            db.on_insert(text, options, correct, sort_order)
+
+    incoming_ids = {
+        str(q.get("id")) for q in questions
+        if q.get("id") and not str(q.get("id", "")).startswith("q-")
+    }
+    call("select", None)
+    existing_ids = set(db.existing_ids)
+
+    for qid in existing_ids - incoming_ids:
+        call("delete", [qid])
+
+    for idx, q in enumerate(questions):
+        qid     = str(q.get("id", ""))
+        text    = (q.get("text") or "").strip()
+        options = q.get("options", [])
+        correct = q.get("correctAnswer", q.get("correct_answer", 0))
+        sort_order = q.get("sortOrder", q.get("sort_order", idx))
+        try:
+            correct = int(correct)
+        except (TypeError, ValueError):
+            correct = 0
+        if qid and not qid.startswith("q-") and qid in existing_ids:
+            call("update", [text, options, correct, sort_order, qid])
+        else:
+            call("insert", [assess_id, author_id, text, options, correct, sort_order])
+
+
+# ── Scenario ──────────────────────────────────────────────────────────────────
+
+def scenario(n: int, seed: int = 11):
+    rng = random.Random(seed + n)
+    existing = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(n)]
+    kept = rng.sample(existing, int(n * 0.8))
+    questions = []
+    for i, qid in enumerate(kept + [f"q-{k}" for k in range(n - len(kept))]):
+        questions.append({
+            "id": qid,
+            "text": f"  Question {i}: which theorist proposed stage {rng.randrange(8)}?  ",
+            "options": [f"Option {c}" for c in "ABCD"],
+            "correctAnswer": str(rng.randrange(4)),
+            "sortOrder": i,
+        })
+    rng.shuffle(questions)
+    return existing, questions
+
+
+def run(n: int, rtt: float):
+    existing, questions = scenario(n)
+    assess_id, author_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    old = FakeDB(rtt, existing)
+    t0 = time.perf_counter()
+    legacy_upsert(old, assess_id, questions, author_id)
+    t_old = time.perf_counter() - t0
+
+    new = FakeDB(rtt, existing)
+    install(new)
+    t0 = time.perf_counter()
+    assessments._upsert_questions(assess_id, questions, author_id)
+    t_new = time.perf_counter() - t0
+
+    same = (old.deleted == new.deleted and old.updated == new.updated
+            and sorted(old.inserted) == sorted(new.inserted))
+    return old, t_old, new, t_new, same
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rtt-ms", type=float, default=5.0, help="simulated round trip per statement / commit")
+    ap.add_argument("--sizes", default="10,100,500", help="comma-separated question counts")
+    args = ap.parse_args()
+
+    rtt = args.rtt_ms / 1000
+    print(f"🔄 Saving edited assessments, {args.rtt_ms:g} ms per round trip\n")
+    ok = True
+    for n in (int(x) for x in args.sizes.split(",")):
+        old, t_old, new, t_new, same = run(n, rtt)
+        ok &= same
+        print(f"  {n:>4} questions   legacy {old.statements:>4} stmts {old.commits:>4} commits {t_old * 1e3:8.1f} ms   "
+              f"batched {new.statements} stmts {new.commits} commit {t_new * 1e3:6.1f} ms   "
+              f"x{t_old / t_new:5.1f}   {'same rows' if same else 'DIFFERENT rows'}")
+
+    print("\n" + ("✅ Batched save writes the same rows as the per-question loop" if ok
+                  else "❌ Batched save differs from the per-question loop"))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Response-encoding microbenchmark for app/utils/responses.py.
+
+Times json_bytes() (orjson when installed) against the stdlib _Encoder path on
+payloads shaped like the heaviest endpoints, and checks that both decode to
+the same value:
+
+  assessments  — a page of assessments with embedded questions
+                 (UUIDs, tz-aware datetimes, Decimals, option lists)
+  progress     — mobile progress results (Decimal scores, timestamps)
+  active_tos   — the extractor's golden TOS tree, repeated per subject
+
+Usage:
+    python scripts/bench_responses.py
+    python scripts/bench_responses.py --repeat 200 --scale 4
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import statistics
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.getcwd())
+
+from app.utils import responses                      # noqa: E402
+
+TOS_GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "fixtures", "extractor", "tos_sample.markdown.golden.json")
+
+
+# ── Payloads ──────────────────────────────────────────────────────────────────
+
+def _ts(rng: random.Random) -> datetime:
+    base = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    return base + timedelta(seconds=rng.randrange(0, 90 * 86400), microseconds=rng.randrange(10**6))
+
+
+def assessments_payload(rng: random.Random, scale: int) -> dict:
+    items = []
+    for i in range(20 * scale):
+        items.append({
+            "id": uuid.UUID(int=rng.getrandbits(128)),
+            "title": f"Module {i} Quiz — Abnormal Psychology",
+            "type": rng.choice(["QUIZ", "PRACTICE_TEST", "MOCK_EXAM"]),
+            "status": "APPROVED",
+            "subject_id": uuid.UUID(int=rng.getrandbits(128)),
+            "module_id": uuid.UUID(int=rng.getrandbits(128)),
+            "author_id": uuid.UUID(int=rng.getrandbits(128)),
+            "subject_name": "Abnormal Psychology",
+            "author_name": "Juan Dela Cruz",
+            "passing_rate": Decimal("75.00"),
+            "randomizeQuestions": True,
+            "created_at": _ts(rng),
+            "updated_at": _ts(rng),
+            "questions": [{
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "text": f"Which of the following best describes concept {q}? " * 2,
+                "options": [f"Option {c} for question {q}" for c in "ABCD"],
+                "correctAnswer": rng.randrange(4),
+                "mode": "MCQ",
+                "points": 1,
+                "sortOrder": q,
+            } for q in range(50)],
+        })
+    return {"success": True, "message": "Success",
+            "data": {"items": items, "total": len(items), "page": 1, "per_page": len(items)}}
+
+
+def progress_payload(rng: random.Random, scale: int) -> dict:
+    rows = [{
+        "id": uuid.UUID(int=rng.getrandbits(128)),
+        "assessment_id": uuid.UUID(int=rng.getrandbits(128)),
+        "assessment_title": f"Practice Test {i % 40}",
+        "score": Decimal(rng.randrange(0, 10000)) / 100,
+        "total_items": 50,
+        "correct": rng.randrange(51),
+        "passed": rng.random() > 0.4,
+        "date_taken": _ts(rng),
+    } for i in range(200 * scale)]
+    return {"success": True, "message": "Success", "data": {"results": rows}}
+
+
+def active_tos_payload(scale: int) -> dict:
+    with open(TOS_GOLDEN, encoding="utf-8") as fh:
+        tree = json.load(fh)
+    return {"success": True, "message": "Success",
+            "data": {"id": str(uuid.UUID(int=7)), "label": "TOS 2025",
+                     "updated_at": datetime(2025, 6, 1, 8, 30, tzinfo=timezone.utc),
+                     "data": [tree] * (4 * scale)}}
+
+
+# ── Timing ────────────────────────────────────────────────────────────────────
+
+def bench(fn, payload, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(payload)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=50, help="timing iterations per payload")
+    ap.add_argument("--scale", type=int, default=1, help="payload size multiplier")
+    args = ap.parse_args()
+
+    rng = random.Random(42)
+    payloads = {
+        "assessments": assessments_payload(rng, args.scale),
+        "progress":    progress_payload(rng, args.scale),
+        "active_tos":  active_tos_payload(args.scale),
+    }
+
+    backend = f"orjson {responses.orjson.__version__}" if responses.orjson else "stdlib (orjson not installed)"
+    print(f"🔄 json_bytes() backend: {backend}\n")
+
+    ok = True
+    for name, payload in payloads.items():
+        fast, std = responses.json_bytes(payload), responses._json_std(payload)
+        same = json.loads(fast) == json.loads(std)
+        ok &= same
+        t_fast = bench(responses.json_bytes, payload, args.repeat)
+        t_std  = bench(responses._json_std, payload, args.repeat)
+        print(f"  {name:<12} {len(std) / 1024:8.1f} KB   stdlib {t_std * 1e3:8.2f} ms   "
+              f"json_bytes {t_fast * 1e3:8.2f} ms   x{t_std / t_fast:5.1f}   {'same' if same else 'DIFFERENT'}")
+
+    # Fallback path: without orjson, json_bytes() must be byte-identical to the stdlib encoder
+    saved, responses.orjson = responses.orjson, None
+    try:
+        fallback_ok = all(responses.json_bytes(p) == responses._json_std(p) for p in payloads.values())
+    finally:
+        responses.orjson = saved
+
+    print("\n" + ("✅ Fast encoder output matches the stdlib encoder" if ok
+                  else "❌ Fast encoder output differs from the stdlib encoder"))
+    print("✅ Fallback path is byte-identical" if fallback_ok else "❌ Fallback path differs")
+    return 0 if ok and fallback_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
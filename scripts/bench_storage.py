@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Storage round-trip check against a local stand-in for Supabase Storage.
+
+Starts a tiny HTTP/1.1 server that implements the handful of Storage REST
+endpoints app/utils/storage.py uses, points SUPABASE_URL at it, and counts
+requests and TCP connections per upload.
+
+  cold  — client closed and bucket cache cleared before every upload
+          (what every call used to pay: new connection + bucket GET)
+  warm  — shared keep-alive client + known-bucket cache
+  async — storage_async uploads fired concurrently; checks that no more than
+          STORAGE_MAX_CONCURRENCY requests are ever in flight at once
+  bulk  — storage_async.delete_pdfs_by_url over those uploads; one batch
+          remove per bucket instead of one DELETE per file
+
+Usage:
+    python scripts/bench_storage.py            # 50 uploads per mode
+    python scripts/bench_storage.py -n 200
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.getcwd())
+
+
+# ── Stand-in storage server ───────────────────────────────────────────────────
+
+class StorageStub:
+    def __init__(self):
+        self.buckets     = set()
+        self.objects     = {}
+        self.requests    = Counter()
+        self.connections = 0
+        self.in_flight   = 0
+        self.max_flight  = 0
+        self.delay       = 0.0
+        self.lock        = threading.Lock()
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests.clear()
+            self.connections = 0
+            self.max_flight  = 0
+
+
+def make_handler(stub: StorageStub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with stub.lock:
+                stub.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _body(self) -> bytes:
+            n = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(n) if n else b""
+
+        def _count(self, kind: str):
+            with stub.lock:
+                stub.requests[kind] += 1
+
+        def do_GET(self):
+            if self.path.startswith("/storage/v1/bucket/"):
+                self._count("bucket GET")
+                bucket = self.path.rsplit("/", 1)[-1]
+                if bucket in stub.buckets:
+                    return self._reply(200, {"id": bucket, "name": bucket, "public": True})
+                return self._reply(404, {"error": "Bucket not found"})
+            self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            with stub.lock:
+                stub.in_flight += 1
+                stub.max_flight = max(stub.max_flight, stub.in_flight)
+            try:
+                if stub.delay:
+                    time.sleep(stub.delay)
+                self._post()
+            finally:
+                with stub.lock:
+                    stub.in_flight -= 1
+
+        def _post(self):
+            body = self._body()
+            if self.path == "/storage/v1/bucket":
+                self._count("bucket POST")
+                bucket = json.loads(body)["id"]
+                if bucket in stub.buckets:
+                    return self._reply(409, {"error": "Bucket already exists"})
+                stub.buckets.add(bucket)
+                return self._reply(200, {"name": bucket})
+            if self.path.startswith("/storage/v1/object/"):
+                self._count("object POST")
+                bucket, _, obj = self.path[len("/storage/v1/object/"):].partition("/")
+                if bucket not in stub.buckets:
+                    return self._reply(404, {"error": "Bucket not found"})
+                key = (bucket, obj)
+                if key in stub.objects and self.headers.get("x-upsert") != "true":
+                    return self._reply(400, {"error": "Duplicate", "message": "The resource already exists"})
+                stub.objects[key] = len(body)
+                return self._reply(200, {"Key": f"{bucket}/{obj}"})
+            self._reply(404, {"error": "not found"})
+
+        def do_DELETE(self):
+            bucket, _, obj = self.path[len("/storage/v1/object/"):].partition("/")
+            if not obj:
+                self._count("batch DELETE")
+                paths = json.loads(self._body())["prefixes"]
+                removed = [p for p in paths if stub.objects.pop((bucket, p), None) is not None]
+                return self._reply(200, [{"name": p} for p in removed])
+            self._count("object DELETE")
+            existed = stub.objects.pop((bucket, obj), None) is not None
+            self._reply(200 if existed else 404, {"message": "ok" if existed else "not found"})
+
+    return Handler
+
+
+def start_stub() -> tuple:
+    stub = StorageStub()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return stub, server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ── Runs ──────────────────────────────────────────────────────────────────────
+
+def run(label: str, n: int, stub: StorageStub, storage, cold: bool):
+    pdf = b"%PDF-1.4\n" + os.urandom(64 * 1024)
+    stub.reset_counters()
+    t0 = time.perf_counter()
+    for i in range(n):
+        if cold:
+            storage.close_client()
+            storage._known_buckets.clear()
+        url = storage.upload_pdf_bytes(pdf, f"{label}-{i}.pdf", "bench-subject")
+        storage.delete_pdf_by_url(url)
+    elapsed = time.perf_counter() - t0
+    total = sum(stub.requests.values())
+    print(f"  {label:<5} {n} upload+delete pairs in {elapsed * 1e3:8.1f} ms  "
+          f"requests={total} ({total / n:.2f}/pair)  connections={stub.connections}  "
+          f"{dict(stub.requests)}")
+    return total, stub.connections
+
+
+def run_async(n: int, stub: StorageStub, storage_async):
+    pdf = b"%PDF-1.4\n" + os.urandom(64 * 1024)
+    stub.reset_counters()
+    stub.delay = 0.02   # keep requests overlapping
+
+    async def go():
+        t0 = time.perf_counter()
+        urls = await asyncio.gather(*(
+            storage_async.upload_pdf_bytes(pdf, f"async-{i}.pdf", "bench-subject") for i in range(n)
+        ))
+        elapsed = time.perf_counter() - t0
+        await storage_async.aclose_client()
+        return elapsed, urls
+
+    elapsed, urls = asyncio.run(go())
+    stub.delay = 0.0
+    limit = storage_async._MAX_CONCURRENT
+    print(f"  async {n} concurrent uploads in {elapsed * 1e3:8.1f} ms  "
+          f"max in flight={stub.max_flight} (limit {limit})  connections={stub.connections}")
+    return stub.max_flight <= limit, urls
+
+
+def run_bulk(urls: list, stub: StorageStub, storage_async):
+    stub.reset_counters()
+
+    async def go():
+        t0 = time.perf_counter()
+        removed = await storage_async.delete_pdfs_by_url(urls)
+        elapsed = time.perf_counter() - t0
+        await storage_async.aclose_client()
+        return removed, elapsed
+
+    removed, elapsed = asyncio.run(go())
+    left = sum(1 for b, _ in stub.objects if b == "bench-subject")
+    print(f"  bulk  {removed} objects removed in {elapsed * 1e3:8.1f} ms  "
+          f"requests={sum(stub.requests.values())}  remaining={left}  {dict(stub.requests)}")
+    return stub.requests["batch DELETE"] == 1 and not stub.requests["object DELETE"] and left == 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", type=int, default=50, help="uploads per mode")
+    args = ap.parse_args()
+
+    stub, server, base_url = start_stub()
+    os.environ["SUPABASE_URL"] = base_url
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "stub-key"
+
+    from app.utils import storage, storage_async
+
+    print(f"🔄 Stand-in storage at {base_url}")
+    run("cold", args.n, stub, storage, cold=True)
+    storage.close_client()
+    storage._known_buckets.clear()
+    total, conns = run("warm", args.n, stub, storage, cold=False)
+
+    bounded, urls = run_async(args.n, stub, storage_async)
+    batched = run_bulk(urls, stub, storage_async)
+
+    server.shutdown()
+    # warm: one bucket GET for the whole run, then 1 POST + 1 DELETE per pair
+    ok = total <= 2 * args.n + 1 and conns <= 2
+    print("\n" + ("✅ Warm path reuses the connection and skips bucket checks" if ok
+                  else "❌ Warm path is making extra round trips / connections"))
+    print("✅ Async uploads stay within the concurrency limit" if bounded
+          else "❌ Async uploads exceeded the concurrency limit")
+    print("✅ Bulk delete used a single batch remove" if batched
+          else "❌ Bulk delete fell back to per-file requests")
+    return 0 if ok and bounded and batched else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
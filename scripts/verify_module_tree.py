@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Checks that the single-query module tree loader in app/routes/subjects.py
+nests exactly like the old per-node recursive loader.
+
+Runs offline: a synthetic subject (60+ modules, three levels, mixed
+APPROVED/PENDING/REJECTED, two authors) is served from memory by a fake
+fetchall that honours the same WHERE/ORDER BY the SQL would. The legacy
+loader is reproduced here and both are compared for ADMIN, FACULTY and
+STUDENT, from the root and from a sub-topic. Trees are metadata-only, so
+the legacy bodies (content / fileData) are stripped before comparing and
+content_length must match.
+
+Usage:
+    python scripts/verify_module_tree.py
+"""
+
+import os
+import sys
+import copy
+import uuid
+import random
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DB_URL", "postgresql://offline/offline")
+
+from app.routes import subjects                      # noqa: E402
+
+SUBJECT_ID = str(uuid.uuid4())
+FACULTY_ID = str(uuid.uuid4())
+OTHER_ID   = str(uuid.uuid4())
+
+
+def make_rows(seed: int = 7) -> list:
+    rng  = random.Random(seed)
+    base = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    rows, parents = [], [None]
+    for i in range(64):
+        parent = rng.choice(parents) if i >= 8 else None
+        row = {
+            "id":              uuid.UUID(int=rng.getrandbits(128)),
+            "subject_id":      uuid.UUID(SUBJECT_ID),
+            "parent_id":       parent,
+            "title":           f"Topic {i}",
+            "type":            rng.choice(["MODULE", "E-BOOK", None]),
+            "format":          rng.choice(["TEXT", "PDF"]),
+            "content":         f"body {i} — " + "x" * rng.randrange(2000),
+            "file_url":        None,
+            "file_name":       None,
+            "tos_section":     None,
+            "status":          rng.choice(["APPROVED", "APPROVED", "PENDING", "REJECTED"]),
+            "created_by":      uuid.UUID(rng.choice([FACULTY_ID, OTHER_ID])),
+            "created_by_name": "Juan Dela Cruz",
+            "sort_order":      rng.randrange(4),
+            "created_at":      base + timedelta(minutes=i),
+        }
+        rows.append(row)
+        if len(parents) < 24:
+            parents.append(row["id"])
+    return rows
+
+
+def _visible(r: dict, role: str, user_id: str) -> bool:
+    if role == "FACULTY":
+        return r["status"] == "APPROVED" or str(r["created_by"]) == user_id
+    if role == "STUDENT":
+        return r["status"] == "APPROVED"
+    return True
+
+
+def _order(rows: list) -> list:
+    return sorted(rows, key=lambda r: (r["sort_order"], r["created_at"]))
+
+
+def legacy_tree(rows, parent_id, role, user_id, counter) -> list:
+    """The pre-change loader: one query per node."""
+    counter[0] += 1
+    level = [copy.deepcopy(r) for r in _order(rows)
+             if str(r["parent_id"] or "") == str(parent_id or "") and _visible(r, role, user_id)]
+    result = []
+    for r in level:
+        r = subjects._format_module(r)
+        r.pop("content", None)
+        r["fileData"] = None
+        r["subTopics"] = legacy_tree(rows, r["id"], role, user_id, counter)
+        result.append(r)
+    return result
+
+
+def install_fake_fetchall(rows, counter):
+    def fake_fetchall(sql, params=None):
+        counter[0] += 1
+        role = "FACULTY" if "created_by = %s" in sql else "STUDENT" if "'APPROVED'" in sql else "ADMIN"
+        user_id = params[1] if role == "FACULTY" else None
+        assert "t.*" not in sql, "tree query must not select module bodies"
+        out = []
+        for r in _order(rows):
+            if _visible(r, role, user_id):
+                r = copy.deepcopy(r)
+                r["content_length"] = len((r.pop("content") or "").encode())
+                out.append(r)
+        return out
+    subjects.fetchall = fake_fetchall
+
+
+def main() -> int:
+    rows = make_rows()
+    sub_root = next(str(r["id"]) for r in rows if r["parent_id"] is None
+                    and any(c["parent_id"] == r["id"] for c in rows))
+    failures = 0
+    for role, user_id in (("ADMIN", None), ("FACULTY", FACULTY_ID), ("STUDENT", None)):
+        for parent in (None, sub_root):
+            old_q, new_q = [0], [0]
+            expected = legacy_tree(rows, parent, role, user_id, old_q)
+            install_fake_fetchall(rows, new_q)
+            actual = subjects._build_module_tree(SUBJECT_ID, parent, role, user_id)
+            same = actual == expected
+            failures += not same
+            where = "root" if parent is None else "sub-topic"
+            print(f"{'✅' if same else '❌'} {role:<8} {where:<9} queries {old_q[0]:>3} → {new_q[0]}")
+
+    # A parent cycle must not recurse forever
+    a, b = copy.deepcopy(rows[0]), copy.deepcopy(rows[1])
+    a["parent_id"], b["parent_id"] = b["id"], a["id"]
+    tree = subjects._assemble_module_tree([a, b], a["id"])
+    ok = len(tree) == 1 and tree[0]["subTopics"] == []
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} parent cycle terminates")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())